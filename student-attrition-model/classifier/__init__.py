@@ -1 +1,2 @@
 from classifier.model_classifier import Classifier
+from classifier.registry import ModelRegistry, registered_models
@@ -0,0 +1,204 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+import copy
+from db import get_cached_analysis, store_cached_analysis
+import hashlib
+import logging
+import numpy as np
+import threading
+import time
+
+logging.getLogger(__name__)
+
+
+def analysis_key(data: list | np.ndarray, model_version: str, generation: int, method: str = "perturbation") -> str:
+    """
+    Returns the canonical cache key for the feature analysis of a feature vector.
+
+    The key combines the encoded feature vector with the model version, the controls generation and the analysis
+    method, so results are never served for a different model, for outdated perturbation grids or for another method.
+
+    :param data: list | np.ndarray
+    :param model_version: str
+    :param generation: int
+    :param method: str
+    :return: str
+    """
+    digest = hashlib.sha256(np.ascontiguousarray(data, dtype=np.float64).tobytes())
+    digest.update(f"|{model_version}|{generation}|{method}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+class AnalysisCache:
+    """
+        This class contains all properties and methods for caching feature analysis results.
+
+        Results are kept in a bounded in-memory LRU cache with a time to live. Optionally a shared MongoDB tier is used
+        so workers can serve results computed by other workers. Identical requests that arrive while a result is being
+        computed wait for that computation instead of starting their own.
+
+
+        Attributes
+
+        max_entries: int - The maximum number of results kept in memory, 0 disables the cache
+
+        ttl: int - The number of seconds a result remains valid
+
+        shared: bool - Determines whether the shared MongoDB tier is used
+
+        entries: OrderedDict - The cached results with their expiry time, in least to most recently used order
+
+        in_flight: dict - The results currently being computed
+
+        hits: int - The number of results served from the cache or from an identical request in flight
+
+        misses: int - The number of results that had to be computed
+
+
+        Methods
+
+        lookup: dict | None - Returns a cached result or None.
+
+        store: None - Adds a result to the cache.
+
+        claim: tuple[bool, Future] - Registers the computation of a result or joins one already in flight.
+
+        resolve: None - Completes a claimed computation with its result or error.
+
+        get_or_compute: dict - Returns the cached result, or computes and caches it.
+
+        status: dict - Returns the statistics of the cache.
+    """
+    def __init__(self, max_entries: int = 1024, ttl: int = 600, shared: bool = False):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.shared = shared
+        self.entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self.in_flight: dict[str, Future] = dict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def lookup(self, key: str) -> dict | None:
+        """
+        Returns a copy of the cached result for the key from memory, or from the shared tier if enabled, otherwise None.
+
+        :param key: str
+        :return: dict | None
+        """
+        if not self.max_entries:
+            return None
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return copy.deepcopy(entry[1])
+                del self.entries[key]
+        if self.shared:
+            result = get_cached_analysis(key, self.ttl)
+            if result is not None:
+                self.store(key, result, shared=False)
+                with self.lock:
+                    self.hits += 1
+                return copy.deepcopy(result)
+        return None
+
+    def store(self, key: str, result: dict, shared: bool = True) -> None:
+        """
+        Adds a copy of the result to the cache, evicting the least recently used results if the cache is full.
+
+        :param key: str
+        :param result: dict
+        :param shared: bool - Determines whether the result is also written to the shared tier (if enabled)
+        :return: None
+        """
+        if not self.max_entries:
+            return
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, copy.deepcopy(result))
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        if shared and self.shared:
+            store_cached_analysis(key, result)
+
+    def claim(self, key: str) -> tuple[bool, Future]:
+        """
+        Registers the computation of the result for a key and returns (True, future) if the caller must compute it.
+
+        If an identical computation is already in flight (False, future) is returned and the caller should wait for the
+        future instead.
+
+        :param key: str
+        :return: tuple[bool, Future]
+        """
+        with self.lock:
+            future = self.in_flight.get(key)
+            if future is not None:
+                self.hits += 1
+                return False, future
+            future = Future()
+            self.in_flight[key] = future
+            self.misses += 1
+            return True, future
+
+    def resolve(self, key: str, result: dict | None = None, error: Exception | None = None) -> None:
+        """
+        Completes a claimed computation, caching the result and passing it (or the error) to any waiting callers.
+
+        :param key: str
+        :param result: dict | None
+        :param error: Exception | None
+        :return: None
+        """
+        if error is None:
+            self.store(key, result)
+        with self.lock:
+            future = self.in_flight.pop(key, None)
+        if future is None:
+            return
+        if error is None:
+            future.set_result(result)
+        else:
+            future.set_exception(error)
+
+    def get_or_compute(self, key: str, function) -> dict:
+        """
+        Returns the cached result for the key, otherwise computes it with the function and caches it.
+
+        :param key: str
+        :param function: Callable returning the result
+        :return: dict
+        """
+        result = self.lookup(key)
+        if result is not None:
+            return result
+        owner, future = self.claim(key)
+        if not owner:
+            return copy.deepcopy(future.result())
+        try:
+            result = function()
+        except Exception as e:
+            self.resolve(key, error=e)
+            raise
+        self.resolve(key, result)
+        return result
+
+    def status(self) -> dict:
+        """
+        Returns the statistics of the cache.
+
+        :return: dict
+        """
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "shared": self.shared,
+                "in_flight": len(self.in_flight),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
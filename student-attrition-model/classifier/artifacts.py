@@ -0,0 +1,181 @@
+from datetime import datetime, timezone
+from db import get_controls
+import hashlib
+import joblib
+import json
+import logging
+import numpy as np
+import os
+import shutil
+import uuid
+
+logging.getLogger(__name__)
+
+# Version of the artifact layout, increased whenever the layout of the artifact directory changes.
+ARTIFACT_FORMAT = 1
+
+# Ensemble members stored in every artifact, in the order they are passed to and returned from the artifact functions.
+ARTIFACT_MEMBERS = ["rfc", "svc", "knn", "adb"]
+
+
+def artifacts_location() -> str:
+    """
+    Returns the path of the directory containing all model artifacts.
+
+    :return: str
+    """
+    current_file = 'artifacts.py'
+    root = os.path.realpath(current_file).split('student-attrition-model')[0]
+    return os.path.join(root, 'student-attrition-model', 'classifier', 'artifacts')
+
+
+def schema_fingerprint() -> str:
+    """
+    Returns a hash of the dataset schema and the feature translation, which together determine the feature vector.
+
+    Models are only valid for feature vectors with the same fingerprint as the one they were trained with.
+
+    :return: str
+    """
+    from feature_translation import get_dataset_schema
+    controls = get_controls()
+    content = json.dumps([get_dataset_schema(), controls.feature_translation, controls.meta_translation], sort_keys=True)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def dataset_fingerprint(features: list | np.ndarray, labels: list | np.ndarray) -> str:
+    """
+    Returns a hash of a dataset, used to identify the training data a model was trained with.
+
+    :param features: list | np.ndarray
+    :param labels: list | np.ndarray
+    :return: str
+    """
+    digest = hashlib.sha256(np.ascontiguousarray(features, dtype=np.float64).tobytes())
+    digest.update("|".join(map(str, labels)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def latest_artifact_version(location: str | None = None) -> str | None:
+    """
+    Returns the version of the most recently saved artifact, or None if no artifact has been saved.
+
+    :param location: str | None
+    :return: str | None
+    """
+    location = location or artifacts_location()
+    try:
+        with open(os.path.join(location, "LATEST"), "r") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def save_artifact(models: dict, manifest: dict, version: str | None = None, location: str | None = None,
+                  latest: bool = True) -> str:
+    """
+    Saves the ensemble members as a versioned artifact directory and returns the version.
+
+    Every member is stored in its own uncompressed joblib file, so the numpy arrays it holds as attributes (the KNN
+    training data and the SVC support vectors) can be memory mapped when loaded and shared between workers. The node
+    arrays of the tree ensembles are copied by sklearn when a tree is unpickled, so those members are never shared.
+    The manifest records the format, the schema fingerprint and any additional information given, e.g. evaluation
+    metrics. The directory is written under a temporary name and renamed once complete, so a partially written
+    artifact is never loaded.
+
+    :param models: dict of member name: estimator
+    :param manifest: dict
+    :param version: str | None
+    :param location: str | None
+    :param latest: bool - Determines whether the artifact becomes the latest artifact
+    :return: str
+    """
+    location = location or artifacts_location()
+    version = version or uuid.uuid4().hex
+    os.makedirs(location, exist_ok=True)
+    temporary = os.path.join(location, f".{version}.tmp")
+    target = os.path.join(location, version)
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+
+    members = dict()
+    for name, model in models.items():
+        members[name] = f"{name}.joblib"
+        joblib.dump(model, os.path.join(temporary, members[name]))
+    manifest = {
+        **manifest,
+        "format": ARTIFACT_FORMAT,
+        "version": version,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "schema_fingerprint": schema_fingerprint(),
+        "members": members,
+    }
+    with open(os.path.join(temporary, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    os.replace(temporary, target)
+    if latest:
+        set_latest_artifact(version, location)
+    logging.info(f"Model artifact {version} saved")
+    return version
+
+
+def set_latest_artifact(version: str, location: str | None = None) -> None:
+    """
+    Marks an existing artifact as the latest artifact, replacing the pointer atomically.
+
+    :param version: str
+    :param location: str | None
+    :return: None
+    """
+    location = location or artifacts_location()
+    assert os.path.exists(os.path.join(location, version, "manifest.json"))
+    pointer = os.path.join(location, f".LATEST.{uuid.uuid4().hex}")
+    with open(pointer, "w") as f:
+        f.write(version)
+    os.replace(pointer, os.path.join(location, "LATEST"))
+
+
+def read_manifest(version: str, location: str | None = None) -> dict:
+    """
+    Returns the manifest of an artifact.
+
+    :param version: str
+    :param location: str | None
+    :return: dict
+    """
+    location = location or artifacts_location()
+    with open(os.path.join(location, version, "manifest.json"), "r") as f:
+        return json.load(f)
+
+
+def load_artifact(version: str | None = None, location: str | None = None, mmap: bool = True) -> tuple[dict, dict]:
+    """
+    Loads the ensemble members of an artifact (the latest artifact if no version is given). Returns models and manifest.
+
+    If mmap is True the numpy arrays of the members are memory mapped copy-on-write instead of being read into memory,
+    pages stay shared between workers as the models never write to them (libsvm requires writable buffers). Only the
+    KNN training data and the SVC support vectors are mapped, the random forest and AdaBoost trees copy their node
+    arrays into memory when they are loaded.
+    Raises FileNotFoundError if the artifact does not exist and ValueError if its format is not supported.
+
+    :param version: str | None
+    :param location: str | None
+    :param mmap: bool
+    :return: tuple[dict, dict]
+    """
+    location = location or artifacts_location()
+    version = version or latest_artifact_version(location)
+    if version is None:
+        raise FileNotFoundError(f"No model artifact found in {location}")
+    manifest = read_manifest(version, location)
+    if manifest.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"Unsupported model artifact format: {manifest.get('format')}")
+    if manifest.get("schema_fingerprint") != schema_fingerprint():
+        logging.warning(f"Model artifact {version} was created for a different dataset schema")
+    models = dict()
+    for name, file_name in manifest["members"].items():
+        models[name] = joblib.load(os.path.join(location, version, file_name), mmap_mode="c" if mmap else None)
+    return models, manifest
@@ -0,0 +1,303 @@
+from math import factorial
+import logging
+import numpy as np
+from sklearn.ensemble import AdaBoostClassifier, RandomForestClassifier
+
+logging.getLogger(__name__)
+
+
+def softmax(values: np.ndarray) -> np.ndarray:
+    """
+    Returns the softmax of a vector.
+
+    :param values: np.ndarray
+    :return: np.ndarray
+    """
+    exponents = np.exp(values - values.max())
+    return exponents / exponents.sum()
+
+
+def shapley_weights(size: int, width: int) -> np.ndarray:
+    """
+    Returns the Shapley weights for a path with the given number of unique features, as a (width, width) matrix.
+
+    The entry (m, n) holds the weight k!(size - k - 1)!/size! of a coalition of k = m + n features, so the weighted sum
+    over coalitions of a product of two polynomials (in the number of features) is a bilinear form of their
+    coefficients. Entries for coalitions larger than size - 1 are zero.
+
+    :param size: int
+    :param width: int
+    :return: np.ndarray
+    """
+    weights = np.zeros(2 * width)
+    for k in range(size):
+        weights[k] = factorial(k) * factorial(size - k - 1) / factorial(size)
+    indexes = np.arange(width)
+    return weights[indexes[:, np.newaxis] + indexes[np.newaxis, :]]
+
+
+class TreeShapExplainer:
+    """
+        This class contains all properties and methods for calculating exact (path dependent) TreeSHAP values for a
+        tree ensemble whose output is the sum of the values of the leaves it reaches.
+
+        Every root to leaf path is stored as a padded row of split conditions and unique features. The contribution of a
+        leaf to feature i is v (o_i - z_i) sum_S w(|S|) prod_(j in S) o_j prod_(j not in S) z_j, where z_j is the
+        fraction of the training samples that follow the path at the splits on feature j and o_j whether the sample
+        does. The sum over coalitions S of the other path features is calculated from prefix and suffix products of the
+        polynomials (z_j + o_j t), for every leaf of every tree at once.
+
+
+        Attributes
+
+        width: int - The length of the feature vector
+
+        values: np.ndarray - The output values of every leaf, one column per output
+
+        expected_value: np.ndarray - The expected output of the ensemble over the training data, per output
+
+        condition_feature: np.ndarray - The feature of every split condition on the path of every leaf
+
+        condition_threshold: np.ndarray - The threshold of every split condition on the path of every leaf
+
+        condition_left: np.ndarray - Whether the path goes left at every split condition
+
+        condition_slot: np.ndarray - The unique feature (slot) every split condition belongs to, one-hot encoded
+
+        slot_feature: np.ndarray - The feature of every unique feature slot on the path of every leaf
+
+        slot_fraction: np.ndarray - The fraction z of the training samples following the path at every slot
+
+        slot_valid: np.ndarray - Whether a slot holds a feature (paths are padded to the same length)
+
+        weights: np.ndarray - The Shapley weight matrix of every leaf, see shapley_weights
+
+        softmax: bool - Whether the outputs are a decision function converted to probabilities by a softmax
+
+
+        Methods
+
+        tree_paths: list - Returns every root to leaf path of a tree.
+
+        follows: np.ndarray - Returns whether a single sample satisfies every split condition on the path of every leaf.
+
+        predict: np.ndarray - Calculates the outputs of the ensemble for a single sample.
+
+        shap_values: np.ndarray - Calculates the SHAP value of every feature for one output and a single sample.
+
+        probability_values: np.ndarray - Calculates the SHAP values for one class probability and a single sample.
+    """
+    def __init__(self, trees: list, leaf_values: list[np.ndarray], width: int, softmax: bool = False):
+        self.width = width
+        self.softmax = softmax
+        paths = list()
+        for tree, node_values in zip(trees, leaf_values):
+            paths.extend(self.tree_paths(tree.tree_, node_values))
+        depth = max(max(len(conditions) for _, conditions, _ in paths), 1)
+        leaves = len(paths)
+        outputs = paths[0][0].shape[0]
+
+        self.values = np.zeros((leaves, outputs))
+        self.condition_feature = np.zeros((leaves, depth), dtype=np.intp)
+        self.condition_threshold = np.full((leaves, depth), np.inf)
+        self.condition_left = np.ones((leaves, depth), dtype=bool)
+        self.condition_slot = np.zeros((leaves, depth, depth))
+        self.slot_feature = np.zeros((leaves, depth), dtype=np.intp)
+        self.slot_fraction = np.ones((leaves, depth))
+        self.slot_valid = np.zeros((leaves, depth), dtype=bool)
+        self.weights = np.zeros((leaves, depth + 1, depth + 1))
+        coverage = np.zeros(leaves)
+        for leaf, (value, conditions, slots) in enumerate(paths):
+            self.values[leaf] = value
+            coverage[leaf] = np.prod([fraction for _, fraction in slots])
+            for index, (feature, threshold, left, slot) in enumerate(conditions):
+                self.condition_feature[leaf, index] = feature
+                self.condition_threshold[leaf, index] = threshold
+                self.condition_left[leaf, index] = left
+                self.condition_slot[leaf, index, slot] = 1
+            for slot, (feature, fraction) in enumerate(slots):
+                self.slot_feature[leaf, slot] = feature
+                self.slot_fraction[leaf, slot] = fraction
+                self.slot_valid[leaf, slot] = True
+            self.weights[leaf] = shapley_weights(len(slots), depth + 1)
+        self.expected_value = coverage @ self.values
+
+    @staticmethod
+    def tree_paths(structure, node_values: np.ndarray) -> list[tuple[np.ndarray, list, list]]:
+        """
+        Returns the value, the split conditions and the unique features (with the fraction of training samples that
+        follow the path at their splits) of every root to leaf path of a tree.
+
+        :param structure: sklearn.tree._tree.Tree
+        :param node_values: np.ndarray - The output values of every node of the tree
+        :return: list[tuple[np.ndarray, list, list]]
+        """
+        cover = structure.weighted_n_node_samples
+        paths = list()
+        stack = [(0, list(), dict())]
+        while stack:
+            node, conditions, slots = stack.pop()
+            left, right = structure.children_left[node], structure.children_right[node]
+            if left == -1:
+                unique = [None] * len(slots)
+                for feature, (slot, fraction) in slots.items():
+                    unique[slot] = (feature, fraction)
+                paths.append((node_values[node], conditions, unique))
+                continue
+            feature = int(structure.feature[node])
+            threshold = float(structure.threshold[node])
+            for child, is_left in ((left, True), (right, False)):
+                slot, fraction = slots.get(feature, (len(slots), 1.0))
+                child_slots = {**slots, feature: (slot, fraction * cover[child] / cover[node])}
+                stack.append((child, conditions + [(feature, threshold, is_left, slot)], child_slots))
+        return paths
+
+    def follows(self, data: list | np.ndarray) -> np.ndarray:
+        """
+        Returns whether a single sample satisfies every split condition on the path of every leaf.
+
+        The sample is converted to float32 before the comparisons, exactly as the sklearn trees do.
+
+        :param data: list | np.ndarray
+        :return: np.ndarray
+        """
+        vector = np.asarray(data, dtype=np.float32)
+        return (vector[self.condition_feature] <= self.condition_threshold) == self.condition_left
+
+    def predict(self, data: list | np.ndarray) -> np.ndarray:
+        """
+        Calculates the outputs of the ensemble for a single sample, the sum of the values of the leaves it reaches.
+
+        :param data: list | np.ndarray
+        :return: np.ndarray
+        """
+        return self.values[self.follows(data).all(axis=1)].sum(axis=0)
+
+    def shap_values(self, data: list | np.ndarray, output: int) -> np.ndarray:
+        """
+        Calculates the SHAP value of every feature for one output of the ensemble and a single sample.
+
+        The values sum to the output for the sample minus the expected output.
+
+        :param data: list | np.ndarray
+        :param output: int
+        :return: np.ndarray
+        """
+        follows = self.follows(data)
+        # o_j is 1 if the sample follows the path at every split on the feature, padded slots contribute a factor 1.
+        failures = np.einsum("ld,ldu->lu", (~follows).astype(np.float64), self.condition_slot)
+        one = ((failures == 0) & self.slot_valid).astype(np.float64)
+        zero = self.slot_fraction
+        leaves, slots = one.shape
+
+        prefix = np.zeros((leaves, slots + 1, slots + 1))
+        suffix = np.zeros((leaves, slots + 1, slots + 1))
+        prefix[:, 0, 0] = 1
+        suffix[:, slots, 0] = 1
+        for j in range(slots):
+            prefix[:, j + 1] = zero[:, j, np.newaxis] * prefix[:, j]
+            prefix[:, j + 1, 1:] += one[:, j, np.newaxis] * prefix[:, j, :-1]
+            k = slots - 1 - j
+            suffix[:, k] = zero[:, k, np.newaxis] * suffix[:, k + 1]
+            suffix[:, k, 1:] += one[:, k, np.newaxis] * suffix[:, k + 1, :-1]
+        coalitions = (np.matmul(prefix[:, :slots], self.weights) * suffix[:, 1:]).sum(axis=2)
+
+        contributions = self.values[:, output, np.newaxis] * (one - zero) * coalitions * self.slot_valid
+        return np.bincount(self.slot_feature.ravel(), weights=contributions.ravel(), minlength=self.width)
+
+    def probability_values(self, data: list | np.ndarray, output: int) -> np.ndarray:
+        """
+        Calculates the SHAP value of every feature for one class probability and a single sample.
+
+        If the outputs are probabilities these are the exact SHAP values. If they are a decision function converted by a
+        softmax, the exact SHAP values of the decision function are scaled to sum to the difference between the
+        probability of the sample and the probability at the expected decision function.
+
+        :param data: list | np.ndarray
+        :param output: int
+        :return: np.ndarray
+        """
+        values = self.shap_values(data, output)
+        if not self.softmax:
+            return values
+        total = values.sum()
+        if abs(total) <= 1e-12:
+            return values
+        probability = softmax(self.predict(data))[output]
+        expected = softmax(self.expected_value)[output]
+        return values * (probability - expected) / total
+
+
+def forest_explainer(model: RandomForestClassifier, width: int) -> TreeShapExplainer:
+    """
+    Returns the TreeSHAP explainer of a fitted RandomForestClassifier, explaining its class probabilities.
+
+    The leaf values are the normalised class probabilities divided by the number of trees, so the sum over the leaves
+    reached is the mean probability returned by predict_proba.
+
+    :param model: RandomForestClassifier
+    :param width: int
+    :return: TreeShapExplainer
+    """
+    values = list()
+    for tree in model.estimators_:
+        value = tree.tree_.value[:, 0, :].astype(np.float64)
+        normaliser = value.sum(axis=1)[:, np.newaxis]
+        normaliser[normaliser == 0.0] = 1.0
+        values.append(value / normaliser / len(model.estimators_))
+    return TreeShapExplainer(model.estimators_, values, width)
+
+
+def adaboost_explainer(model: AdaBoostClassifier, width: int) -> TreeShapExplainer:
+    """
+    Returns the TreeSHAP explainer of a fitted SAMME.R AdaBoostClassifier, explaining its decision function.
+
+    The leaf values are the centred log probabilities divided by the sum of the estimator weights, so the sum over the
+    leaves reached is the decision function which predict_proba converts with a softmax. Raises ValueError for other
+    algorithms and for binary models.
+
+    :param model: AdaBoostClassifier
+    :param width: int
+    :return: TreeShapExplainer
+    """
+    n_classes = len(model.classes_)
+    if model.algorithm != "SAMME.R" or n_classes < 3:
+        raise ValueError("Only multi-class SAMME.R AdaBoost models can be explained with TreeSHAP")
+    weight = model.estimator_weights_.sum()
+    values = list()
+    for tree in model.estimators_:
+        value = tree.tree_.value[:, 0, :].astype(np.float64)
+        normaliser = value.sum(axis=1)[:, np.newaxis]
+        normaliser[normaliser == 0.0] = 1.0
+        value = np.log(np.clip(value / normaliser, np.finfo(np.float64).eps, None))
+        values.append((value - value.mean(axis=1, keepdims=True)) / weight)
+    return TreeShapExplainer(model.estimators_, values, width, softmax=True)
+
+
+def occlusion_values(model, data: list | np.ndarray, background: np.ndarray, slots: dict, output: int) -> dict:
+    """
+    Approximates the SHAP value of every feature for one class probability of any model, returns a dict of feature:
+    value.
+
+    Each feature (all columns of a one-hot encoded feature together) is replaced by its background value in turn and
+    the change in probability is taken as its impact. The impacts are then scaled so they sum to the difference
+    between the probability of the sample and of the background, as SHAP values do. Requires len(slots) + 2 rows.
+
+    :param model: fitted estimator with predict_proba
+    :param data: list | np.ndarray
+    :param background: np.ndarray - The reference feature vector, e.g. the mean of the training data
+    :param slots: dict - The column (or columns) of every feature
+    :param output: int
+    :return: dict
+    """
+    vector = np.asarray(data, dtype=np.float64)
+    rows = np.repeat(vector[np.newaxis, :], len(slots) + 2, axis=0)
+    rows[1] = background
+    for row, columns in enumerate(slots.values(), start=2):
+        rows[row, columns] = background[columns]
+    probabilities = model.predict_proba(rows)[:, output]
+    impacts = probabilities[0] - probabilities[2:]
+    total = impacts.sum()
+    if abs(total) > 1e-12:
+        impacts = impacts * (probabilities[0] - probabilities[1]) / total
+    return dict(zip(slots.keys(), impacts.tolist()))
@@ -0,0 +1,196 @@
+from db import student_iqr_percentiles
+from feature_translation import get_codec, get_dataset_schema, get_dict_key_by_value
+import logging
+import numpy as np
+
+logging.getLogger(__name__)
+
+
+class CounterfactualPlan:
+    """
+        This class contains every perturbed feature vector generated for a single data sample and the methods required
+        to turn the scores for those vectors into a feature analysis.
+
+
+        Attributes
+
+        data: list - The original (unaltered) feature vector for the sample
+
+        vector: np.ndarray - The original feature vector as a numeric array
+
+        schema: dict - The dataset schema used to build the plan
+
+        matrix: np.ndarray - All feature vectors to be scored, the first row is always the original sample
+
+        blocks: list[tuple[str, int, int, bool]] - One entry per analysed feature containing the feature name, the first
+                                                   and last (exclusive) row of its perturbations in the matrix and
+                                                   whether the result is the best of a sweep (True) or a single
+                                                   alteration (False)
+
+
+        Methods
+
+        add_block: None - Adds the perturbations for a single feature to the plan.
+
+        build: np.ndarray - Stacks the original sample and all perturbations into a single matrix.
+
+        summarise: dict - Converts the probabilities for every row of the matrix into the feature analysis result.
+    """
+    def __init__(self, data: list, schema: dict):
+        self.data = data
+        self.vector = np.asarray(data, dtype=np.float64)
+        self.schema = schema
+        self.rows: list[np.ndarray] = [self.vector[np.newaxis, :]]
+        self.row_count = 1
+        self.blocks: list[tuple[str, int, int, bool]] = list()
+        self.matrix: np.ndarray | None = None
+
+    def add_block(self, feature: str, rows: np.ndarray, sweep: bool) -> None:
+        """
+        Adds the perturbations for a single feature to the plan.
+
+        :param feature: str
+        :param rows: np.ndarray
+        :param sweep: bool
+        :return: None
+        """
+        if not len(rows):
+            return
+        start = self.row_count
+        self.rows.append(rows)
+        self.row_count += len(rows)
+        self.blocks.append((feature, start, self.row_count, sweep))
+
+    def build(self) -> np.ndarray:
+        """
+        Stacks the original sample and all perturbations into a single matrix and returns it.
+
+        :return: np.ndarray
+        """
+        self.matrix = np.vstack(self.rows)
+        return self.matrix
+
+    def summarise(self, probabilities: np.ndarray, classes: list, graduate_index: int) -> dict:
+        """
+        Converts the averaged class probabilities for every row of the matrix into the feature analysis result.
+
+        Each feature is scored by the difference its perturbation makes to the graduate probability of the original
+        sample. Sweeps keep the largest positive difference, single alterations keep the difference as is. The results
+        are then grouped by meta-category and averaged over the number of features in each category.
+
+        :param probabilities: np.ndarray
+        :param classes: list
+        :param graduate_index: int
+        :return: dict
+        """
+        differences = probabilities[:, graduate_index] - probabilities[0, graduate_index]
+        impacts = list()
+        for feature, start, stop, sweep in self.blocks:
+            if sweep:
+                impacts.append((feature, max(0, float(differences[start:stop].max()))))
+            else:
+                impacts.append((feature, float(differences[start])))
+        return summarise_impacts(probabilities[0], impacts, classes, self.schema)
+
+
+def summarise_impacts(probabilities: np.ndarray, impacts: list[tuple[str, float]], classes: list, schema: dict) -> dict:
+    """
+    Converts the class probabilities of a sample and the impact of each of its features into the feature analysis.
+
+    The feature with the largest impact is the main feature. Positive impacts are grouped by meta-category and averaged
+    over the number of features in each category.
+
+    :param probabilities: np.ndarray - The class probabilities of the sample
+    :param impacts: list[tuple[str, float]] - The impact of each analysed feature on the graduate probability
+    :param classes: list
+    :param schema: dict
+    :return: dict
+    """
+    prediction_index = int(np.argmax(probabilities))
+    prediction_class = classes[prediction_index]
+    prediction_score = float(probabilities[prediction_index])
+    graduate = prediction_class == "Graduate"
+
+    feature_dict = dict()
+    feature_strength = 0
+    feature_main = ""
+    for feature, difference in impacts:
+        if difference > feature_strength:
+            feature_strength = difference
+            feature_main = feature
+
+        if difference <= 0:
+            continue
+
+        category = schema["variable_categories"][feature]
+        if feature_dict.get(category):
+            feature_dict[category] = feature_dict.get(category) + difference
+        else:
+            feature_dict[category] = difference
+
+    for key, value in feature_dict.items():
+        count = len(list(filter(lambda x: x == key, schema["variable_categories"].values())))
+        feature_dict[key] = value / count
+
+    optimum_category_value = max(feature_dict.values()) if graduate else min(feature_dict.values())
+    optimum_category = get_dict_key_by_value(feature_dict, optimum_category_value)
+
+    return {
+        "label": prediction_class,
+        "score": prediction_score,
+        "feature_main": feature_main,
+        "feature_strength": feature_strength,
+        "optimum_category": optimum_category,
+        "optimum_category_value": optimum_category_value,
+        "feature_dict": feature_dict
+    }
+
+
+def feature_candidates(feature: str, value, schema: dict) -> tuple[list, bool] | None:
+    """
+    Returns the alternative values that are tested for a feature and whether they form a sweep, or None if skipped.
+
+    :param feature: str
+    :param value: str | int | float | bool
+    :param schema: dict
+    :return: tuple[list, bool] | None
+    """
+    if schema["variable_categories"][feature] == "static":
+        return None
+    if schema["variable_types"][feature] == "binary":
+        return [not value], False
+    if schema["variable_types"][feature] == "boolean":
+        categories = list(schema[feature].values())
+        categories.remove(value)
+        return [categories[0]], False
+    if schema["variable_types"][feature] == "one_hot_encoded":
+        meta_key = f"parental_{feature.split('_')[1]}_categories" if "mother" in feature or "father" in feature else feature
+        return list(schema[meta_key].values()), True
+    if schema["variable_types"][feature] == "numeric":
+        return student_iqr_percentiles(feature), True
+    return None
+
+
+def build_counterfactual_plan(data: list) -> CounterfactualPlan:
+    """
+    Generates every perturbed feature vector for a data sample and returns them as a CounterfactualPlan.
+
+    Binary features are flipped, boolean features are swapped, one-hot encoded features are set to every category in
+    turn and numeric features are set to every point of their percentile grid. The perturbed values are written
+    directly into copies of the original vector by the feature codec.
+
+    :param data: list
+    :return: CounterfactualPlan
+    """
+    schema = get_dataset_schema()
+    codec = get_codec()
+    plan = CounterfactualPlan(data, schema)
+    for key, value in codec.decode(data).items():
+        candidates = feature_candidates(key, value, schema)
+        if candidates is None:
+            continue
+        values, sweep = candidates
+        rows = np.repeat(plan.vector[np.newaxis, :], len(values), axis=0)
+        plan.add_block(key, codec.set_values(rows, key, values), sweep)
+    plan.build()
+    return plan
@@ -1,21 +1,31 @@
-from db import training_dataset, test_dataset, student_iqr_percentiles
-from feature_translation import features_hr, features_update, get_dataset_schema, get_dict_key_by_value
+from classifier.analysis_cache import AnalysisCache, analysis_key
+from classifier.artifacts import ARTIFACT_MEMBERS, dataset_fingerprint, load_artifact, save_artifact
+from classifier.attribution import TreeShapExplainer, adaboost_explainer, forest_explainer, occlusion_values
+from classifier.counterfactual_engine import CounterfactualPlan, build_counterfactual_plan, summarise_impacts
+from classifier.training import calibrate_member, fit_members, knn_member, svc_member
+from classifier.tree_evaluator import FlatTreeEnsemble, flatten_ensemble
+from db import get_controls, training_dataset, test_dataset
+from feature_translation import features_update, get_codec, get_dataset_schema
+import copy
+import hashlib
 import logging
 from model_development import class_stats
+import numpy as np
 import os
 import pickle
 import pandas as pd
 from pandas import DataFrame
 from sklearn.ensemble import RandomForestClassifier, AdaBoostClassifier
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.svm import SVC
+from system_tools.settings import ANALYSIS_CACHE_SHARED, ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_TTL, FLAT_TREE_MEMBERS
+from system_tools.settings import TRAINING_SPLIT_SEED
+import uuid
 
 logging.getLogger(__name__)
 
 
 def model_pickle_location() -> str:
     """
-    Returns path of pickle file containing model or path of the file to be created.
+    Returns path of the legacy pickle file containing the models, which is only loaded if no model artifact exists.
 
     :return: str
     """
@@ -35,6 +45,24 @@ def list_averages(*args) -> list:
 
 model_location = model_pickle_location()
 
+# Methods available to calculate the feature analysis, see Classifier.feature_analysis.
+ANALYSIS_METHODS = ("perturbation", "shap")
+
+
+def train_model_artifact() -> str | None:
+    """
+    Trains a new classifier, saves it as the latest model artifact and returns its version, or None if training failed.
+
+    Used to train the models in a separate process, the trained models are then loaded from the artifact.
+
+    :return: str | None
+    """
+    classifier = Classifier(initialise=False)
+    classifier.train()
+    if not classifier.trained:
+        return None
+    return classifier.save_model()
+
 
 class Classifier:
     """
@@ -47,7 +75,7 @@ class Classifier:
 
         rfc: RandomForestClassifier - Random Forest Classifier model
 
-        svc: SVC - Support Vector Classifier model
+        svc: SVC | CalibratedClassifierCV - Support Vector Classifier model, see SVC_MEMBER
 
         knn: KNeighborsClassifier - K-Nearest Neighbours model
 
@@ -61,6 +89,18 @@ class Classifier:
 
         training_attempts: int - The number of times the classifier training has been attempted
 
+        version: str | None - Identifies the trained models, changes whenever the models are trained or loaded
+
+        training_fingerprint: str | None - Identifies the training data the models were trained with, if known
+
+        feature_means: np.ndarray | None - The mean of every feature over the training data, the average student
+
+        analysis_cache: AnalysisCache - Cache of feature analysis results for this classifier
+
+        flat_members: dict - The flat array evaluators of the members listed in FLAT_TREE_MEMBERS
+
+        explainers: dict - The TreeSHAP explainers of the tree ensemble members, with the model they were built for
+
         average_accuracy: float | None - Calculates accuracy of the model by using the mean class precision
 
         error_rate: float | None - Calculates the error rate of the model by averaging the error rate per class
@@ -80,35 +120,63 @@ class Classifier:
 
         info: dict - Returns a dictionary containing the relevant information for this Classifier class instance.
 
+        metrics: dict - Returns a dictionary containing the evaluation metrics for this Classifier class instance.
+
         create_classes - Takes a list of classes and sets the values for classes and graduate_index variables.
 
+        flatten_members: None - Creates the flat array evaluators of the members listed in FLAT_TREE_MEMBERS.
+
         train: None - Trains the individual models using the training dataset.
 
-        save_model: None - Creates a pickle file which saves the individual models in their current state.
+        save_model: str - Saves the individual models in their current state as a versioned model artifact.
 
-        load_model: None - Attempts to load the individual models from the specified pickle file.
+        load_model: None - Attempts to load the individual models from a model artifact or the legacy pickle file.
+
+        stored_feature_means: np.ndarray - Returns the feature means stored with a model as an array.
 
         evaluate: None - Sets the evaluation metric variables.
 
         evaluate_individual_models: DataFrame - Generates evaluation statistics on an individual class basis.
 
+        member_probabilities: np.ndarray - Calculates the class probabilities of a single model for a matrix of data.
+
+        predict_probabilities: np.ndarray - Calculates the averaged class probabilities for a matrix of data.
+
+        predict_batch: tuple[np.ndarray, np.ndarray, np.ndarray] - Calculates the predictions for a matrix of data.
+
         predict: tuple[str, float] - Calculates the prediction for the given data.
 
         feature_difference: float - Calculate the impact of changing a feature.
 
         feature_analysis: dict - Calculates the impact of each feature for an individual data sample.
 
+        feature_analysis_batch: list[dict | Exception] - Calculates the feature analysis for several data samples.
+
+        explainer: TreeShapExplainer | None - Returns the TreeSHAP explainer of a tree ensemble member.
+
+        feature_attribution: dict - Calculates the SHAP attribution of each feature for an individual data sample.
+
+        analyse_plans: list[dict | Exception] - Scores the counterfactual plans of several data samples in one batch.
+
+        analyse_plan: dict - Scores the counterfactual plan of a single data sample.
+
     """
-    def __init__(self):
+    def __init__(self, initialise: bool = True):
         self.name = "classifier"
         self.rfc = RandomForestClassifier(max_depth=10, min_samples_leaf=1, n_estimators=90)
-        self.svc = SVC(probability=True, class_weight={"Graduate": 1, "Dropout": 1, "Enrolled": 1}, kernel='linear', C=1)
-        self.knn = KNeighborsClassifier(n_neighbors=10, algorithm='ball_tree', leaf_size=1)
+        self.svc = svc_member()
+        self.knn = knn_member()
         self.adb = AdaBoostClassifier(algorithm='SAMME.R', learning_rate=0.5, n_estimators=80)
         self.classes = list()
         self.graduate_index = None
         self.trained = False
         self.training_attempts = 0
+        self.version: str | None = None
+        self.training_fingerprint: str | None = None
+        self.feature_means: np.ndarray | None = None
+        self.analysis_cache = AnalysisCache(ANALYSIS_CACHE_SIZE, ANALYSIS_CACHE_TTL, ANALYSIS_CACHE_SHARED)
+        self.flat_members: dict[str, FlatTreeEnsemble] = dict()
+        self.explainers: dict[str, tuple[object, TreeShapExplainer | None]] = dict()
 
         # Evaluation
         self.average_accuracy = None
@@ -119,9 +187,10 @@ class Classifier:
         self.recall_macro = None
         self.f_score_macro = None
 
-        self.load_model()
-        if not self.trained:
-            self.train()
+        if initialise:
+            self.load_model()
+            if not self.trained:
+                self.train()
 
     def info(self) -> dict:
         """
@@ -133,6 +202,16 @@ class Classifier:
             "name": self.name,
             "classes": self.classes,
             "trained": self.trained,
+            **self.metrics()
+        }
+
+    def metrics(self) -> dict:
+        """
+        Returns a dictionary containing the evaluation metrics for this Classifier class instance.
+
+        :return: dict
+        """
+        return {
             "average_accuracy": self.average_accuracy,
             "error_rate": self.error_rate,
             "precision_micro": self.precision_micro,
@@ -153,58 +232,128 @@ class Classifier:
         self.classes = list(classes)
         self.graduate_index = list(classes).index("Graduate")
 
+    def flatten_members(self) -> None:
+        """
+        Creates the flat array evaluators of the tree ensemble members listed in FLAT_TREE_MEMBERS, replacing any
+        existing evaluators. Members that cannot be flattened keep using their own predict_proba.
+
+        :return: None
+        """
+        self.flat_members = dict()
+        for name in [name.strip() for name in FLAT_TREE_MEMBERS.split(",") if name.strip()]:
+            flat = flatten_ensemble(getattr(self, name, None))
+            if flat is not None:
+                self.flat_members[name] = flat
+
     def train(self) -> None:
         """
         Trains the individual models using the training dataset. Also sets the classes and trained variables.
 
+        The models are fitted concurrently if more than one core is available for training, see fit_members. A support
+        vector member without probability estimates is then calibrated on the validation split.
+
         :return: None
         """
         logging.info("training model from dataset ...")
-        [x_train, y_train], _ = training_dataset(True)
-        if not x_train or len(x_train) < 100:
+        [x_train, y_train], [x_val, y_val] = training_dataset(True, seed=TRAINING_SPLIT_SEED)
+        if len(x_train) < 100:
             self.training_attempts += 1
             return
-        self.rfc.fit(x_train, y_train)
-        self.svc.fit(x_train, y_train)
-        self.knn.fit(x_train, y_train)
-        self.adb.fit(x_train, y_train)
+        members = {name: getattr(self, name) for name in ARTIFACT_MEMBERS}
+        # A calibrated member wraps its fitted model, so every training run starts from a new one.
+        members["svc"] = svc_member()
+        models = fit_members(members, x_train, y_train)
+        models["svc"] = calibrate_member(models["svc"], x_val, y_val)
+        for name, model in models.items():
+            setattr(self, name, model)
         self.create_classes(self.rfc.classes_)
+        self.flatten_members()
         self.trained = True
+        self.version = uuid.uuid4().hex
+        self.training_fingerprint = dataset_fingerprint(x_train, y_train)
+        self.feature_means = np.asarray(x_train, dtype=np.float64).mean(axis=0)
         self.evaluate()
 
-    def save_model(self) -> None:
+    def save_model(self) -> str:
         """
-        Creates a pickle file which saves the individual models in their current state.
+        Saves the individual models in their current state as a new versioned model artifact. Returns the version.
 
-        If a pickle file already exists this file is deleted and replaced with a new file.
+        Each model is stored in its own file together with a manifest containing the evaluation metrics, the schema
+        fingerprint and the training data fingerprint, the artifact then becomes the latest artifact which is loaded by every worker.
 
-        :return: None
+        :return: str
         """
-        try:
-            if os.path.exists(model_location):
-                os.remove(model_location)
-        except Exception as e:
-            logging.error(f"Could not save model: {e}")
-            return
-        with open(model_location, "wb") as f:
-            pickle.dump([self.rfc, self.svc, self.knn, self.adb], f)
-            f.close()
+        models = {name: getattr(self, name) for name in ARTIFACT_MEMBERS}
+        manifest = {
+            "classes": self.classes,
+            "metrics": self.metrics(),
+            "training_fingerprint": self.training_fingerprint,
+            "feature_means": None if self.feature_means is None else self.feature_means.tolist(),
+        }
+        self.version = save_artifact(models, manifest, self.version)
+        return self.version
 
-    def load_model(self) -> None:
+    def load_model(self, version: str | None = None) -> None:
         """
-        Attempts to load the individual models from the specified pickle file and if successful set trained to true.
+        Attempts to load the individual models and if successful set trained to true.
+
+        The models are loaded from the requested (or latest) model artifact, with the arrays memory mapped so they are
+        shared between workers. If no artifact exists the models are loaded from the legacy pickle file instead.
 
+        :param version: str | None
         :return: None
         """
+        try:
+            models, manifest = load_artifact(version)
+            for name in ARTIFACT_MEMBERS:
+                setattr(self, name, models[name])
+            self.create_classes(self.rfc.classes_)
+            self.flatten_members()
+            for k, v in manifest.get("metrics", dict()).items():
+                setattr(self, k, v)
+            self.trained = True
+            self.version = manifest["version"]
+            self.training_fingerprint = manifest.get("training_fingerprint")
+            self.feature_means = self.stored_feature_means(manifest.get("feature_means"))
+            return
+        except FileNotFoundError:
+            if version is not None:
+                self.trained = False
+                logging.error(f"Failed to load model: artifact {version} does not exist")
+                return
+        except Exception as e:
+            self.trained = False
+            logging.error(f"Failed to load model artifact: {e}")
+            return
+
         try:
             with open(model_location, "rb") as f:
-                self.rfc, self.svc, self.knn, self.adb = pickle.load(f)
+                content = f.read()
+            self.rfc, self.svc, self.knn, self.adb = pickle.loads(content)
             self.create_classes(self.rfc.classes_)
+            self.flatten_members()
+            self.feature_means = self.stored_feature_means(None)
             self.trained = True
+            # Workers loading the same file share a version, so they can share cached results.
+            self.version = hashlib.sha256(content).hexdigest()
         except Exception as e:
             self.trained = False
             logging.error(f"Failed to load model: {e}")
 
+    def stored_feature_means(self, means: list | None) -> np.ndarray:
+        """
+        Returns the feature means stored with a model as an array.
+
+        Models saved before the means were stored only keep the training data in the k-nearest neighbours member, the
+        means are then calculated from it once when the model is loaded.
+
+        :param means: list | None
+        :return: np.ndarray
+        """
+        if means is not None:
+            return np.asarray(means, dtype=np.float64)
+        return np.asarray(self.knn._fit_X, dtype=np.float64).mean(axis=0)
+
     def evaluate(self, training: bool = False) -> None:
         """
         Sets the various evaluation metrics by applying them to the predictions for the evaluation dataset.
@@ -216,14 +365,14 @@ class Classifier:
         """
         [x_test, y_test] = test_dataset()
         if training:
-            [x_train, y_train], [x_val, y_val] = training_dataset(True)
-            training_predictions = [self.predict(i)[0] for i in x_train]
+            [x_train, y_train], [x_val, y_val] = training_dataset(True, seed=TRAINING_SPLIT_SEED)
+            training_predictions = list(self.predict_batch(x_train)[0])
             training_cs = class_stats("Training Model", self.classes, training_predictions, y_train)
             logging.info(f"class stats for classifier training: {training_cs}")
-            eval_predictions = [self.predict(i)[0] for i in x_val]
+            eval_predictions = list(self.predict_batch(x_val)[0])
             eval_cs = class_stats("classifier", self.classes, eval_predictions, y_val)
             logging.info(f"class stats for classifier evaluation: {training_cs}")
-        test_predictions = [self.predict(i)[0] for i in x_test]
+        test_predictions = list(self.predict_batch(x_test)[0])
         cs = class_stats("classifier", self.classes, test_predictions, y_test)
         for k, v in cs.items():
             setattr(self, k, v)
@@ -238,10 +387,10 @@ class Classifier:
         :return: DataFrame
         """
         evaluation_df = pd.DataFrame()
-        [_, _], [x_val, y_val] = training_dataset(True)
+        [_, _], [x_val, y_val] = training_dataset(True, seed=TRAINING_SPLIT_SEED)
         for k, v in {"Random Forest": self.rfc, "SVC": self.svc, "KNN": self.knn, "Adaboost": self.adb}.items():
-            predictions_raw = [v.predict_proba([i])[0] for i in x_val]
-            predictions = [self.classes[list(prediction).index(max(prediction))] for prediction in predictions_raw]
+            predictions_raw = v.predict_proba(x_val)
+            predictions = list(np.asarray(self.classes)[predictions_raw.argmax(axis=1)])
             cs = class_stats(k, list(v.classes_), predictions, y_val)
             cs_dict = {k: [v] for k, v in cs.items()}
             evaluation_df = pd.concat([pd.DataFrame.from_dict(cs_dict, orient="columns"), evaluation_df], join='outer')
@@ -249,6 +398,59 @@ class Classifier:
             evaluation_df.to_csv("model_evaluation.csv")
         return evaluation_df
 
+    def member_probabilities(self, name: str, data: np.ndarray) -> np.ndarray:
+        """
+        Calculates the class probabilities of a single model for every row of the given data, using its flat array
+        evaluator if it has one.
+
+        :param name: str
+        :param data: np.ndarray
+        :return: np.ndarray
+        """
+        flat = self.flat_members.get(name)
+        if flat is not None:
+            return flat.predict_proba(data)
+        return getattr(self, name).predict_proba(data)
+
+    def predict_probabilities(self, data: np.ndarray | list[list[float | int]]) -> np.ndarray:
+        """
+        Calculates the averaged class probabilities of the individual models for every row of the given data.
+
+        Each model scores the whole matrix with a single predict_proba call, the results are then averaged element
+        wise. Returns an array of shape (rows, classes) with the columns in the same order as the classes variable.
+
+        :param data: np.ndarray | list[list[float | int]]
+        :return: np.ndarray
+        """
+        try:
+            assert self.trained
+        except AssertionError:
+            self.train()
+        if self.training_attempts > 1:
+            raise AssertionError("Model not trained - could not continue")
+        data = np.asarray(data, dtype=np.float64)
+        rfc_prediction = self.member_probabilities("rfc", data)
+        svc_prediction = self.member_probabilities("svc", data)
+        knn_prediction = self.member_probabilities("knn", data)
+        adb_prediction = self.member_probabilities("adb", data)
+        return (rfc_prediction + svc_prediction + knn_prediction + adb_prediction) / 4
+
+    def predict_batch(self, data: np.ndarray | list[list[float | int]]) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Calculates the predictions for every row of the given data. Returns the labels, graduate and max probabilities.
+
+        The data is expected to be a matrix of shape (samples, features), each returned array has one entry per sample.
+
+        :param data: np.ndarray | list[list[float | int]]
+        :return: tuple[np.ndarray, np.ndarray, np.ndarray]
+        """
+        probabilities = self.predict_probabilities(data)
+        prediction_indexes = probabilities.argmax(axis=1)
+        labels = np.asarray(self.classes)[prediction_indexes]
+        graduate_probabilities = probabilities[:, self.graduate_index]
+        max_probabilities = probabilities[np.arange(len(probabilities)), prediction_indexes]
+        return labels, graduate_probabilities, max_probabilities
+
     def predict(self, data: list[float | int], graduate: bool = False) -> tuple[str, float]:
         """
         Calculates the prediction for the given data and returns the relevant label and probability score.
@@ -261,20 +463,10 @@ class Classifier:
         :return: tuple[str, float]
 
         """
-        try:
-            assert self.trained
-        except AssertionError:
-            self.train()
-        if self.training_attempts > 1:
-            raise AssertionError("Model not trained - could not continue")
-        rfc_prediction = self.rfc.predict_proba([data])[0]
-        svc_prediction = self.svc.predict_proba([data])[0]
-        knn_prediction = self.knn.predict_proba([data])[0]
-        adb_prediction = self.adb.predict_proba([data])[0]
-        prediction = list_averages(rfc_prediction, svc_prediction, knn_prediction, adb_prediction)
+        prediction = list(self.predict_probabilities([data])[0])
         if graduate:
-            return self.classes[self.graduate_index], prediction[self.graduate_index]
-        return self.classes[list(prediction).index(max(prediction))], max(prediction)
+            return self.classes[self.graduate_index], float(prediction[self.graduate_index])
+        return self.classes[prediction.index(max(prediction))], float(max(prediction))
 
     def feature_difference(self, data: list, feature: str, new_value: str | int | float | bool) -> float:
         """
@@ -293,76 +485,180 @@ class Classifier:
         _, edited_score = self.predict(data_updated, True)
         return edited_score - prediction_score
 
-    def feature_analysis(self, data: list) -> dict:
+    def feature_analysis(self, data: list, method: str = "perturbation") -> dict:
         """
         Calculates the impact of each feature for an individual data sample. Returns a dict of the results.
 
+        The method is either "perturbation" (described below) or "shap", see feature_attribution. Both return results
+        of the same shape. Raises ValueError for any other method.
+
         Each feature is analysed independently to ascertain the difference that altering the value of that feature
         makes. The features are also grouped by meta-categories, so the analysis also explores the combined effect of
         each of these meta-categories to determine which one have the greatest impressing on the overall score.
 
+        Every altered version of the sample is generated up front and scored together with the original sample in a
+        single batch, so each model is only called once per analysis. Results are cached per feature vector and model
+        version, and identical analyses requested at the same time are only calculated once.
+
         :param data: list
+        :param method: str
         :return: dict
         """
-        feature_dict = dict()
-        feature_strength = 0
-        feature_main = ""
-        schema = get_dataset_schema()
-        prediction_class, prediction_score = self.predict(data)
-        graduate = prediction_class == "Graduate"
-        for key, value in features_hr(data).items():
-            if schema["variable_categories"][key] == "static":
+        if method not in ANALYSIS_METHODS:
+            raise ValueError(f"Unknown analysis method: {method}")
+        key = analysis_key(data, self.version, get_controls().generation, method)
+        if method == "shap":
+            return self.analysis_cache.get_or_compute(key, lambda: self.feature_attribution(data))
+        return self.analysis_cache.get_or_compute(key, lambda: self.analyse_plan(build_counterfactual_plan(data)))
+
+    def feature_analysis_batch(self, data: list[list]) -> list[dict | Exception]:
+        """
+        Calculates the feature analysis for several data samples, scoring every uncached sample in a single batch.
+
+        Samples whose analysis is cached (or being calculated by another request) are not recalculated. A sample that
+        cannot be analysed receives the exception in place of its result, so it does not affect the rest of the batch.
+
+        :param data: list[list]
+        :return: list[dict | Exception]
+        """
+        generation = get_controls().generation
+        results: list = [None] * len(data)
+        keys = [analysis_key(i, self.version, generation) for i in data]
+        owned = dict()
+        waiting = dict()
+        for index, key in enumerate(keys):
+            cached = self.analysis_cache.lookup(key)
+            if cached is not None:
+                results[index] = cached
                 continue
-            if schema["variable_types"][key] == "binary":
-                difference = self.feature_difference(data, key, not value)
-            elif schema["variable_types"][key] == "boolean":
-                categories = list(schema[key].values())
-                categories.remove(value)
-                difference = self.feature_difference(data, key, categories[0])
-            elif schema["variable_types"][key] == "one_hot_encoded":
-                diff_final = 0
-                meta_key = f"parental_{key.split('_')[1]}_categories" if "mother" in key or "father" in key else key
-                for v in schema[meta_key].values():
-                    diff_temp = self.feature_difference(data, key, v)
-                    if diff_temp > diff_final:
-                        diff_final = diff_temp
-                difference = diff_final
-            elif schema["variable_types"][key] == "numeric":
-                diff_final = 0
-                for v in student_iqr_percentiles(key):
-                    diff_temp = self.feature_difference(data, key, v)
-                    if diff_temp > diff_final:
-                        diff_final = diff_temp
-                difference = diff_final
-            else:
+            if key in owned:
+                waiting[index] = owned[key][1]
                 continue
+            owner, future = self.analysis_cache.claim(key)
+            if owner:
+                owned[key] = (index, future)
+            else:
+                waiting[index] = future
+
+        plans = dict()
+        for key, (index, _) in owned.items():
+            try:
+                plans[key] = build_counterfactual_plan(data[index])
+            except Exception as e:
+                self.analysis_cache.resolve(key, error=e)
+        try:
+            analysed = self.analyse_plans(list(plans.values())) if plans else list()
+        except Exception as e:
+            for key in plans.keys():
+                self.analysis_cache.resolve(key, error=e)
+            raise
+        for key, result in zip(plans.keys(), analysed):
+            if isinstance(result, Exception):
+                self.analysis_cache.resolve(key, error=result)
+            else:
+                self.analysis_cache.resolve(key, result)
+        for key, (index, future) in owned.items():
+            waiting[index] = future
+
+        for index, future in waiting.items():
+            try:
+                results[index] = copy.deepcopy(future.result())
+            except Exception as e:
+                results[index] = e
+        return results
+
+    def explainer(self, name: str) -> TreeShapExplainer | None:
+        """
+        Returns the TreeSHAP explainer of a tree ensemble member, or None if the member cannot be explained with
+        TreeSHAP. Explainers are built on first use and rebuilt whenever the member changes.
 
-            if difference > feature_strength:
-                feature_strength = difference
-                feature_main = key
+        :param name: str
+        :return: TreeShapExplainer | None
+        """
+        model = getattr(self, name)
+        built = self.explainers.get(name)
+        if built is not None and built[0] is model:
+            return built[1]
+        try:
+            if name == "rfc":
+                explainer = forest_explainer(model, model.n_features_in_)
+            elif name == "adb":
+                explainer = adaboost_explainer(model, model.n_features_in_)
+            else:
+                explainer = None
+        except (AttributeError, ValueError) as e:
+            logging.warning(f"Could not build the TreeSHAP explainer of {name}, using occlusion instead: {e}")
+            explainer = None
+        self.explainers[name] = (model, explainer)
+        return explainer
+
+    def feature_attribution(self, data: list) -> dict:
+        """
+        Calculates the SHAP attribution of each feature for an individual data sample. Returns a dict of the results in
+        the same shape as the perturbation analysis.
 
-            if difference <= 0:
-                continue
+        The attribution of a feature is its contribution to the graduate probability of the sample compared to the
+        average student, so it requires no perturbed samples. It is calculated exactly with TreeSHAP for the tree
+        ensemble members and approximated for the other members by replacing one feature at a time with its mean over
+        the training data. The attributions of the columns of one-hot encoded features are added up and the features
+        are grouped by meta-category in the same way as the perturbation analysis.
 
-            category = schema["variable_categories"][key]
-            if feature_dict.get(category):
-                feature_dict[category] = feature_dict.get(category) + difference
+        :param data: list
+        :return: dict
+        """
+        schema = get_dataset_schema()
+        codec = get_codec()
+        slots = {
+            feature: codec.slots[feature] for feature in codec.features
+            if schema["variable_categories"][feature] != "static" and codec.types[feature] != "ordinal"
+        }
+        vector = np.asarray(data, dtype=np.float64)
+        probabilities = self.predict_probabilities(vector[np.newaxis, :])[0]
+        background = self.feature_means
+
+        impacts = dict.fromkeys(slots, 0.0)
+        for name in ARTIFACT_MEMBERS:
+            explainer = self.explainer(name)
+            if explainer is None:
+                member_impacts = occlusion_values(getattr(self, name), vector, background, slots, self.graduate_index)
             else:
-                feature_dict[category] = difference
+                values = explainer.probability_values(vector, self.graduate_index)
+                member_impacts = {feature: float(np.sum(values[columns])) for feature, columns in slots.items()}
+            for feature, impact in member_impacts.items():
+                impacts[feature] += impact / len(ARTIFACT_MEMBERS)
+        return summarise_impacts(probabilities, list(impacts.items()), self.classes, schema)
+
+    def analyse_plans(self, plans: list[CounterfactualPlan]) -> list[dict | Exception]:
+        """
+        Scores the counterfactual plans of several data samples together and returns the feature analysis of each.
 
-        for key, value in feature_dict.items():
-            count = len(list(filter(lambda x: x == key, schema["variable_categories"].values())))
-            feature_dict[key] = value / count
+        The matrices of all plans are stacked so each model is only called once for the whole set of samples, the
+        probabilities are then split back up and summarised per plan. Results are returned in the order of the plans, a
+        plan that cannot be summarised receives the exception in place of its result.
 
-        optimum_category_value = max(feature_dict.values()) if graduate else min(feature_dict.values())
-        optimum_category = get_dict_key_by_value(feature_dict, optimum_category_value)
+        :param plans: list[CounterfactualPlan]
+        :return: list[dict | Exception]
+        """
+        probabilities = self.predict_probabilities(np.vstack([plan.matrix for plan in plans]))
+        results = list()
+        start = 0
+        for plan in plans:
+            stop = start + len(plan.matrix)
+            try:
+                results.append(plan.summarise(probabilities[start:stop], self.classes, self.graduate_index))
+            except Exception as e:
+                results.append(e)
+            start = stop
+        return results
+
+    def analyse_plan(self, plan: CounterfactualPlan) -> dict:
+        """
+        Scores the counterfactual plan of a single data sample and returns its feature analysis.
 
-        return {
-            "label": prediction_class,
-            "score": prediction_score,
-            "feature_main": feature_main,
-            "feature_strength": feature_strength,
-            "optimum_category": optimum_category,
-            "optimum_category_value": optimum_category_value,
-            "feature_dict": feature_dict
-        }
+        :param plan: CounterfactualPlan
+        :return: dict
+        """
+        result = self.analyse_plans([plan])[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
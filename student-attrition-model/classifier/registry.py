@@ -0,0 +1,178 @@
+from classifier.artifacts import artifacts_location, latest_artifact_version, read_manifest, set_latest_artifact
+from classifier.model_classifier import Classifier
+from db import test_feature_sample
+import logging
+import os
+from system_tools.settings import MODEL_WARMUP_SAMPLES
+import threading
+
+logging.getLogger(__name__)
+
+
+def registered_models(location: str | None = None) -> list[dict]:
+    """
+    Returns the manifests of all saved model artifacts, most recently created first.
+
+    :param location: str | None
+    :return: list[dict]
+    """
+    location = location or artifacts_location()
+    if not os.path.isdir(location):
+        return list()
+    manifests = list()
+    for version in os.listdir(location):
+        if version.startswith(".") or not os.path.exists(os.path.join(location, version, "manifest.json")):
+            continue
+        try:
+            manifests.append(read_manifest(version, location))
+        except Exception as e:
+            logging.error(f"Could not read the manifest of model artifact {version}: {e}")
+    return sorted(manifests, key=lambda x: x.get("created_at", ""), reverse=True)
+
+
+class ModelRegistry:
+    """
+        This class contains all properties and methods for serving a classifier and replacing it with other versions.
+
+        Requests read the current classifier once and use that reference until they complete, so activating a version
+        never affects requests in flight: they finish on the classifier they started with while new requests are served
+        by the new one.
+
+
+        Attributes
+
+        current: Classifier - The classifier currently serving requests
+
+        swaps: int - The number of times a new version has been activated
+
+        lock: threading.Lock - Guards the reference to the current classifier
+
+        activation_lock: threading.Lock - Ensures only one version is activated at a time
+
+
+        Methods
+
+        versions: list[dict] - Returns the manifests of all saved model artifacts, marking the active one.
+
+        warm: None - Runs a classifier on sample data so its first requests are not slowed down.
+
+        activate: dict - Loads and warms a version alongside the current classifier, then swaps it in.
+
+        swap: Classifier - Makes a loaded classifier current and returns the previous one.
+
+        ensure: Classifier - Returns the current classifier after loading the given version if another one is current.
+
+        status: dict - Returns the version and statistics of the current classifier.
+    """
+    def __init__(self, current: Classifier):
+        self.current = current
+        self.swaps = 0
+        self.lock = threading.Lock()
+        self.activation_lock = threading.Lock()
+
+    def versions(self) -> list[dict]:
+        """
+        Returns the manifests of all saved model artifacts, most recently created first, marking the active and latest.
+
+        :return: list[dict]
+        """
+        current = self.current.version
+        latest = latest_artifact_version()
+        return [
+            {**manifest, "active": manifest["version"] == current, "latest": manifest["version"] == latest}
+            for manifest in registered_models()
+        ]
+
+    @staticmethod
+    def warm(classifier: Classifier) -> None:
+        """
+        Runs a classifier on a sample of test students, which loads its memory mapped arrays and the cached controls.
+
+        :param classifier: Classifier
+        :return: None
+        """
+        sample = test_feature_sample(MODEL_WARMUP_SAMPLES)
+        if not sample:
+            return
+        classifier.predict_probabilities(sample)
+        classifier.feature_analysis(sample[0])
+
+    def activate(self, version: str, persist: bool = True) -> dict:
+        """
+        Loads the given version alongside the current classifier, warms it and swaps it in. Returns the new manifest.
+
+        If persist is True the version also becomes the latest artifact, so it is loaded when the app restarts.
+        Raises FileNotFoundError if the version does not exist and ValueError if it cannot be loaded.
+
+        :param version: str
+        :param persist: bool
+        :return: dict
+        """
+        with self.activation_lock:
+            manifest = read_manifest(version)
+            candidate = Classifier(initialise=False)
+            candidate.load_model(version)
+            if not candidate.trained:
+                raise ValueError(f"Model artifact {version} could not be loaded")
+            self.warm(candidate)
+            previous = self.swap(candidate)
+            if persist:
+                set_latest_artifact(version)
+            logging.info(f"Activated model {version}, replacing {previous.version}")
+            return manifest
+
+    def swap(self, candidate: Classifier) -> Classifier:
+        """
+        Makes the loaded classifier current and returns the classifier it replaces.
+
+        :param candidate: Classifier
+        :return: Classifier
+        """
+        with self.lock:
+            previous = self.current
+            self.current = candidate
+            self.swaps += 1
+        return previous
+
+    def ensure(self, version: str | None) -> Classifier:
+        """
+        Returns the current classifier, first loading the given version if a different one is current.
+
+        Process pool workers hold their own registry, the serving process passes the version it has active with every
+        task so the workers follow every activation. Raises ValueError if the version cannot be loaded.
+
+        :param version: str | None - The version to serve, None serves the current classifier
+        :return: Classifier
+        """
+        current = self.current
+        if version is None or current.version == version:
+            return current
+        with self.activation_lock:
+            if self.current.version == version:
+                return self.current
+            candidate = Classifier(initialise=False)
+            candidate.load_model(version)
+            if not candidate.trained:
+                # Versions of the legacy model file are not artifacts, they can only be loaded as the default model.
+                candidate.load_model()
+            if not candidate.trained or candidate.version != version:
+                raise ValueError(f"Model {version} could not be loaded")
+            self.swap(candidate)
+            logging.info(f"Loaded model {version} in worker")
+            return candidate
+
+    def status(self) -> dict:
+        """
+        Returns the version and statistics of the current classifier.
+
+        :return: dict
+        """
+        with self.lock:
+            current = self.current
+            swaps = self.swaps
+        return {
+            "version": current.version,
+            "training_fingerprint": current.training_fingerprint,
+            "trained": current.trained,
+            "swaps": swaps,
+        }
@@ -0,0 +1,51 @@
+from classifier.analysis_cache import AnalysisCache, analysis_key
+import threading
+import time
+
+
+def test_analysis_key():
+    assert analysis_key([1, 0, 2.5], "version", 1) == analysis_key([1.0, 0.0, 2.5], "version", 1)
+    assert analysis_key([1, 0, 2.5], "version", 1) != analysis_key([1, 0, 2.5], "version", 2)
+    assert analysis_key([1, 0, 2.5], "version", 1) != analysis_key([1, 0, 2.5], "other", 1)
+    assert analysis_key([1, 0, 2.5], "version", 1) != analysis_key([1, 0, 2.5], "version", 1, "shap")
+
+
+def test_analysis_cache_lru_ttl():
+    cache = AnalysisCache(max_entries=2, ttl=1)
+    cache.store("a", {"score": 1})
+    cache.store("b", {"score": 2})
+    assert cache.lookup("a") == {"score": 1}
+    cache.store("c", {"score": 3})
+    assert cache.lookup("b") is None
+    assert cache.lookup("a") == {"score": 1}
+    time.sleep(1.1)
+    assert cache.lookup("c") is None
+
+
+def test_analysis_cache_single_flight():
+    cache = AnalysisCache(max_entries=8, ttl=60)
+    calls = list()
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"score": 1}
+
+    threads = [threading.Thread(target=lambda: cache.get_or_compute("key", compute)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert cache.get_or_compute("key", compute) == {"score": 1}
+    assert len(calls) == 1
+
+
+def tests():
+    test_analysis_key()
+    test_analysis_cache_lru_ttl()
+    test_analysis_cache_single_flight()
+
+
+if __name__ == "__main__":
+    tests()
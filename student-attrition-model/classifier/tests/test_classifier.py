@@ -1,5 +1,9 @@
+from classifier.counterfactual_engine import build_counterfactual_plan
 from classifier.model_classifier import Classifier
+from classifier.tree_evaluator import flatten_ensemble
+from feature_translation import features_hr
 from db import training_dataset
+import numpy as np
 
 sample_data = training_dataset()
 test_label = training_dataset()[1][0]
@@ -24,6 +28,17 @@ def test_classifier_prediction():
     print(classifier.predict(sample_data[0][0]))
 
 
+def test_classifier_prediction_batch():
+    classifier = Classifier()
+    labels, graduate_scores, scores = classifier.predict_batch(sample_data[0][:25])
+    assert len(labels) == len(graduate_scores) == len(scores) == 25
+    for index, features in enumerate(sample_data[0][:25]):
+        label, score = classifier.predict(features)
+        assert labels[index] == label
+        assert abs(scores[index] - score) < 1e-12
+        assert abs(graduate_scores[index] - classifier.predict(features, True)[1]) < 1e-12
+
+
 def test_classifier_feature_importance():
     classifier = Classifier()
     print(f"label: {sample_data[1][0]}")
@@ -36,6 +51,39 @@ def test_classifier_feature_importance():
     print(classifier.feature_analysis(sample_data[0][25]))
 
 
+def test_classifier_feature_analysis_batched():
+    classifier = Classifier()
+    plan = build_counterfactual_plan(sample_data[0][0])
+    probabilities = classifier.predict_probabilities(plan.matrix)
+    assert probabilities.shape == (len(plan.matrix), len(classifier.classes))
+    for feature, start, stop, sweep in plan.blocks:
+        difference = classifier.feature_difference(sample_data[0][0], feature, features_hr(plan.matrix[start].tolist())[feature])
+        assert abs(difference - (probabilities[start, classifier.graduate_index] - probabilities[0, classifier.graduate_index])) < 1e-12
+
+
+def test_classifier_flat_tree_evaluators():
+    classifier = Classifier()
+    data = sample_data[0][:100]
+    for model in (classifier.rfc, classifier.adb):
+        flat = flatten_ensemble(model)
+        assert flat is not None
+        assert np.allclose(flat.predict_proba(data), model.predict_proba(data))
+    assert np.allclose(classifier.predict_probabilities(data), (
+        classifier.rfc.predict_proba(data) + classifier.svc.predict_proba(data) +
+        classifier.knn.predict_proba(data) + classifier.adb.predict_proba(data)) / 4)
+
+
+def test_classifier_feature_attribution():
+    classifier = Classifier()
+    data = sample_data[0][0]
+    explainer = classifier.explainer("rfc")
+    values = explainer.shap_values(data, classifier.graduate_index)
+    expected = explainer.expected_value[classifier.graduate_index]
+    assert abs(values.sum() + expected - classifier.rfc.predict_proba([data])[0][classifier.graduate_index]) < 1e-9
+    attribution = classifier.feature_analysis(data, "shap")
+    assert set(attribution.keys()) == set(classifier.feature_analysis(data).keys())
+
+
 def tests():
     # test_classifier()
     # test_classifier_models()
@@ -0,0 +1,115 @@
+import classifier.registry as registry
+from classifier.registry import ModelRegistry
+import pytest
+import threading
+
+# Versions the stub classifier can load, the latest artifact is loaded when no version is given.
+available_versions = ("v1", "v2", "v3")
+latest_version = "v3"
+
+
+class StubClassifier:
+    def __init__(self, initialise: bool = True):
+        self.version = None
+        self.trained = False
+        # Set last, so a reader seeing it knows the classifier was fully built before it became visible.
+        self.checked = None
+
+    def load_model(self, version: str | None = None) -> None:
+        version = version or latest_version
+        self.trained = version in available_versions
+        self.version = version if self.trained else None
+        self.checked = self.version
+
+    @classmethod
+    def loaded(cls, version: str):
+        classifier = cls(initialise=False)
+        classifier.load_model(version)
+        return classifier
+
+
+@pytest.fixture
+def stub_registry(monkeypatch):
+    monkeypatch.setattr(registry, "Classifier", StubClassifier)
+    monkeypatch.setattr(registry, "read_manifest", lambda version: {"version": version})
+    monkeypatch.setattr(registry, "set_latest_artifact", lambda version: None)
+    monkeypatch.setattr(ModelRegistry, "warm", staticmethod(lambda classifier: None))
+    return ModelRegistry(StubClassifier.loaded("v1"))
+
+
+def test_registry_activate(stub_registry):
+    assert stub_registry.activate("v2")["version"] == "v2"
+    assert stub_registry.current.version == "v2"
+    assert stub_registry.swaps == 1
+
+
+def test_registry_failed_warm_up(stub_registry, monkeypatch):
+    previous = stub_registry.current
+
+    def failing_warm(classifier):
+        raise RuntimeError("warm up failed")
+
+    monkeypatch.setattr(ModelRegistry, "warm", staticmethod(failing_warm))
+    with pytest.raises(RuntimeError):
+        stub_registry.activate("v2")
+    assert stub_registry.current is previous
+    assert stub_registry.swaps == 0
+
+    with pytest.raises(ValueError):
+        stub_registry.activate("missing")
+    assert stub_registry.current is previous
+
+
+def test_registry_swap_concurrent_readers(stub_registry):
+    initial = stub_registry.current
+    candidates = [StubClassifier.loaded(available_versions[i % 3]) for i in range(300)]
+    stop = threading.Event()
+    invalid = list()
+
+    def read():
+        while not stop.is_set():
+            current = stub_registry.current
+            if current.checked != current.version or not current.trained:
+                invalid.append(current)
+
+    replaced = list()
+    replaced_lock = threading.Lock()
+
+    def swap(part: list):
+        for candidate in part:
+            previous = stub_registry.swap(candidate)
+            with replaced_lock:
+                replaced.append(previous)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    writers = [threading.Thread(target=swap, args=(candidates[i::3],)) for i in range(3)]
+    for thread in readers + writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    stop.set()
+    for thread in readers:
+        thread.join()
+
+    assert not invalid
+    assert stub_registry.swaps == len(candidates)
+    # Every classifier is replaced exactly once, no swap is lost or applied twice.
+    everything = {id(initial)} | {id(candidate) for candidate in candidates}
+    assert len({id(previous) for previous in replaced}) == len(candidates)
+    assert {id(previous) for previous in replaced} | {id(stub_registry.current)} == everything
+
+
+def test_registry_ensure(stub_registry):
+    current = stub_registry.current
+    assert stub_registry.ensure(None) is current
+    assert stub_registry.ensure("v1") is current
+
+    # A worker asked for an older version loads that version, not the latest artifact.
+    loaded = stub_registry.ensure("v2")
+    assert loaded.version == "v2" != latest_version
+    assert stub_registry.current is loaded
+    assert stub_registry.ensure("v2") is loaded
+
+    with pytest.raises(ValueError):
+        stub_registry.ensure("missing")
+    assert stub_registry.current is loaded
@@ -0,0 +1,51 @@
+from concurrent.futures import ThreadPoolExecutor
+import classifier.training as training
+from classifier.training import calibrate_member, fit_members, knn_member, svc_member
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+rng = np.random.default_rng(0)
+x_train = rng.normal(size=(150, 4))
+y_train = np.array(["Graduate", "Dropout", "Enrolled"] * 50)
+x_train[:, 0] += np.where(y_train == "Graduate", 3, 0)
+
+
+def test_fit_members_spare_cores(monkeypatch):
+    fitted_jobs = dict()
+
+    def record_fit(name, model, x, y):
+        fitted_jobs[name] = model.get_params()["n_jobs"]
+        return name, model.fit(x, y), 0.0
+
+    # Threads instead of spawned processes, so the recorded parameters are visible to the test.
+    monkeypatch.setattr(training, "ProcessPoolExecutor", lambda max_workers, mp_context: ThreadPoolExecutor(max_workers))
+    monkeypatch.setattr(training, "fit_member", record_fit)
+    models = {"rfc": RandomForestClassifier(n_estimators=5), "knn": knn_member("brute")}
+    fitted = fit_members(models, x_train, y_train, cpus=6)
+    # Two cores run the two members, the four spare cores all go to the random forest.
+    assert fitted_jobs == {"rfc": 5, "knn": None}
+    assert fitted["rfc"].get_params()["n_jobs"] is None
+    assert fitted["knn"].get_params()["n_jobs"] is None
+
+
+def test_svc_member_linear():
+    model = svc_member("linear").fit(x_train[:120], y_train[:120])
+    assert not hasattr(model, "predict_proba")
+    calibrated = calibrate_member(model, x_train[120:], y_train[120:])
+    probabilities = calibrated.predict_proba(x_train[:5])
+    assert probabilities.shape == (5, 3)
+    assert np.allclose(probabilities.sum(axis=1), 1.0)
+    with pytest.raises(ValueError):
+        svc_member("unknown")
+
+
+def test_knn_member_settings(monkeypatch):
+    monkeypatch.setattr(training, "KNN_ALGORITHM", "kd_tree")
+    monkeypatch.setattr(training, "KNN_LEAF_SIZE", 7)
+    params = knn_member().get_params()
+    assert (params["algorithm"], params["leaf_size"], params["n_neighbors"]) == ("kd_tree", 7, 10)
+    params = knn_member("ball_tree", 3).get_params()
+    assert (params["algorithm"], params["leaf_size"]) == ("ball_tree", 3)
+    with pytest.raises(ValueError):
+        knn_member("unknown")
@@ -0,0 +1,134 @@
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import multiprocessing
+import os
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.svm import LinearSVC, SVC
+from system_tools.settings import KNN_ALGORITHM, KNN_LEAF_SIZE, MODEL_TRAINING_CPUS, SVC_MEMBER
+import time
+
+logging.getLogger(__name__)
+
+
+def training_cpus() -> int:
+    """
+    Returns the number of cores available for training, which is MODEL_TRAINING_CPUS limited to the usable cores.
+
+    :return: int
+    """
+    available = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    return max(1, min(MODEL_TRAINING_CPUS, available)) if MODEL_TRAINING_CPUS > 0 else available
+
+
+def svc_member(kind: str | None = None):
+    """
+    Returns a new, unfitted support vector member of the given kind (SVC_MEMBER if not given).
+
+    "svc" is the libsvm SVC with internal cross validated probability estimates. "linear" is a liblinear LinearSVC,
+    which is much cheaper to fit and to score but has no probability estimates of its own, it must be calibrated with
+    calibrate_member after fitting. Raises ValueError for any other kind.
+
+    :param kind: str | None
+    :return: SVC | LinearSVC
+    """
+    kind = kind or SVC_MEMBER
+    if kind == "svc":
+        return SVC(probability=True, class_weight={"Graduate": 1, "Dropout": 1, "Enrolled": 1}, kernel='linear', C=1)
+    if kind == "linear":
+        return LinearSVC(C=1, dual=False)
+    raise ValueError(f"Unknown support vector member: {kind}")
+
+
+def knn_member(algorithm: str | None = None, leaf_size: int | None = None) -> KNeighborsClassifier:
+    """
+    Returns a new, unfitted k-nearest neighbours member using the given neighbour index (KNN_ALGORITHM and
+    KNN_LEAF_SIZE if not given).
+
+    The algorithm is one of "brute" (vectorised distance computation), "kd_tree", "ball_tree" or "auto", the leaf size
+    only applies to the tree indexes. Every index finds the same neighbours, they only differ in speed.
+
+    :param algorithm: str | None
+    :param leaf_size: int | None
+    :return: KNeighborsClassifier
+    """
+    algorithm = algorithm or KNN_ALGORITHM
+    if algorithm not in ("auto", "brute", "kd_tree", "ball_tree"):
+        raise ValueError(f"Unknown neighbour index: {algorithm}")
+    return KNeighborsClassifier(n_neighbors=10, algorithm=algorithm, leaf_size=leaf_size or KNN_LEAF_SIZE)
+
+
+def calibrate_member(model, x_val: list, y_val: list):
+    """
+    Returns the fitted model with probability estimates, calibrating it on the validation data if it has none.
+
+    The calibration (Platt scaling) is fitted once on the validation split, the fitted model itself is not changed.
+
+    :param model: fitted estimator
+    :param x_val: list
+    :param y_val: list
+    :return: estimator
+    """
+    if hasattr(model, "predict_proba"):
+        return model
+    return CalibratedClassifierCV(model, method="sigmoid", cv="prefit").fit(x_val, y_val)
+
+
+def fit_member(name: str, model, x_train: list, y_train: list) -> tuple[str, object, float]:
+    """
+    Fits a single ensemble member and returns its name, the fitted model and the wall time in seconds.
+
+    Runs in the training process pool, so it must remain a module level function.
+
+    :param name: str
+    :param model: estimator
+    :param x_train: list
+    :param y_train: list
+    :return: tuple[str, object, float]
+    """
+    start = time.perf_counter()
+    model.fit(x_train, y_train)
+    return name, model, time.perf_counter() - start
+
+
+def fit_members(models: dict, x_train: list, y_train: list, cpus: int | None = None) -> dict:
+    """
+    Fits the ensemble members on the training data and returns a dict of member name: fitted model.
+
+    With a budget of more than one core the members are fitted concurrently in a process pool, one process per member
+    up to the budget. The remaining cores are given to the random forest, the only member whose fit is spread over
+    several cores, so the total training time approaches the time of the slowest member. The wall time of every
+    member is logged.
+
+    :param models: dict of member name: estimator
+    :param x_train: list
+    :param y_train: list
+    :param cpus: int | None - The number of cores to use, defaults to training_cpus()
+    :return: dict
+    """
+    cpus = cpus or training_cpus()
+    start = time.perf_counter()
+    workers = min(cpus, len(models))
+    # Every member occupies one core, the spare cores go to the random forest (the k-nearest neighbours member accepts
+    # n_jobs as well, but building its neighbour index runs on a single core).
+    spare = cpus - workers
+    parallel = [name for name in ("rfc",) if name in models]
+    for name in parallel:
+        models[name].set_params(n_jobs=1 + spare)
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [executor.submit(fit_member, name, model, x_train, y_train) for name, model in models.items()]
+            results = [future.result() for future in futures]
+    else:
+        results = [fit_member(name, model, x_train, y_train) for name, model in models.items()]
+
+    fitted = dict()
+    for name, model, seconds in results:
+        logging.info(f"Fitted {name} in {seconds:.2f}s")
+        # Predictions are made on small batches by several workers at once, so they stay single threaded.
+        if name in parallel:
+            model.set_params(n_jobs=None)
+        fitted[name] = model
+    logging.info(f"Fitted {len(fitted)} models on {cpus} cores in {time.perf_counter() - start:.2f}s")
+    return fitted
@@ -0,0 +1,175 @@
+import logging
+import numpy as np
+from sklearn.ensemble import AdaBoostClassifier, RandomForestClassifier
+from sklearn.tree import DecisionTreeClassifier
+
+logging.getLogger(__name__)
+
+
+class FlatTreeEnsemble:
+    """
+        This class contains all properties and methods for evaluating a set of decision trees as flat node arrays.
+
+        The nodes of all trees are concatenated into one set of arrays. A batch is evaluated by moving every (tree, row)
+        pair one level down per step, so the whole ensemble takes one vectorised step per tree level instead of a
+        predict_proba call per tree. Leaves point to themselves, so rows that reach a leaf early stay there.
+
+
+        Attributes
+
+        classes: np.ndarray - The classes of the ensemble, in the order of the probability columns
+
+        roots: np.ndarray - The index of the root node of every tree
+
+        feature: np.ndarray - The feature compared at every node (0 for leaves)
+
+        threshold: np.ndarray - The threshold compared at every node, rows with a value <= threshold go left
+
+        children: np.ndarray - The left and right child of every node interleaved, node n has its left child at 2n and
+        its right child at 2n + 1 (both the node itself for leaves)
+
+        values: np.ndarray - The values of every node, the class probabilities normalised as by DecisionTreeClassifier
+
+        depth: int - The depth of the deepest tree
+
+
+        Methods
+
+        tree_values: np.ndarray - Returns the values of the leaf reached in every tree for every row of the data.
+    """
+    def __init__(self, trees: list[DecisionTreeClassifier], classes: np.ndarray):
+        self.classes = np.asarray(classes)
+        roots, feature, threshold, children, values = list(), list(), list(), list(), list()
+        offset = 0
+        for tree in trees:
+            structure = tree.tree_
+            if structure.n_outputs != 1 or structure.n_classes[0] != len(self.classes):
+                raise ValueError("Only single output trees with every class can be flattened")
+            nodes = np.arange(structure.node_count)
+            leaves = structure.children_left == -1
+            roots.append(offset)
+            feature.append(np.where(leaves, 0, structure.feature))
+            threshold.append(structure.threshold)
+            left = np.where(leaves, nodes, structure.children_left)
+            right = np.where(leaves, nodes, structure.children_right)
+            children.append(np.stack([left, right], axis=1).ravel() + offset)
+            value = structure.value[:, 0, :].astype(np.float64)
+            normaliser = value.sum(axis=1)[:, np.newaxis]
+            normaliser[normaliser == 0.0] = 1.0
+            values.append(value / normaliser)
+            offset += structure.node_count
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.feature = np.concatenate(feature).astype(np.intp)
+        self.threshold = np.concatenate(threshold)
+        self.children = np.concatenate(children).astype(np.intp)
+        self.values = np.concatenate(values)
+        self.depth = max(tree.tree_.max_depth for tree in trees)
+
+    def tree_values(self, data: np.ndarray) -> np.ndarray:
+        """
+        Returns the values of the leaf reached in every tree for every row, an array of shape (trees, rows, classes).
+
+        The data is converted to float32 before the comparisons, exactly as the sklearn trees do. It is transposed so
+        the values of a feature are contiguous, the value for a (tree, row) pair is at feature * rows + row.
+
+        :param data: np.ndarray
+        :return: np.ndarray
+        """
+        data = np.asarray(data, dtype=np.float32)
+        rows = len(data)
+        columns = np.ascontiguousarray(data.T).ravel()
+        row_indexes = np.arange(rows)
+        nodes = np.repeat(self.roots[:, np.newaxis], rows, axis=1)
+        for _ in range(self.depth):
+            right = columns[self.feature[nodes] * rows + row_indexes] > self.threshold[nodes]
+            nodes = self.children[2 * nodes + right]
+        return self.values[nodes]
+
+
+class FlatRandomForest(FlatTreeEnsemble):
+    """
+        This class contains all properties and methods for evaluating a fitted RandomForestClassifier as flat arrays.
+
+
+        Methods
+
+        predict_proba: np.ndarray - Calculates the class probabilities for every row of the data.
+    """
+    def __init__(self, model: RandomForestClassifier):
+        super().__init__(model.estimators_, model.classes_)
+
+    def predict_proba(self, data: np.ndarray) -> np.ndarray:
+        """
+        Calculates the class probabilities for every row of the data, the mean of the probabilities of every tree.
+
+        :param data: np.ndarray
+        :return: np.ndarray
+        """
+        probabilities = self.tree_values(data)
+        return probabilities.sum(axis=0) / len(probabilities)
+
+
+class FlatAdaBoost(FlatTreeEnsemble):
+    """
+        This class contains all properties and methods for evaluating a fitted SAMME.R AdaBoostClassifier as flat arrays.
+
+        The node values are replaced by the SAMME.R contribution of the node, the centred log probabilities, so a batch
+        only requires the leaf values to be summed into the decision function.
+
+
+        Attributes
+
+        weight: float - The sum of the estimator weights of the model
+
+
+        Methods
+
+        predict_proba: np.ndarray - Calculates the class probabilities for every row of the data.
+    """
+    def __init__(self, model: AdaBoostClassifier):
+        if model.algorithm != "SAMME.R":
+            raise ValueError(f"Only SAMME.R AdaBoost models can be flattened, not {model.algorithm}")
+        super().__init__(model.estimators_, model.classes_)
+        self.weight = model.estimator_weights_.sum()
+        n_classes = len(self.classes)
+        np.clip(self.values, np.finfo(self.values.dtype).eps, None, out=self.values)
+        log_values = np.log(self.values)
+        self.values = (n_classes - 1) * (log_values - (1.0 / n_classes) * log_values.sum(axis=1)[:, np.newaxis])
+
+    def predict_proba(self, data: np.ndarray) -> np.ndarray:
+        """
+        Calculates the class probabilities for every row of the data, following AdaBoostClassifier.predict_proba.
+
+        The contributions of every tree are summed into the decision function, which is then converted to
+        probabilities with a softmax.
+
+        :param data: np.ndarray
+        :return: np.ndarray
+        """
+        n_classes = len(self.classes)
+        decision = self.tree_values(data).sum(axis=0) / self.weight
+        if n_classes == 2:
+            decision[:, 0] *= -1
+            decision = decision.sum(axis=1)
+            decision = np.vstack([-decision, decision]).T / 2
+        else:
+            decision /= n_classes - 1
+        decision = np.exp(decision - decision.max(axis=1, keepdims=True))
+        return decision / decision.sum(axis=1, keepdims=True)
+
+
+def flatten_ensemble(model) -> FlatTreeEnsemble | None:
+    """
+    Returns the flat array evaluator of a fitted tree ensemble, or None if the model cannot be flattened.
+
+    :param model: fitted estimator
+    :return: FlatTreeEnsemble | None
+    """
+    try:
+        if isinstance(model, RandomForestClassifier):
+            return FlatRandomForest(model)
+        if isinstance(model, AdaBoostClassifier):
+            return FlatAdaBoost(model)
+    except (AttributeError, ValueError) as e:
+        logging.warning(f"Could not flatten {type(model).__name__}, using its own predict_proba instead: {e}")
+    return None
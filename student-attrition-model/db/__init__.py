@@ -1,6 +1,14 @@
-from db.services_pymongo import students, create_all_indexes
+from db.services_pymongo import students, create_all_indexes, student_indexes
+from db.controllers_analysis_cache import get_cached_analysis, store_cached_analysis
 from db.models_student import Student
-from db.controllers_controls import create_controls, get_controls, update_controls
+from db.controllers_controls import controls_generation, create_controls, get_controls, invalidate_controls
+from db.controllers_controls import update_controls
 from db.controllers_student import generate_new_student, student_count, student_overview, training_dataset_resampled
+from db.controllers_student import bulk_create_students, encode_students, insert_students, load_features_and_labels
+from db.controllers_student import dataset_arrays, student_priors, student_priors_all, touch_dataset
+from db.snapshot import read_snapshot, snapshot_location, write_snapshot
 from db.controllers_student import create_training_test_datasets, generate_student_dataframe, training_dataset
-from db.controllers_student import student_iqr_percentiles, test_dataset
+from db.controllers_student import student_iqr_percentiles, test_dataset, test_feature_sample, update_numeric_grids
+from db.controllers_async import get_controls_async, student_count_async, student_iqr_percentiles_async
+from db.controllers_async import student_min_max_async, student_overview_async, student_priors_all_async
+from db.query_plans import query_plan_report
@@ -0,0 +1,42 @@
+from datetime import datetime, timedelta, timezone
+from db.services_pymongo import analysis_cache
+import logging
+
+logging.getLogger(__name__)
+
+
+def get_cached_analysis(key: str, ttl: int) -> dict | None:
+    """
+    Retrieves a feature analysis result from the shared cache and returns it, or None if it is missing or expired.
+
+    MongoDB only removes expired documents periodically, so the age of the document is checked as well.
+
+    :param key: str
+    :param ttl: int
+    :return: dict | None
+    """
+    try:
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=ttl)
+        document = analysis_cache.find_one({"_id": key, "created_at": {"$gt": cutoff}}, {"result": 1})
+        return document["result"] if document else None
+    except Exception as e:
+        logging.error(f"Could not read the shared analysis cache: {e}")
+        return None
+
+
+def store_cached_analysis(key: str, result: dict) -> bool:
+    """
+    Adds a feature analysis result to the shared cache. Returns boolean depending on success of the update.
+
+    :param key: str
+    :param result: dict
+    :return: bool
+    """
+    try:
+        analysis_cache.replace_one(
+            {"_id": key}, {"_id": key, "result": result, "created_at": datetime.now(timezone.utc)}, upsert=True
+        )
+        return True
+    except Exception as e:
+        logging.error(f"Could not update the shared analysis cache: {e}")
+        return False
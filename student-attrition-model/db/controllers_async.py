@@ -0,0 +1,101 @@
+from db.controllers_controls import cache_controls, cached_controls
+from db.controllers_student import all_priors_pipeline, cache_priors, cached_priors, class_counts
+from db.controllers_student import class_counts_pipeline, overview_from_counts, percentile_grid, prior_variables
+from db.controllers_student import min_max_query, priors_from_facets
+from db.models_controls import Controls
+from db.services_motor import async_controls, async_students
+import logging
+from pymongo import DESCENDING
+
+logging.getLogger(__name__)
+
+
+async def get_controls_async(refresh: bool = False) -> Controls:
+    """
+    Retrieves the controls for the intervention platform without blocking the event loop and returns them.
+
+    Shares the process wide cache of get_controls. Once the cache is older than CONTROLS_CACHE_SECONDS only the
+    generation is read from the database and the full document is reloaded if it has changed. If refresh is True the
+    document is always reloaded.
+
+    :param refresh: bool
+    :return: Controls
+    """
+    if not refresh:
+        cached = cached_controls()
+        if cached is not None:
+            return cached
+        stale = cached_controls(fresh=False)
+        if stale is not None:
+            document = await async_controls().find_one({"name": "control"}, {"generation": 1})
+            if (document.get("generation", 0) if document else 0) == stale.generation:
+                return cache_controls(stale)
+    return cache_controls(Controls(await async_controls().find_one({"name": "control"})))
+
+
+async def student_count_async() -> int:
+    """
+    Returns the number of student documents in the database without blocking the event loop.
+
+    :return: int
+    """
+    return await async_students().count_documents({})
+
+
+async def student_overview_async() -> dict:
+    """
+    Returns overview information for the student collection in the database without blocking the event loop.
+
+    :return: dict
+    """
+    groups = await async_students().aggregate(class_counts_pipeline({'training_data': True})).to_list(None)
+    return overview_from_counts(class_counts(groups))
+
+
+async def student_priors_all_async(schema: dict, training: bool = True) -> dict:
+    """
+    Returns the priors of every value of every categorical variable without blocking the event loop.
+
+    Shares the process wide cache of student_priors_all, which is kept until the dataset fingerprint changes.
+
+    :param schema: dict - legend provides metadata information for dataset
+    :param training: bool
+    :return: dict
+    """
+    fingerprint = (await get_controls_async()).dataset_fingerprint
+    priors = cached_priors(fingerprint, training)
+    if priors is not None:
+        return priors
+    facets = await async_students().aggregate(all_priors_pipeline(prior_variables(schema), training)).to_list(1)
+    return cache_priors(fingerprint, training, priors_from_facets(facets[0] if facets else dict()))
+
+
+async def student_min_max_async(category: str, training: bool = True) -> tuple[int | float, int | float]:
+    """
+    Returns the minimum and maximum value for a given category on the training or full dataset without blocking.
+
+    :param category: str
+    :param training: bool
+    :return: tuple[int | float, int | float]
+    """
+    filters, projection = min_max_query(category, training)
+    collection = async_students()
+    min_c = (await collection.find(filters, projection).sort(category).limit(1).to_list(1))[0][category]
+    max_c = (await collection.find(filters, projection).sort(category, DESCENDING).limit(1).to_list(1))[0][category]
+    return min_c, max_c
+
+
+async def student_iqr_percentiles_async(category: str) -> list[float | int]:
+    """
+    Returns a list of values within the inter-quartile range of a specified category without blocking the event loop.
+
+    The values are served from the grids stored in the controls, falling back to the minimum and maximum values of the
+    training data if no grid has been stored for the category.
+
+    :param category: str
+    :return: list[float | int]
+    """
+    grids = (await get_controls_async()).numeric_grids
+    if grids and category in grids:
+        return grids[category]
+    return percentile_grid(*(await student_min_max_async(category)))
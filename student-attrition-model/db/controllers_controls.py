@@ -1,17 +1,97 @@
 from db.models_controls import Controls
 from db.services_pymongo import controls
 import logging
+from system_tools.settings import CONTROLS_CACHE_SECONDS
+import threading
+import time
 
 logging.getLogger(__name__)
 
+# Process wide cache of the controls document, shared by every request handled by this worker.
+controls_cache = {"controls": None, "checked": 0.0}
+controls_cache_lock = threading.Lock()
 
-def get_controls() -> Controls:
+
+def controls_generation() -> int:
+    """
+    Retrieves only the generation of the controls from the database and returns it, 0 if the controls do not exist.
+
+    :return: int
+    """
+    document = controls.find_one({"name": "control"}, {"generation": 1})
+    return document.get("generation", 0) if document else 0
+
+
+def invalidate_controls() -> None:
+    """
+    Discards the cached controls so that the next call to get_controls reads them from the database.
+
+    :return: None
+    """
+    with controls_cache_lock:
+        controls_cache["controls"] = None
+        controls_cache["checked"] = 0.0
+
+
+def cached_controls(fresh: bool = True) -> Controls | None:
+    """
+    Returns the cached controls, or None if there are none.
+
+    If fresh is True the cached controls are only returned if they were checked against the database within
+    CONTROLS_CACHE_SECONDS.
+
+    :param fresh: bool
+    :return: Controls | None
+    """
+    with controls_cache_lock:
+        cached = controls_cache["controls"]
+        if cached is None or not fresh or time.monotonic() - controls_cache["checked"] < CONTROLS_CACHE_SECONDS:
+            return cached
+        return None
+
+
+def cache_controls(current: Controls) -> Controls:
     """
-    Retrieves the controls for the intervention platform from the database and returns them.
+    Stores the controls in the cache, marks them as checked against the database and returns them.
 
+    :param current: Controls
     :return: Controls
     """
-    return Controls(controls.find_one({"name": "control"}))
+    with controls_cache_lock:
+        controls_cache["controls"] = current
+        controls_cache["checked"] = time.monotonic()
+        return current
+
+
+def get_controls(refresh: bool = False) -> Controls:
+    """
+    Retrieves the controls for the intervention platform and returns them.
+
+    The controls are cached in memory for the whole process. Once the cache is older than CONTROLS_CACHE_SECONDS only
+    the generation is read from the database and the full document is reloaded if it has changed, so updates made by
+    any worker are picked up without reading the whole document on every call. If refresh is True the document is
+    always reloaded.
+
+    The database is read without holding the cache lock, so other threads keep being served from the cache while it
+    is checked. The result is only stored if no other thread or update changed the cache in the meantime.
+
+    :param refresh: bool
+    :return: Controls
+    """
+    now = time.monotonic()
+    with controls_cache_lock:
+        cached = controls_cache["controls"]
+        if not refresh and cached is not None and now - controls_cache["checked"] < CONTROLS_CACHE_SECONDS:
+            return cached
+    if refresh or cached is None or controls_generation() != cached.generation:
+        current = Controls(controls.find_one({"name": "control"}))
+    else:
+        current = cached
+    with controls_cache_lock:
+        if controls_cache["controls"] is cached:
+            controls_cache["controls"] = current
+            controls_cache["checked"] = now
+    return current
 
 
 def create_controls(attributes: dict) -> bool:
@@ -19,7 +99,8 @@ def create_controls(attributes: dict) -> bool:
     Creates an instance of controls for the intervention platform. Returns boolean depending on success of creation.
 
     There should only be one instance of controls in the database, which contains all variables used to set default
-    values or variables required for the running of the platform.
+    values or variables required for the running of the platform. Creating the controls sets their generation, which
+    invalidates the cached controls in every worker.
 
     :param attributes: dict
     :return: bool
@@ -29,20 +110,27 @@ def create_controls(attributes: dict) -> bool:
     except Exception as e:
         logging.error("Controls could not be created", e)
         return False
+    finally:
+        invalidate_controls()
 
 
 def update_controls(attributes: dict) -> bool:
     """
         Updates the instance of controls for the intervention platform. Returns boolean depending on success of update.
 
+        Only the given attributes are changed, all other attributes keep the values currently stored in the database.
+
         There should only be one instance of controls in the database, which contains all variables used to set default
-        values or variables required for the running of the platform.
+        values or variables required for the running of the platform. Updating the controls increments their
+        generation, which invalidates the cached controls in every worker.
 
         :param attributes: dict
         :return: bool
     """
     try:
-        return Controls(attributes).update_document()
+        return Controls(attributes).update_document(list(attributes.keys()))
     except Exception as e:
         logging.error("Controls could not be updated", e)
         return False
+    finally:
+        invalidate_controls()
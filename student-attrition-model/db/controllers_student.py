@@ -1,69 +1,113 @@
+from db.controllers_controls import get_controls, update_controls
 from db.models_student import Student, student_info_projection
 from db.services_pymongo import students
+from db.snapshot import read_snapshot, write_snapshot
 from db.tools import one_hot_encoding, get_dict_key_from_array, get_dict_key_by_value
 import logging
+import numpy as np
 import pandas as pd
 from pandas import DataFrame
 import json
 import random
-from pymongo import DESCENDING
+from pymongo import DESCENDING, UpdateMany
+from pymongo.errors import BulkWriteError
+from system_tools.settings import DATASET_CURSOR_BATCH_SIZE, DATASET_SNAPSHOT, INGEST_BATCH_SIZE
+from system_tools.settings import INGEST_PROGRESS_SECONDS, TRAINING_SPLIT_SEED
+import threading
+import time
+import uuid
 
 logging.getLogger(__name__)
 
+# Maximum number of ids in the $in list of a single update, keeps every filter well below the document size limit.
+SPLIT_UPDATE_IDS = 100000
+
+# Process wide cache of the priors of every categorical variable by training flag, for a single dataset fingerprint.
+priors_cache = {"fingerprint": None, "priors": dict()}
+priors_cache_lock = threading.Lock()
+
+
+def student_keys(schema: dict) -> dict:
+    """
+    Returns a mapping of dataset column name to schema key, the first key is kept if a column is listed twice.
+
+    :param schema: dict - legend provides metadata information for dataset
+    :return: dict
+    """
+    keys = dict()
+    for key, column in schema['variables'].items():
+        keys.setdefault(column, key)
+    return keys
+
+
+def encode_student_value(key: str, v, schema: dict) -> tuple:
+    """
+    Takes the raw dataset value of a single feature. Returns the human-readable value and the list of numeric values the
+    feature contributes to the feature vector.
+
+    :param key: str - The schema key of the feature
+    :param v: str | int | float - The value as given in the dataset
+    :param schema: dict - legend provides metadata information for dataset
+    :return: tuple[str | int | float | bool | None, list]
+    """
+    readable = None
+    f = list()
+    variable_type = schema['variable_types'].get(key)
+    # Binary categories
+    if variable_type == 'binary':
+        readable = schema['binary_variables'][str(v)] == 'yes'
+        f = [v]
+    if variable_type == 'numeric':
+        readable = v
+        f = [v]
+    if variable_type == 'boolean':
+        readable = schema[key].get(str(v))
+        f = [v]
+    if variable_type == 'ordinal':
+        meta_key = f"parental_{key.split('_')[1]}" if 'mother' in key or 'father' in key else key
+        # Assumes mothers_qualification and fathers_qualification are the only ordinal variables
+        original = schema[meta_key].get(str(v))
+        encoded = get_dict_key_from_array(schema[f"{meta_key}_categories_readable"], original)
+        category_key = str(get_dict_key_by_value(schema[f"{meta_key}_categories"], encoded))
+        readable = encoded
+        f = [schema[f"{meta_key}_labels"].get(category_key)]
+    if variable_type == 'one_hot_encoded':
+        if 'mother' in key or 'father' in key:
+            meta_key = f"parental_{key.split('_')[1]}"
+            category_key = schema[meta_key].get(str(v))
+            encoded = get_dict_key_from_array(schema[f"{meta_key}_categories_readable"], category_key)
+            readable = encoded
+            f = one_hot_encoding(encoded, schema["drop_list"].get(key), schema[f"{meta_key}_categories"])
+        else:
+            readable = schema[key].get(str(v))
+            f = one_hot_encoding(schema[key][str(v)], schema["drop_list"].get(key), schema[key])
+    if variable_type == 'string':
+        readable = v
+
+    assert None not in f
+    return readable, f
+
 
 def generate_new_student(data: dict, schema: dict, initialise: bool = False):
     """
     Take a sample data instance in dict format and the relevant schema. Return an instance of class Student.
 
     This function is designed to take a data instance and convert it into a format that is standardised for the
-    dataset and compatible with MongoDB. If initialise is true, it then saves the document to the database. The system
-    returns the new document.
+    dataset and compatible with MongoDB. If initialise is true, it then saves the document to the database and gives
+    the students a new dataset fingerprint. The system returns the new document.
 
     :param data: dict - dataset
     :param schema: dict - legend provides metadata information for dataset
     :param initialise: bool - determines whether student is saved to the database
     :return: Student
     """
+    keys = student_keys(schema)
     sample = dict()
     features = list()
     for k, v in data.items():
-        try:
-            key = list(filter(lambda x: x[1] == k, schema['variables'].items()))[0][0]
-        except IndexError:
+        if k not in keys:
             continue
-        # Binary categories
-        f = list()
-        if schema['variable_types'].get(key) == 'binary':
-            sample[key] = schema['binary_variables'][str(v)] == 'yes'
-            f = [v]
-        if schema['variable_types'].get(key) == 'numeric':
-            sample[key] = v
-            f = [v]
-        if schema["variable_types"].get(key) == 'boolean':
-            sample[key] = schema[key].get(str(v))
-            f = [v]
-        if schema["variable_types"].get(key) == 'ordinal':
-            meta_key = f"parental_{key.split('_')[1]}" if 'mother' in key or 'father' in key else key
-            # Assumes mothers_qualification and fathers_qualification are the only ordinal variables
-            original = schema[meta_key].get(str(v))
-            encoded = get_dict_key_from_array(schema[f"{meta_key}_categories_readable"], original)
-            category_key = str(get_dict_key_by_value(schema[f"{meta_key}_categories"], encoded))
-            sample[key] = encoded
-            f = [schema[f"{meta_key}_labels"].get(category_key)]
-        if schema["variable_types"].get(key) == 'one_hot_encoded':
-            if 'mother' in key or 'father' in key:
-                meta_key = f"parental_{key.split('_')[1]}"
-                category_key = schema[meta_key].get(str(v))
-                encoded = get_dict_key_from_array(schema[f"{meta_key}_categories_readable"], category_key)
-                sample[key] = encoded
-                f = one_hot_encoding(encoded, schema["drop_list"].get(key), schema[f"{meta_key}_categories"])
-            else:
-                sample[key] = schema[key].get(str(v))
-                f = one_hot_encoding(schema[key][str(v)], schema["drop_list"].get(key), schema[key])
-        if schema["variable_types"].get(key) == 'string':
-            sample[key] = v
-
-        assert None not in f
+        sample[keys[k]], f = encode_student_value(keys[k], v, schema)
         features.append(f)
 
     # Flatten list to create feature vector
@@ -73,12 +117,108 @@ def generate_new_student(data: dict, schema: dict, initialise: bool = False):
     # create student and save to database
     student = Student(sample)
 
-    if initialise:
-        student.create_document()
+    if initialise and student.create_document():
+        touch_dataset()
 
     return student
 
 
+def encode_students(data: DataFrame, schema: dict) -> tuple[DataFrame, DataFrame]:
+    """
+    Takes a dataframe of samples in the dataset format and the relevant schema. Returns the human-readable features and
+    the feature matrix, which are identical to those generate_new_student produces for every row.
+
+    The columns are mapped to schema keys once. Numeric columns are used as they are, every other column is factorised
+    and each distinct value is encoded once, its human-readable value and block of the feature vector are then spread
+    over the rows with the category codes. The feature matrix has a column per position in the feature vector, each
+    keeping the type of the values generate_new_student would produce, so model input is features.to_numpy(float).
+
+    :param data: DataFrame - dataset
+    :param schema: dict - legend provides metadata information for dataset
+    :return: tuple[DataFrame, DataFrame] - The human-readable features by schema key and the feature matrix
+    """
+    keys = student_keys(schema)
+    samples = dict()
+    blocks = list()
+    for column in data.columns:
+        if column not in keys:
+            continue
+        key = keys[column]
+        values = data[column].to_numpy()
+        if schema['variable_types'].get(key) == 'numeric':
+            samples[key] = values
+            blocks.append(values[:, np.newaxis])
+            continue
+        codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        encoded = [encode_student_value(key, v, schema) for v in uniques.tolist()]
+        readable = np.empty(len(encoded), dtype=object)
+        readable[:] = [value for value, _ in encoded]
+        samples[key] = readable[codes]
+        # String features are human-readable only and have no block in the feature vector.
+        if encoded and encoded[0][1]:
+            block = [f for _, f in encoded]
+            # Blocks mixing int and float values (the ordinal labels) keep the type of every value.
+            mixed = len({type(x) for f in block for x in f}) > 1
+            blocks.append(np.array(block, dtype=object if mixed else None)[codes])
+    samples = pd.DataFrame(samples, index=range(len(data)))
+    columns = [block[:, i] for block in blocks for i in range(block.shape[1])]
+    features = pd.DataFrame(dict(enumerate(columns)), index=range(len(data)))
+    return samples, features
+
+
+def insert_students(documents: list[dict]) -> int:
+    """
+    Inserts student documents with a single unordered insert_many and returns the number of documents inserted.
+
+    Documents that cannot be inserted (e.g. duplicates) are logged and skipped, the remaining documents are still
+    inserted.
+
+    :param documents: list[dict]
+    :return: int
+    """
+    if not documents:
+        return 0
+    try:
+        return len(students.insert_many(documents, ordered=False).inserted_ids)
+    except BulkWriteError as e:
+        logging.error(f"{len(e.details.get('writeErrors', []))} students could not be inserted")
+        return e.details.get("nInserted", 0)
+
+
+def bulk_create_students(data: DataFrame, schema: dict, batch_size: int | None = None, progress=None) -> int:
+    """
+    Converts the samples of a dataset into students and inserts them into the database in batches. Returns the number of
+    students inserted.
+
+    Each batch of batch_size (INGEST_BATCH_SIZE if not given) samples is encoded column-wise with encode_students and
+    written with one unordered insert_many. The progress callback is called with the number of samples processed and
+    the total number of samples, at most once every INGEST_PROGRESS_SECONDS and once the last batch has been inserted.
+
+    :param data: DataFrame - dataset
+    :param schema: dict - legend provides metadata information for dataset
+    :param batch_size: int | None
+    :param progress: Callable[[int, int], None] | None
+    :return: int
+    """
+    batch_size = batch_size or INGEST_BATCH_SIZE
+    inserted = 0
+    reported = time.monotonic()
+    for start in range(0, len(data), batch_size):
+        samples, features = encode_students(data.iloc[start:start + batch_size], schema)
+        inserted += insert_students([
+            Student({**sample, 'features': list(f)}).info_db()
+            for sample, f in zip(samples.to_dict('records'), features.itertuples(index=False, name=None))
+        ])
+        processed = start + len(samples)
+        due = time.monotonic() - reported >= INGEST_PROGRESS_SECONDS
+        if progress is not None and (processed == len(data) or due):
+            progress(processed, len(data))
+            reported = time.monotonic()
+    if inserted:
+        touch_dataset()
+    return inserted
+
+
 def student_count() -> int:
     """
     Returns the number of student documents in the database.
@@ -88,40 +228,201 @@ def student_count() -> int:
     return students.count_documents({})
 
 
-def student_overview() -> dict:
+# The filters selecting the students of the training and test datasets.
+dataset_filters = {"training": {"training_data": True}, "test": {"test_data": True}}
+
+# Only the features and target of a student are read when loading a dataset.
+dataset_projection = {"_id": 0, "features": 1, "target": 1}
+
+# The categories of a student that can hold numeric values.
+student_categories = [k for k in student_info_projection.keys() if k not in ("_id", "target")]
+
+
+def count_pipeline(filters: dict) -> list[dict]:
     """
-    Returns overview information for the student collection in the database.
+    Returns the aggregation pipeline counting the students matching the filters, as run by count_documents.
 
-    :return: dict
+    :param filters: dict
+    :return: list[dict]
     """
-    overview = {
-        'graduate_count': students.count_documents({'target': 'Graduate', 'training_data': True}),
-        'dropout_count': students.count_documents({'target': 'Dropout', 'training_data': True}),
-        'enrolled_count': students.count_documents({'target': 'Enrolled', 'training_data': True}),
-        'total_count': students.count_documents({'training_data': True}),
-    }
+    return [{"$match": filters}, {"$group": {"_id": 1, "n": {"$sum": 1}}}]
 
-    return overview
 
+def class_counts_pipeline(filters: dict) -> list[dict]:
+    """
+    Returns the aggregation pipeline counting the students matching the filters for every class.
 
-def student_priors(variable, variable_value, training=True) -> dict:
+    :param filters: dict
+    :return: list[dict]
     """
-    Returns overview information for the student collection in the database.
+    return [{"$match": filters}, {"$group": {"_id": "$target", "count": {"$sum": 1}}}]
+
+
+def class_counts(groups: list[dict]) -> dict:
+    """
+    Takes the groups returned by an aggregation grouping students by class. Returns a dict of class: count.
+
+    :param groups: list[dict]
+    :return: dict
+    """
+    return {group["_id"]: group["count"] for group in groups}
+
+
+def overview_from_counts(counts: dict) -> dict:
+    """
+    Takes the number of students of every class and returns the student overview.
 
+    :param counts: dict
     :return: dict
     """
+    return {
+        'graduate_count': counts.get('Graduate', 0),
+        'dropout_count': counts.get('Dropout', 0),
+        'enrolled_count': counts.get('Enrolled', 0),
+        'total_count': sum(counts.values()),
+    }
+
 
-    total_students = students.count_documents({'training_data': True, variable: variable_value})
+def priors_from_counts(variable: str, counts: dict) -> dict:
+    """
+    Takes the number of students of every class for a value of a variable and returns the proportion of each class.
 
-    overview = {
+    :param variable: str
+    :param counts: dict
+    :return: dict
+    """
+    total_students = sum(counts.values())
+    return {
         'variable': variable,
-        'graduate_count':  ((100 / total_students) * students.count_documents({'target': 'Graduate', 'training_data': training, variable: variable_value}) / 100),
-        'dropout_count':  ((100 / total_students) * students.count_documents({'target': 'Dropout', 'training_data': training, variable: variable_value}) / 100),
-        'enrolled_count': ((100 / total_students) * students.count_documents({'target': 'Enrolled', 'training_data': training, variable: variable_value}) / 100),
+        'graduate_count': counts.get('Graduate', 0) / total_students if total_students else 0.0,
+        'dropout_count': counts.get('Dropout', 0) / total_students if total_students else 0.0,
+        'enrolled_count': counts.get('Enrolled', 0) / total_students if total_students else 0.0,
         'total_count': total_students
     }
 
-    return overview
+
+def student_overview() -> dict:
+    """
+    Returns overview information for the student collection in the database.
+
+    The students of the training dataset are counted per class with a single aggregation.
+
+    :return: dict
+    """
+    return overview_from_counts(class_counts(students.aggregate(class_counts_pipeline({'training_data': True}))))
+
+
+def student_priors(variable, variable_value, training=True) -> dict:
+    """
+    Returns the proportion of each class among the students with the given value of a variable.
+
+    The students of the training (or test if training is False) dataset are counted per class with a single
+    aggregation, the proportions are relative to the number of students in the same dataset.
+
+    :return: dict
+    """
+    pipeline = class_counts_pipeline({'training_data': training, variable: variable_value})
+    return priors_from_counts(variable, class_counts(students.aggregate(pipeline)))
+
+
+def prior_variables(schema: dict) -> list[str]:
+    """
+    Returns the categorical variables of the dataset, the variables priors are calculated for.
+
+    :param schema: dict - legend provides metadata information for dataset
+    :return: list[str]
+    """
+    return [
+        key for key, variable_type in schema['variable_types'].items()
+        if variable_type in ('binary', 'boolean', 'ordinal', 'one_hot_encoded')
+    ]
+
+
+def all_priors_pipeline(variables: list[str], training: bool = True) -> list[dict]:
+    """
+    Returns the aggregation pipeline counting the students per class for every value of every variable in one pass.
+
+    :param variables: list[str]
+    :param training: bool
+    :return: list[dict]
+    """
+    return [
+        {"$match": {"training_data": training}},
+        {"$facet": {
+            variable: [{"$group": {"_id": {"value": f"${variable}", "target": "$target"}, "count": {"$sum": 1}}}]
+            for variable in variables
+        }}
+    ]
+
+
+def priors_from_facets(facets: dict) -> dict:
+    """
+    Takes the result of the all priors aggregation and returns a dict of variable: list of the priors of every value.
+
+    :param facets: dict
+    :return: dict
+    """
+    priors = dict()
+    for variable, groups in facets.items():
+        values = dict()
+        for group in groups:
+            values.setdefault(group["_id"].get("value"), dict())[group["_id"].get("target")] = group["count"]
+        priors[variable] = [
+            {'value': value, **priors_from_counts(variable, counts)}
+            for value, counts in sorted(values.items(), key=lambda x: str(x[0]))
+        ]
+    return priors
+
+
+def cached_priors(fingerprint: str | None, training: bool) -> dict | None:
+    """
+    Returns the cached priors of every variable if they were calculated for the given dataset fingerprint and training
+    flag, otherwise None. Nothing is cached for datasets without a fingerprint.
+
+    :param fingerprint: str | None
+    :param training: bool
+    :return: dict | None
+    """
+    with priors_cache_lock:
+        if fingerprint is None or priors_cache["fingerprint"] != fingerprint:
+            return None
+        return priors_cache["priors"].get(training)
+
+
+def cache_priors(fingerprint: str | None, training: bool, priors: dict) -> dict:
+    """
+    Stores the priors of every variable in the cache and returns them, a new fingerprint discards all cached priors.
+
+    :param fingerprint: str | None
+    :param training: bool
+    :param priors: dict
+    :return: dict
+    """
+    with priors_cache_lock:
+        if priors_cache["fingerprint"] != fingerprint:
+            priors_cache["fingerprint"] = fingerprint
+            priors_cache["priors"] = dict()
+        priors_cache["priors"][training] = priors
+        return priors
+
+
+def student_priors_all(schema: dict, training: bool = True) -> dict:
+    """
+    Returns the priors (see student_priors) of every value of every categorical variable, calculated with a single
+    aggregation. Returns a dict of variable: list of priors, each including the value.
+
+    The result is cached for the whole process until the dataset fingerprint in the controls changes.
+
+    :param schema: dict - legend provides metadata information for dataset
+    :param training: bool
+    :return: dict
+    """
+    fingerprint = get_controls().dataset_fingerprint
+    priors = cached_priors(fingerprint, training)
+    if priors is not None:
+        return priors
+    facets = next(students.aggregate(all_priors_pipeline(prior_variables(schema), training)), dict())
+    return cache_priors(fingerprint, training, priors_from_facets(facets))
 
 
 def pandas_category(categories: list, ordered: bool = False):
@@ -205,143 +506,244 @@ def generate_student_dataframe(schema: dict) -> DataFrame:
     return student_df
 
 
-def split_features_and_labels(dataset: list[Student]) -> tuple[list, list]:
+def training_dataset_resampled(validation_split: bool = False, validation_percentage: float = 20.0, seed: int | None = None) -> tuple[np.ndarray, np.ndarray] | tuple[tuple[np.ndarray, np.ndarray], tuple[np.ndarray, np.ndarray]]:
     """
-    Takes a set of students and separates out the respective feature lists and labels. Returns two lists.
+    Takes all training samples and creates a balanced dataset using bootstrapping and returns the features and labels.
 
-    :param dataset: list[Student]
-    :return: tuple[list, list]
-    """
+    Every class is resampled to the mean class size in ten draws of a tenth of the mean each, every draw is without
+    replacement but the draws are independent. The samples are drawn from the (snapshot) training dataset with a
+    random generator seeded with seed, so a different dataset is produced on every call unless a seed is given. The
+    total number of entries and the total number of entries for each class remain the same.
 
-    features = list(map(lambda x: x.features, dataset))
-    labels = list(map(lambda x: x.target, dataset))
+    :param validation_split: bool
+    :param validation_percentage: float
+    :param seed: int | None
+    :return: tuple[np.ndarray, np.ndarray] | tuple[tuple[np.ndarray, np.ndarray], tuple[np.ndarray, np.ndarray]]
+    """
+    features, labels = dataset_arrays("training")
+    rng = np.random.default_rng(seed)
+    classes, class_indexes = np.unique(labels.astype(str), return_inverse=True)
+    decimated_mean = int(len(labels) / len(classes) / 10)
+    all_samples = list()
+    for index, c in enumerate(classes):
+        members = np.flatnonzero(class_indexes == index)
+        if len(members) <= decimated_mean:
+            raise AssertionError(f'Number of samples for class {c} is too small to resample meaningfully')
+        # Ten independent draws without replacement, the first decimated_mean positions of ten random permutations.
+        draws = rng.random((10, len(members))).argsort(axis=1)[:, :decimated_mean]
+        all_samples.append(members[draws.ravel()])
+    all_samples = np.concatenate(all_samples)
+    if not validation_split:
+        return features[all_samples], labels[all_samples]
 
-    return features, labels
+    # Split training data into training and validation datasets
+    validation_count = int(round((len(all_samples) / 100) * validation_percentage, 0))
+    validation = np.zeros(len(all_samples), dtype=bool)
+    validation[rng.choice(len(all_samples), size=validation_count, replace=False)] = True
+    training, validation = all_samples[~validation], all_samples[validation]
+    return (features[training], labels[training]), (features[validation], labels[validation])
 
 
-def training_dataset_resampled(validation_split: bool = False, validation_percentage: float = 20.0) -> tuple[list, list] | tuple[tuple[list, list], tuple[list, list]]:
+def load_features_and_labels(filters: dict) -> tuple[np.ndarray, np.ndarray]:
     """
-    Takes all training samples and creates a balanced dataset using bootstrapping and returns a dataframe.
+    Loads the feature vectors and labels of the students matching the filters. Returns a float32 feature matrix and an
+    array of labels.
+
+    Only the features and target are projected and the cursor is read in batches of DATASET_CURSOR_BATCH_SIZE
+    documents, every feature vector is written straight into a preallocated matrix so no Student is created.
 
-    Due to the random nature of bootstrapping this method will produce a dataframe that contains different samples
-    every time it is called, however the total number of entries and the total number of entries for each class will
-    remain the same.
+    :param filters: dict
+    :return: tuple[np.ndarray, np.ndarray]
+    """
+    count = students.count_documents(filters)
+    if count == 0:
+        return np.empty((0, 0), dtype=np.float32), np.empty(0, dtype=object)
+    cursor = students.find(filters, dataset_projection).batch_size(DATASET_CURSOR_BATCH_SIZE)
+    features, labels = None, np.empty(count, dtype=object)
+    rows = 0
+    for student in cursor:
+        # Documents inserted while reading are left out, the matrix only has room for the counted students.
+        if rows == count:
+            break
+        if features is None:
+            features = np.empty((count, len(student["features"])), dtype=np.float32)
+        features[rows] = student["features"]
+        labels[rows] = student["target"]
+        rows += 1
+    if features is None:
+        features = np.empty((0, 0), dtype=np.float32)
+    # Documents removed while reading leave unused rows at the end.
+    return features[:rows], labels[:rows]
+
+
+def touch_dataset() -> str:
+    """
+    Gives the students a new dataset fingerprint in the controls and returns it, which invalidates the dataset snapshot.
 
-    :return: tuple[list, list] | tuple[tuple[list, list], tuple[list, list]]
+    Must be called whenever students are added or removed or the training / test split changes.
 
+    :return: str
     """
-    all_students = get_students(filters={"training_data": True})
-    classes = list(map(lambda x: x.target, all_students))
-    mean = len(all_students) / len(set(classes))
-    decimated_mean = mean / 10
-    all_samples = list()
-    for c in set(classes):
-        try:
-            assert len(list(filter(lambda x: x == c, classes))) > decimated_mean
-        except AssertionError:
-            raise AssertionError(f'Number of samples for class {c} is too small to resample meaningfully')
+    fingerprint = uuid.uuid4().hex
+    update_controls({"dataset_fingerprint": fingerprint})
+    return fingerprint
 
-        for n in range(10):
-            all_samples.append([Student(student) for student in list(students.aggregate([
-                {"$match": {"training_data": True, "target": c}},
-                {"$sample": {"size": decimated_mean}}
-            ]))])
 
-    # Flatten list
-    all_samples = [item for sublist in all_samples for item in sublist]
-    if not validation_split:
-        return split_features_and_labels(all_samples)
+def dataset_arrays(name: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the features and labels of the "training" or "test" dataset, read from the dataset snapshot if possible.
 
-    # Split training data into training and validation datasets
-    validation_count = int(round((len(all_samples) / 100) * validation_percentage, 0))
-    validation_indexes = random.sample([n for n in range(len(all_samples))], k=validation_count)
-    training_data = list()
-    validation_data = list()
-    for index, sample in enumerate(all_samples):
-        validation_data.append(sample) if index in validation_indexes else training_data.append(sample)
-    return split_features_and_labels(training_data), split_features_and_labels(validation_data)
+    The snapshot is identified by the dataset fingerprint stored in the controls, which changes whenever students are
+    written (see touch_dataset), so a snapshot is valid as long as it exists and reading it needs no database query
+    while the controls are cached. If it does not exist both datasets are loaded from the database and saved as the new
+    snapshot. If DATASET_SNAPSHOT is False, or no fingerprint can be stored because the controls do not exist, the
+    dataset is loaded from the database.
+
+    :param name: str
+    :return: tuple[np.ndarray, np.ndarray]
+    """
+    if not DATASET_SNAPSHOT:
+        return load_features_and_labels(dataset_filters[name])
+    controls = get_controls()
+    if not controls.dataset_fingerprint:
+        touch_dataset()
+        controls = get_controls()
+    fingerprint = controls.dataset_fingerprint
+    if not fingerprint:
+        return load_features_and_labels(dataset_filters[name])
+    datasets = read_snapshot(fingerprint)
+    if datasets is None:
+        datasets = {k: load_features_and_labels(f) for k, f in dataset_filters.items()}
+        try:
+            write_snapshot(fingerprint, datasets, generation=controls.generation)
+        except Exception as e:
+            logging.error(f"Could not save dataset snapshot {fingerprint}: {e}")
+    return datasets[name]
 
 
-def training_dataset(validation_split: bool = False, validation_percentage: float = 20.0) -> tuple[list, list] | tuple[tuple[list, list], tuple[list, list]]:
+def training_dataset(validation_split: bool = False, validation_percentage: float = 20.0, seed: int | None = None) -> tuple[np.ndarray, np.ndarray] | tuple[tuple[np.ndarray, np.ndarray], tuple[np.ndarray, np.ndarray]]:
     """
     Creates a training dataset from the database and returns the relevant data split by features and label.
 
     If validation is set to True it divides the training set into two with the division split equal to the validation
-    percentage value and returns two sets of data split by features and labels.
+    percentage value and returns two sets of data split by features and labels. The validation samples are drawn from
+    the loaded training dataset with a random generator seeded with seed, so the database is only read once and the
+    same seed always gives the same validation samples.
 
     :param validation_split: bool
     :param validation_percentage: float
-    :return:  tuple[list, list] | tuple[tuple[list, list], tuple[list, list]]
+    :param seed: int | None
+    :return:  tuple[np.ndarray, np.ndarray] | tuple[tuple[np.ndarray, np.ndarray], tuple[np.ndarray, np.ndarray]]
     """
+    features, labels = dataset_arrays("training")
     if not validation_split:
-        training_students = get_students(filters={"training_data": True})
-        return split_features_and_labels(training_students)
+        return features, labels
 
     # Split training data into training and validation datasets
-    training_count = students.count_documents({"training_data": True})
-    validation_count = (training_count / 100) * validation_percentage
-    validation_data = [Student(student) for student in list(students.aggregate([
-            {"$match": {"training_data": True}},
-            {"$sample": {"size": validation_count}}
-        ]))]
-    validation_ids = list(map(lambda x: x._id, validation_data))
-    training_data = get_students(filters={"training_data": True, "_id": {"$nin": validation_ids}})
-    return split_features_and_labels(training_data), split_features_and_labels(validation_data)
+    validation_count = int((len(labels) / 100) * validation_percentage)
+    validation = np.zeros(len(labels), dtype=bool)
+    validation[np.random.default_rng(seed).choice(len(labels), size=validation_count, replace=False)] = True
+    return (features[~validation], labels[~validation]), (features[validation], labels[validation])
 
 
-def test_dataset() -> tuple[list, list]:
+def test_dataset() -> tuple[np.ndarray, np.ndarray]:
     """
     Creates a test dataset from the database and returns the relevant data split by features and label.
 
-    :return:  tuple[list, list]
+    :return:  tuple[np.ndarray, np.ndarray]
+    """
+    return dataset_arrays("test")
+
+
+def test_sample_pipeline(count: int) -> list[dict]:
     """
-    test_students = get_students(filters={"test_data": True})
-    return split_features_and_labels(test_students)
+    Returns the aggregation pipeline drawing the feature vectors of a random sample of test students.
 
+    :param count: int
+    :return: list[dict]
+    """
+    return [
+        {"$match": dataset_filters["test"]},
+        {"$sample": {"size": count}},
+        {"$project": {"_id": 0, "features": 1}}
+    ]
+
+
+def test_feature_sample(count: int) -> list[list]:
+    """
+    Returns the feature vectors of a random sample of test students.
+
+    :param count: int
+    :return: list[list]
+    """
+    return [student["features"] for student in students.aggregate(test_sample_pipeline(count))]
 
-def create_training_test_datasets(training_percentage: float = 80.0) -> bool:
+
+def create_training_test_datasets(training_percentage: float = 80.0, seed: int | None = None) -> bool:
     """
     Takes all students in the database and splits them into two datasets by updating the relevant attributes.
 
-    Number of training samples is determined by training_percentage value. The training samples are selected using the
-    pseudo-random method provided by MongoDB. Once the training samples have been identified and updated the remainder
-    of the samples are classed as test samples and are updated accordingly.
+    The split is stratified: for every class the number of training samples is determined by training_percentage and
+    the samples are drawn with a random generator seeded with seed (TRAINING_SPLIT_SEED if not given), so the same seed
+    always gives the same split. Only the _id and target of the students are read, the remainder of the samples are
+    classed as test samples and both datasets are written with a single bulk write. Finally, the numeric perturbation
+    grids are recalculated from the new training dataset.
 
     :param training_percentage: float
+    :param seed: int | None
     :return: bool
     """
-
-    # Create training dataset
     try:
-        all_students = get_students()
-        classes = set(map(lambda x: x.target, all_students))
-        for i in classes:
-            relevant_students = (list(map(lambda x: x._id, filter(lambda x: x.target == i, all_students))))
-            training_count = int((len(relevant_students) / 100) * training_percentage)
-            training_samples = [Student(student) for student in list(students.aggregate([
-                {"$match": {"_id": {"$in": relevant_students}}},
-                {"$sample": {"size": training_count}}
-            ]))]
-            for sample in training_samples:
-                sample.set_training_status()
-        logging.info('Training dataset created')
+        classes = dict()
+        for student in students.find({}, {"_id": 1, "target": 1}):
+            classes.setdefault(student.get("target"), list()).append(student["_id"])
+        rng = random.Random(TRAINING_SPLIT_SEED if seed is None else seed)
+        training_ids, test_ids = list(), list()
+        # Classes and ids are sorted so the split only depends on the seed and not on the order documents are returned.
+        for target in sorted(classes, key=str):
+            ids = sorted(classes[target])
+            training_count = int((len(ids) / 100) * training_percentage)
+            training = set(rng.sample(range(len(ids)), training_count))
+            for index, _id in enumerate(ids):
+                (training_ids if index in training else test_ids).append(_id)
     except Exception as e:
         logging.error('Error: could not create training dataset', e)
         return False
 
-    # Create test dataset
     try:
-        remaining_students = list(map(lambda x: Student(x), students.find({"training_data": False})))
-        for student in remaining_students:
-            student.set_training_status(training=False)
-        logging.info('Test dataset created')
+        requests = [
+            UpdateMany({"_id": {"$in": ids[i:i + SPLIT_UPDATE_IDS]}}, {"$set": status})
+            for ids, status in ((training_ids, {"training_data": True, "test_data": False}),
+                                (test_ids, {"training_data": False, "test_data": True}))
+            for i in range(0, len(ids), SPLIT_UPDATE_IDS)
+        ]
+        if requests:
+            students.bulk_write(requests, ordered=False)
+        touch_dataset()
+        logging.info(f'Training dataset created ({len(training_ids)} samples)')
+        logging.info(f'Test dataset created ({len(test_ids)} samples)')
     except Exception as e:
         logging.error('Error: could not create test dataset', e)
         return False
 
+    update_numeric_grids()
     return True
 
 
+def min_max_query(category: str, training: bool = True) -> tuple[dict, dict]:
+    """
+    Returns the filters and projection of the queries for the minimum and maximum value of a category, which are
+    sorted by the category in either direction and limited to one student.
+
+    Only the category is projected, so the queries are covered by the category index (see student_indexes).
+
+    :param category: str
+    :param training: bool
+    :return: tuple[dict, dict]
+    """
+    return (dataset_filters["training"] if training else dict()), {"_id": 0, category: 1}
+
+
 def student_min_max(category: str, training: bool = True) -> tuple[int | float, int | float]:
     """
     Returns the minimum and maximum value for a given category on the training or full dataset.
@@ -350,20 +752,87 @@ def student_min_max(category: str, training: bool = True) -> tuple[int | float,
     :param training: bool
     :return: tuple[int | float, int | float]
     """
-    filters = {"training_data": True} if training else {}
-    min_c = list(students.find(filters, student_info_projection).sort(category).limit(1))[0][category]
-    max_c = list(students.find(filters, student_info_projection).sort(category, DESCENDING).limit(1))[0][category]
+    filters, projection = min_max_query(category, training)
+    min_c = list(students.find(filters, projection).sort(category).limit(1))[0][category]
+    max_c = list(students.find(filters, projection).sort(category, DESCENDING).limit(1))[0][category]
     return min_c, max_c
 
 
-def student_iqr_percentiles(category: str) -> list[float | int]:
+def percentile_grid(min_c: int | float, max_c: int | float) -> list[float | int]:
     """
-    Calculates the iter-quartile range for a specified category and returns a list of values within the range.
+    Takes the minimum and maximum value of a category and returns a list of values within the inter-quartile range.
 
-    :param category: str
+    :param min_c: int | float
+    :param max_c: int | float
     :return: list[float | int]
     """
-    min_c, max_c = student_min_max(category)
     samples_range = max_c - min_c
     samples_iqr = (((samples_range / 100) * 60) - ((samples_range / 100) * 40)) / 10
     return [(min_c + ((samples_range / 100) * 40)) + (i * samples_iqr) for i in range(11)]
+
+
+def numeric_ranges_pipeline(categories: list[str], training: bool = True) -> list[dict]:
+    """
+    Returns the aggregation pipeline calculating the minimum and maximum value of every category in a single pass.
+
+    :param categories: list[str]
+    :param training: bool
+    :return: list[dict]
+    """
+    group = {"_id": None}
+    for category in categories:
+        group[f"{category}__min"] = {"$min": f"${category}"}
+        group[f"{category}__max"] = {"$max": f"${category}"}
+    return [{"$match": dataset_filters["training"] if training else dict()}, {"$group": group}]
+
+
+def student_numeric_ranges(training: bool = True) -> dict:
+    """
+    Returns the minimum and maximum value of every numeric category on the training or full dataset.
+
+    All categories are calculated in a single aggregation. Categories whose values are not numeric are excluded.
+
+    :param training: bool
+    :return: dict of category: (min, max) pairs
+    """
+    results = list(students.aggregate(numeric_ranges_pipeline(student_categories, training)))
+    if not results:
+        return dict()
+    ranges = dict()
+    for category in student_categories:
+        min_c, max_c = results[0].get(f"{category}__min"), results[0].get(f"{category}__max")
+        if any(isinstance(i, bool) or not isinstance(i, (int, float)) for i in (min_c, max_c)):
+            continue
+        ranges[category] = (min_c, max_c)
+    return ranges
+
+
+def update_numeric_grids() -> dict:
+    """
+    Calculates the perturbation grid of every numeric category from the training data and stores them in the controls.
+
+    This should be called whenever the training dataset changes. Returns the grids that were stored.
+
+    :return: dict
+    """
+    grids = {k: percentile_grid(*v) for k, v in student_numeric_ranges().items()}
+    if not update_controls({"numeric_grids": grids}):
+        logging.error("Numeric grids could not be stored in the controls")
+    return grids
+
+
+def student_iqr_percentiles(category: str) -> list[float | int]:
+    """
+    Returns a list of values within the inter-quartile range of a specified category.
+
+    The values are served from the grids stored in the controls, which are calculated once from the training data when
+    the training dataset is created. If no grid has been stored for the category it is calculated from the minimum and
+    maximum values of the training data without being stored.
+
+    :param category: str
+    :return: list[float | int]
+    """
+    grids = get_controls().numeric_grids
+    if grids and category in grids:
+        return grids[category]
+    return percentile_grid(*student_min_max(category))
@@ -1,6 +1,7 @@
 from bson import ObjectId
 from db.services_pymongo import controls
 import logging
+import time
 
 logging.getLogger(__name__)
 
@@ -20,6 +21,13 @@ class Controls:
 
         meta_translation: list - A list of all encoded feature categories in a specified order
 
+        numeric_grids: dict | None - The perturbation grid for every numeric feature, calculated from the training data
+
+        dataset_fingerprint: str | None - Identifies the current students and split, changed whenever either changes
+
+        generation: int - Set from the clock when the controls are created and incremented every time they are updated,
+                          used to invalidate caches
+
 
         Methods
 
@@ -37,6 +45,9 @@ class Controls:
         self.name = "control"
         self.feature_translation: list | None = None
         self.meta_translation: list | None = None
+        self.numeric_grids: dict | None = None
+        self.dataset_fingerprint: str | None = None
+        self.generation: int = 0
 
         if attributes:
             for k, v in attributes.items():
@@ -53,7 +64,10 @@ class Controls:
             "_id": str(self._id),
             "name": self.name,
             "feature_translation": self.feature_translation,
-            "meta_translation": self.meta_translation
+            "meta_translation": self.meta_translation,
+            "numeric_grids": self.numeric_grids,
+            "dataset_fingerprint": self.dataset_fingerprint,
+            "generation": self.generation
         }
 
     def info_db(self) -> dict:
@@ -74,6 +88,8 @@ class Controls:
         :return: bool
         """
         try:
+            # Recreated controls must never reuse the generation of a previous document, caches may still hold it.
+            self.generation = max(self.generation + 1, time.time_ns())
             inserted = controls.insert_one(self.info_db())
             self._id = ObjectId(inserted.inserted_id)
             logging.info('Controls successfully created')
@@ -86,15 +102,22 @@ class Controls:
 
         return True
 
-    def update_document(self) -> bool:
+    def update_document(self, attributes: list[str] | None = None) -> bool:
         """
-        Updates the relevant document in the database.
+        Updates the relevant document in the database and increments its generation.
+
+        If attributes are given only those attributes are written, all others keep their values in the database.
 
+        :param attributes: list[str] | None
         :return: bool
         """
         try:
             assert self.name
-            controls.update_one({"name": self.name}, {"$set": self.info_db()})
+            info = self.info_db()
+            del info["generation"]
+            if attributes is not None:
+                info = {k: v for k, v in info.items() if k in attributes}
+            controls.update_one({"name": self.name}, {"$set": info, "$inc": {"generation": 1}})
             logging.info('Controls successfully updated')
             return True
         except Exception as e:
@@ -0,0 +1,136 @@
+from db.controllers_controls import get_controls
+from db.controllers_student import all_priors_pipeline, class_counts_pipeline, count_pipeline, dataset_filters
+from db.controllers_student import dataset_projection, min_max_query, numeric_ranges_pipeline, student_categories
+from db.controllers_student import test_sample_pipeline
+from db.services_pymongo import db, students
+import logging
+from pymongo import DESCENDING
+
+logging.getLogger(__name__)
+
+
+def plan_stages(explanation: dict) -> list[str]:
+    """
+    Returns the stages of the winning plans in the output of an explain command, outermost stage first.
+
+    The stages are collected from every winningPlan in the output, so the plans of find, count and aggregate commands
+    (including every facet of an aggregation) are covered. Rejected plans are ignored.
+
+    :param explanation: dict
+    :return: list[str]
+    """
+    stages = list()
+
+    def collect(node, winning: bool) -> None:
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == "rejectedPlans":
+                    continue
+                if key == "stage" and winning and isinstance(value, str):
+                    stages.append(value)
+                collect(value, winning or key == "winningPlan")
+        elif isinstance(node, list):
+            for item in node:
+                collect(item, winning)
+
+    collect(explanation, False)
+    return stages
+
+
+def explain_find(filters: dict, projection: dict | None = None, sort: list | None = None) -> dict:
+    """
+    Returns the query plan of a find on the students collection, limited to one document if a sort is given.
+
+    :param filters: dict
+    :param projection: dict | None
+    :param sort: list | None - List of (key, direction) pairs
+    :return: dict
+    """
+    command = {"find": students.name, "filter": filters}
+    if projection is not None:
+        command["projection"] = projection
+    if sort:
+        command["sort"] = dict(sort)
+        command["limit"] = 1
+    return db.command("explain", command, verbosity="queryPlanner")
+
+
+def explain_aggregate(pipeline: list[dict]) -> dict:
+    """
+    Returns the query plan of an aggregation on the students collection.
+
+    :param pipeline: list[dict]
+    :return: dict
+    """
+    return db.command("explain", {"aggregate": students.name, "pipeline": pipeline, "cursor": dict()},
+                      verbosity="queryPlanner")
+
+
+def controller_queries(numeric_categories: list[str] | None = None, variables: list[str] | None = None) -> dict:
+    """
+    Returns the queries made by the student controllers, a dict of query name: function returning its query plan.
+
+    The numeric categories default to the categories with a numeric grid in the controls and the prior variables to
+    a representative one. Queries that read the whole collection by design (the training / test split and the
+    student count) are not included.
+
+    :param numeric_categories: list[str] | None
+    :param variables: list[str] | None
+    :return: dict
+    """
+    if numeric_categories is None:
+        numeric_categories = list((get_controls().numeric_grids or dict()).keys())
+    variables = variables or ["course"]
+    training, test = dataset_filters["training"], dataset_filters["test"]
+    queries = {
+        "training_dataset": lambda: explain_find(training, dataset_projection),
+        "test_dataset": lambda: explain_find(test, dataset_projection),
+        "training_dataset_count": lambda: explain_aggregate(count_pipeline(training)),
+        "test_dataset_count": lambda: explain_aggregate(count_pipeline(test)),
+        "test_feature_sample": lambda: explain_aggregate(test_sample_pipeline(1)),
+        "student_overview": lambda: explain_aggregate(class_counts_pipeline(training)),
+        "student_priors_all": lambda: explain_aggregate(all_priors_pipeline(variables)),
+        "student_numeric_ranges": lambda: explain_aggregate(numeric_ranges_pipeline(student_categories)),
+    }
+    for variable in variables:
+        queries[f"student_priors:{variable}"] = lambda v=variable: explain_aggregate(
+            class_counts_pipeline({**training, v: None}))
+    for category in numeric_categories:
+        for on_training in (True, False):
+            filters, projection = min_max_query(category, on_training)
+            for direction, name in ((1, "min"), (DESCENDING, "max")):
+                queries[f"student_min_max:{category}:{name}{'' if on_training else ':all'}"] = \
+                    lambda f=filters, p=projection, c=category, d=direction: explain_find(f, p, [(c, d)])
+    return queries
+
+
+def query_plan_report(numeric_categories: list[str] | None = None, variables: list[str] | None = None) -> list[dict]:
+    """
+    Runs explain on every controller query (see controller_queries) and reports whether it scans the whole collection.
+
+    Returns a list with a dict per query containing the query name, the stages of its winning plan, whether it uses a
+    COLLSCAN and whether the plan includes a FETCH (False for queries covered by an index). Every COLLSCAN is logged
+    as a warning.
+
+    :param numeric_categories: list[str] | None
+    :param variables: list[str] | None
+    :return: list[dict]
+    """
+    report = list()
+    for name, explain in controller_queries(numeric_categories, variables).items():
+        try:
+            stages = plan_stages(explain())
+        except Exception as e:
+            logging.error(f"Could not explain query {name}: {e}")
+            report.append({"query": name, "stages": list(), "collscan": None, "fetch": None, "error": str(e)})
+            continue
+        collscan = "COLLSCAN" in stages
+        if collscan:
+            logging.warning(f"Query {name} scans the whole students collection: {' > '.join(stages)}")
+        report.append({"query": name, "stages": stages, "collscan": collscan, "fetch": "FETCH" in stages})
+    return report
+
+
+if __name__ == "__main__":
+    for entry in query_plan_report():
+        print(f"{'COLLSCAN' if entry['collscan'] else 'ok':<9}{entry['query']:<70}{' > '.join(entry['stages'])}")
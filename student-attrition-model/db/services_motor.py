@@ -0,0 +1,49 @@
+from db.services_pymongo import client_options, database_uri
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection, AsyncIOMotorDatabase
+
+# The asynchronous client is bound to the event loop it is created in, so it is only created on first use.
+async_client: AsyncIOMotorClient | None = None
+
+
+def get_async_database() -> AsyncIOMotorDatabase:
+    """
+    Returns the asynchronous handle of the platform database, creating the client on first use.
+
+    The client shares the connection pool size and timeout settings of the synchronous client.
+
+    :return: AsyncIOMotorDatabase
+    """
+    global async_client
+    if async_client is None:
+        async_client = AsyncIOMotorClient(database_uri, **client_options())
+    return async_client.student_attrition_intervention
+
+
+def async_students() -> AsyncIOMotorCollection:
+    """
+    Returns the asynchronous handle of the students collection.
+
+    :return: AsyncIOMotorCollection
+    """
+    return get_async_database().students
+
+
+def async_controls() -> AsyncIOMotorCollection:
+    """
+    Returns the asynchronous handle of the controls collection.
+
+    :return: AsyncIOMotorCollection
+    """
+    return get_async_database().controls
+
+
+def close_async_client() -> None:
+    """
+    Closes the asynchronous client, a new client is created by the next call to get_async_database.
+
+    :return: None
+    """
+    global async_client
+    if async_client is not None:
+        async_client.close()
+        async_client = None
@@ -1,11 +1,32 @@
-from pymongo import MongoClient, ASCENDING
+from pymongo import MongoClient, ASCENDING, IndexModel
 from pymongo.collection import Collection
+from pymongo.errors import OperationFailure
+from system_tools.settings import ANALYSIS_CACHE_TTL, MONGO_CONNECT_TIMEOUT_MS, MONGO_HOST, MONGO_MAX_POOL_SIZE
+from system_tools.settings import MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_SOCKET_TIMEOUT_MS
 
 docker = True
 
 # Connect to mongoDB
-database = 'database' if docker else '127.0.0.1'
-client = MongoClient(f'mongodb://{database}:27017/')
+database = MONGO_HOST if docker else '127.0.0.1'
+database_uri = f'mongodb://{database}:27017/'
+
+
+def client_options() -> dict:
+    """
+    Returns the connection pool and timeout options shared by the synchronous and asynchronous MongoDB clients.
+
+    :return: dict
+    """
+    return {
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": MONGO_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": MONGO_SOCKET_TIMEOUT_MS or None,
+    }
+
+
+# The connection is only opened by the first operation, so importing this module never blocks.
+client = MongoClient(database_uri, connect=False, **client_options())
 
 # Connect to specific database
 db = client.student_attrition_intervention
@@ -13,6 +34,7 @@ db = client.student_attrition_intervention
 # Connect to specific collection in database
 students: Collection = db.students
 controls: Collection = db.controls
+analysis_cache: Collection = db.analysis_cache
 
 
 def create_index(collection: Collection, attribute: str) -> str:
@@ -27,11 +49,62 @@ def create_index(collection: Collection, attribute: str) -> str:
     return collection.create_index([(attribute, ASCENDING)], unique=True)
 
 
-def create_all_indexes() -> None:
+def student_indexes(numeric_categories: list[str] | None = None) -> list[IndexModel]:
+    """
+    Returns the index plan of the students collection.
+
+    The split indexes serve every query filtering on the training or test dataset, with the target so that counts per
+    class are answered from the index. Each numeric category gets an index on the category and the split flag, which
+    covers the minimum / maximum queries of student_min_max with or without the training filter. Every write of a
+    student updates the category indexes, so they should be created after bulk ingests and training / test splits.
+
+    :param numeric_categories: list[str] | None
+    :return: list[IndexModel]
+    """
+    indexes = [
+        IndexModel([("training_data", ASCENDING), ("target", ASCENDING)], name="training_data_target"),
+        IndexModel([("test_data", ASCENDING), ("target", ASCENDING)], name="test_data_target"),
+    ]
+    for category in numeric_categories or list():
+        keys = [(category, ASCENDING), ("training_data", ASCENDING)]
+        indexes.append(IndexModel(keys, name=f"{category}_training_data"))
+    return indexes
+
+
+def create_all_indexes(numeric_categories: list[str] | None = None) -> None:
     """
     Create all relevant indexes required by the database.
 
+    Creating an index that already exists has no effect, so this is safe to call on every start. The numeric categories
+    determine the covered indexes for the statistics queries, see student_indexes.
+
+    :param numeric_categories: list[str] | None
     :return: None
     """
     create_index(controls, "name")
+    students.create_indexes(student_indexes(numeric_categories))
+    # Cached feature analysis results are removed by MongoDB once they expire.
+    create_ttl_index(analysis_cache, "created_at", ANALYSIS_CACHE_TTL)
+
+
+def create_ttl_index(collection: Collection, attribute: str, seconds: int) -> None:
+    """
+    Create an index that makes MongoDB remove documents once the attribute is older than the given number of seconds.
+
+    If the index already exists with a different expiry (the setting changed since it was created) the expiry of the
+    existing index is updated instead.
+
+    :param collection: Collection
+    :param attribute: str
+    :param seconds: int
+    :return: None
+    """
+    try:
+        collection.create_index([(attribute, ASCENDING)], expireAfterSeconds=seconds)
+    except OperationFailure as e:
+        # IndexOptionsConflict
+        if e.code != 85:
+            raise
+        collection.database.command("collMod", collection.name,
+                                    index={"keyPattern": {attribute: 1}, "expireAfterSeconds": seconds})
 
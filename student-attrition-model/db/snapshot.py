@@ -0,0 +1,130 @@
+import json
+import logging
+import numpy as np
+import os
+import shutil
+from system_tools.settings import DATASET_SNAPSHOT_LOCATION, DATASET_SNAPSHOT_STALE_SECONDS
+import time
+
+logging.getLogger(__name__)
+
+
+def snapshot_location() -> str:
+    """
+    Returns the path of the directory containing the dataset snapshots (DATASET_SNAPSHOT_LOCATION if set).
+
+    :return: str
+    """
+    if DATASET_SNAPSHOT_LOCATION:
+        return DATASET_SNAPSHOT_LOCATION
+    current_file = 'snapshot.py'
+    root = os.path.realpath(current_file).split('student-attrition-model')[0]
+    return os.path.join(root, 'student-attrition-model', 'data', 'snapshots')
+
+
+def snapshot_generation(directory: str) -> int:
+    """
+    Returns the controls generation recorded in the manifest of a snapshot directory, -1 if it cannot be read.
+
+    :param directory: str
+    :return: int
+    """
+    try:
+        with open(os.path.join(directory, "manifest.json"), "r") as f:
+            return int(json.load(f).get("generation", -1))
+    except Exception:
+        return -1
+
+
+def remove_old_snapshots(location: str, fingerprint: str, generation: int) -> None:
+    """
+    Removes the snapshots recorded at an older controls generation than the given snapshot and the temporary
+    directories left behind by writers that did not finish within DATASET_SNAPSHOT_STALE_SECONDS.
+
+    Snapshots of a newer generation are kept, so a worker with outdated controls never removes the current snapshot.
+
+    :param location: str
+    :param fingerprint: str
+    :param generation: int
+    :return: None
+    """
+    now = time.time()
+    for entry in os.listdir(location):
+        path = os.path.join(location, entry)
+        if entry.startswith("."):
+            try:
+                stale = entry.endswith(".tmp") and now - os.path.getmtime(path) > DATASET_SNAPSHOT_STALE_SECONDS
+            except OSError:
+                continue
+            if stale:
+                shutil.rmtree(path, ignore_errors=True)
+        elif entry != fingerprint and snapshot_generation(path) < generation:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def write_snapshot(fingerprint: str, datasets: dict, location: str | None = None, generation: int = 0) -> None:
+    """
+    Saves the encoded datasets as a snapshot identified by the dataset fingerprint and removes all older snapshots.
+
+    Every feature matrix and label array is stored as an uncompressed .npy file, so it can be memory mapped when read,
+    together with a manifest of the number of rows in every dataset and the controls generation the snapshot belongs
+    to. The directory is written under a temporary name and renamed once complete, so a partially written snapshot is
+    never read. Only snapshots of an older generation are removed (see remove_old_snapshots).
+
+    :param fingerprint: str
+    :param datasets: dict of dataset name: (features, labels)
+    :param location: str | None
+    :param generation: int - The controls generation the dataset fingerprint was read at
+    :return: None
+    """
+    location = location or snapshot_location()
+    os.makedirs(location, exist_ok=True)
+    # Workers may build the same snapshot at the same time, each writes its own temporary directory.
+    temporary = os.path.join(location, f".{fingerprint}.{os.getpid()}.tmp")
+    target = os.path.join(location, fingerprint)
+    shutil.rmtree(temporary, ignore_errors=True)
+    os.makedirs(temporary)
+
+    manifest = {"fingerprint": fingerprint, "generation": generation, "datasets": dict()}
+    for name, (features, labels) in datasets.items():
+        np.save(os.path.join(temporary, f"{name}_features.npy"), np.ascontiguousarray(features, dtype=np.float32))
+        # Labels are stored as fixed width strings, object arrays cannot be memory mapped.
+        np.save(os.path.join(temporary, f"{name}_labels.npy"), np.asarray(labels, dtype=str))
+        manifest["datasets"][name] = len(labels)
+    with open(os.path.join(temporary, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    if os.path.exists(target):
+        shutil.rmtree(target)
+    os.replace(temporary, target)
+    remove_old_snapshots(location, fingerprint, generation)
+    logging.info(f"Dataset snapshot {fingerprint} saved")
+
+
+def read_snapshot(fingerprint: str, location: str | None = None) -> dict | None:
+    """
+    Returns the datasets of the snapshot identified by the dataset fingerprint, or None if there is no such snapshot.
+
+    The feature matrices are memory mapped read only. Returns a dict of dataset name: (features, labels).
+
+    :param fingerprint: str
+    :param location: str | None
+    :return: dict | None
+    """
+    directory = os.path.join(location or snapshot_location(), fingerprint)
+    try:
+        with open(os.path.join(directory, "manifest.json"), "r") as f:
+            manifest = json.load(f)
+        datasets = dict()
+        for name, rows in manifest["datasets"].items():
+            features = np.load(os.path.join(directory, f"{name}_features.npy"), mmap_mode="r")
+            labels = np.load(os.path.join(directory, f"{name}_labels.npy")).astype(object)
+            if len(features) != rows or len(labels) != rows:
+                raise ValueError(f"{name} has {len(features)} rows instead of {rows}")
+            datasets[name] = features, labels
+        return datasets
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.error(f"Could not read dataset snapshot {fingerprint}: {e}")
+        return None
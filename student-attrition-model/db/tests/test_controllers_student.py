@@ -1,4 +1,5 @@
 import os
+import db.controllers_student as controllers_student
 from db.controllers_student import *
 from test_raw_data import test_sample
 from pandas import DataFrame
@@ -34,6 +35,14 @@ def test_generate_new_student():
     # print(student.features)
 
 
+def test_encode_students():
+    student = generate_new_student(test_sample, schema())
+    samples, features = encode_students(DataFrame([test_sample, test_sample]), schema())
+    assert len(samples) == len(features) == 2
+    for sample, f in zip(samples.to_dict('records'), features.itertuples(index=False, name=None)):
+        assert Student({**sample, 'features': list(f)}).info_db() == student.info_db()
+
+
 def test_generate_student_dataframe():
     assert type(generate_student_dataframe(schema())) == DataFrame
 
@@ -46,17 +55,148 @@ def test_student_priors():
     print(student_priors('international', True))
 
 
+def test_student_priors_all():
+    priors = student_priors_all(schema())
+    for variable, values in priors.items():
+        for prior in values:
+            assert prior == {'value': prior['value'], **student_priors(variable, prior['value'])}
+
+
 def test_student_iqr_percentiles():
     print(student_iqr_percentiles("gdp"))
 
 
+def test_numeric_grids():
+    grids = update_numeric_grids()
+    for category, grid in grids.items():
+        assert grid == percentile_grid(*student_min_max(category))
+        assert student_iqr_percentiles(category) == grid
+
+
+class FakeCursor:
+    """
+    Iterates over a list of documents like a pymongo cursor.
+    """
+    def __init__(self, documents: list[dict]):
+        self.documents = documents
+
+    def batch_size(self, size: int):
+        return self
+
+    def __iter__(self):
+        return iter(self.documents)
+
+
+class FakeStudents:
+    """
+    Stands in for the students collection, recording every write.
+    """
+    def __init__(self, documents: list[dict] | None = None, count: int | None = None):
+        self.documents = documents or list()
+        self.count = count
+        self.inserts = list()
+        self.requests = list()
+
+    def count_documents(self, filters: dict) -> int:
+        return len(self.documents) if self.count is None else self.count
+
+    def find(self, filters: dict | None = None, projection: dict | None = None) -> FakeCursor:
+        return FakeCursor(self.documents)
+
+    def insert_many(self, documents: list[dict], ordered: bool = True):
+        self.inserts.append(list(documents))
+        return type("InsertManyResult", (), {"inserted_ids": list(range(len(documents)))})()
+
+    def bulk_write(self, requests: list, ordered: bool = True) -> None:
+        self.requests.extend(requests)
+
+
+def test_bulk_create_students(monkeypatch):
+    fake = FakeStudents()
+    touched = list()
+    progress = list()
+    monkeypatch.setattr(controllers_student, "students", fake)
+    monkeypatch.setattr(controllers_student, "touch_dataset", lambda: touched.append(1))
+    data = DataFrame([test_sample] * 5)
+    inserted = bulk_create_students(data, schema(), batch_size=2, progress=lambda *args: progress.append(args))
+    assert inserted == 5
+    assert [len(batch) for batch in fake.inserts] == [2, 2, 1]
+    assert progress[-1] == (5, 5)
+    assert len(touched) == 1
+
+    # Nothing inserted, so the dataset fingerprint is left as it is.
+    assert bulk_create_students(data.iloc[:0], schema(), batch_size=2) == 0
+    assert len(touched) == 1
+
+
+def split_students(monkeypatch, seed: int) -> tuple[list, list]:
+    targets = ["Graduate"] * 50 + ["Dropout"] * 30 + ["Enrolled"] * 20
+    fake = FakeStudents([{"_id": index, "target": target} for index, target in enumerate(targets)])
+    monkeypatch.setattr(controllers_student, "students", fake)
+    monkeypatch.setattr(controllers_student, "UpdateMany", lambda filters, update: (filters, update))
+    monkeypatch.setattr(controllers_student, "touch_dataset", lambda: None)
+    monkeypatch.setattr(controllers_student, "update_numeric_grids", lambda: dict())
+    assert create_training_test_datasets(80.0, seed)
+    training, test = list(), list()
+    for filters, update in fake.requests:
+        (training if update["$set"]["training_data"] else test).extend(filters["_id"]["$in"])
+    return sorted(training), sorted(test)
+
+
+def test_create_training_test_datasets_seed(monkeypatch):
+    training, test = split_students(monkeypatch, 7)
+    assert len(training) + len(test) == 100 and not set(training) & set(test)
+    # Stratified: 80% of every class is in the training dataset.
+    targets = ["Graduate"] * 50 + ["Dropout"] * 30 + ["Enrolled"] * 20
+    counts = {target: sum(targets[i] == target for i in training) for target in set(targets)}
+    assert counts == {"Graduate": 40, "Dropout": 24, "Enrolled": 16}
+    assert split_students(monkeypatch, 7) == (training, test)
+    assert split_students(monkeypatch, 8) != (training, test)
+
+
+def test_load_features_and_labels(monkeypatch):
+    documents = [{"features": [i, i + 0.5, 1], "target": "Graduate"} for i in range(5)]
+    # Two students were inserted after they were counted.
+    monkeypatch.setattr(controllers_student, "students", FakeStudents(documents, count=3))
+    features, labels = load_features_and_labels({"training_data": True})
+    assert features.dtype == np.float32
+    assert features.shape == (3, 3) and len(labels) == 3
+    assert features[2].tolist() == [2.0, 2.5, 1.0]
+
+    monkeypatch.setattr(controllers_student, "students", FakeStudents(documents, count=0))
+    features, labels = load_features_and_labels({"training_data": True})
+    assert features.shape == (0, 0) and features.dtype == np.float32 and len(labels) == 0
+
+
+def test_training_dataset_resampled_seed(monkeypatch):
+    labels = np.array(["Graduate"] * 60 + ["Dropout"] * 30 + ["Enrolled"] * 20, dtype=object)
+    features = np.arange(len(labels) * 2, dtype=np.float32).reshape(len(labels), 2)
+    monkeypatch.setattr(controllers_student, "dataset_arrays", lambda name: (features, labels))
+    resampled_features, resampled_labels = training_dataset_resampled(seed=3)
+    # Every class is drawn ten times a tenth of the mean class size: 10 * int(110 / 3 / 10) = 30 samples.
+    assert resampled_features.shape == (90, 2)
+    assert {c: int(np.sum(resampled_labels == c)) for c in set(labels)} == {"Graduate": 30, "Dropout": 30,
+                                                                           "Enrolled": 30}
+    # The features stay with their labels.
+    assert all(labels[int(row[0]) // 2] == label for row, label in zip(resampled_features, resampled_labels))
+    again = training_dataset_resampled(seed=3)
+    assert np.array_equal(again[0], resampled_features) and list(again[1]) == list(resampled_labels)
+    assert not np.array_equal(training_dataset_resampled(seed=4)[0], resampled_features)
+
+    [train_features, _], [validation_features, _] = training_dataset_resampled(True, 20.0, seed=3)
+    assert (len(train_features), len(validation_features)) == (72, 18)
+
+
 def test():
     print(schema())
     # test_training_dataset_resampled()
     # test_generate_new_student()  # generates new data in the database if initialisation is set to true so be careful.
+    # test_encode_students()
     # test_generate_student_dataframe()
     # test_student_priors()
+    # test_student_priors_all()
     # test_student_iqr_percentiles()
+    # test_numeric_grids()  # updates the numeric grids stored in the controls.
 
 
 test()
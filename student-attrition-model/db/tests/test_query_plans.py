@@ -0,0 +1,19 @@
+from db.query_plans import plan_stages
+from db.services_pymongo import student_indexes
+
+
+def test_plan_stages():
+    covered = {"stage": "PROJECTION_COVERED", "inputStage": {"stage": "IXSCAN", "indexName": "gdp_training_data"}}
+    find = {"queryPlanner": {"winningPlan": covered, "rejectedPlans": [{"stage": "COLLSCAN"}]}}
+    assert plan_stages(find) == ["PROJECTION_COVERED", "IXSCAN"]
+    aggregate = {"stages": [
+        {"$cursor": {"queryPlanner": {"winningPlan": {"stage": "FETCH", "inputStage": {"stage": "COLLSCAN"}}}}},
+        {"$group": {"_id": "$target"}},
+    ]}
+    assert plan_stages(aggregate) == ["FETCH", "COLLSCAN"]
+
+
+def test_student_indexes():
+    indexes = [index.document for index in student_indexes(["gdp"])]
+    assert [index["name"] for index in indexes] == ["training_data_target", "test_data_target", "gdp_training_data"]
+    assert list(indexes[2]["key"].items()) == [("gdp", 1), ("training_data", 1)]
@@ -0,0 +1,47 @@
+import db.controllers_student as controllers_student
+from db.models_controls import Controls
+from db.snapshot import read_snapshot, write_snapshot
+import numpy as np
+import os
+import tempfile
+import time
+
+
+def test_snapshot_round_trip():
+    with tempfile.TemporaryDirectory() as location:
+        labels = np.array(["Graduate", "Dropout", "Enrolled", "Graduate"], dtype=object)
+        training = np.arange(12, dtype=np.float64).reshape(4, 3), labels
+        test = np.ones((2, 3)), np.array(["Dropout", "Graduate"], dtype=object)
+        write_snapshot("first", {"training": training, "test": test}, location, generation=1)
+        datasets = read_snapshot("first", location)
+        assert isinstance(datasets["training"][0], np.memmap)
+        assert datasets["training"][0].dtype == np.float32
+        assert np.array_equal(datasets["training"][0], training[0])
+        assert list(datasets["training"][1]) == list(training[1])
+        assert list(datasets["test"][1]) == list(test[1])
+        assert read_snapshot("second", location) is None
+
+        abandoned = os.path.join(location, ".first.0.tmp")
+        os.makedirs(abandoned)
+        os.utime(abandoned, (time.time() - 86400, time.time() - 86400))
+        write_snapshot("second", {"training": training, "test": test}, location, generation=2)
+        assert os.listdir(location) == ["second"]
+        assert read_snapshot("first", location) is None
+
+        # A worker with outdated controls does not remove the newer snapshot.
+        write_snapshot("first", {"training": training, "test": test}, location, generation=1)
+        assert sorted(os.listdir(location)) == ["first", "second"]
+
+
+def test_dataset_arrays_without_fingerprint(monkeypatch):
+    def unavailable(*args, **kwargs):
+        raise AssertionError("The snapshot must not be used without a fingerprint")
+
+    # Without a controls document no fingerprint can be stored, so the dataset is loaded from the database.
+    monkeypatch.setattr(controllers_student, "DATASET_SNAPSHOT", True)
+    monkeypatch.setattr(controllers_student, "get_controls", lambda: Controls())
+    monkeypatch.setattr(controllers_student, "touch_dataset", lambda: None)
+    monkeypatch.setattr(controllers_student, "read_snapshot", unavailable)
+    monkeypatch.setattr(controllers_student, "write_snapshot", unavailable)
+    monkeypatch.setattr(controllers_student, "load_features_and_labels", lambda filters: filters)
+    assert controllers_student.dataset_arrays("test") == {"test_data": True}
@@ -1,2 +1,3 @@
+from feature_translation.codec import FeatureCodec, get_codec, reset_codec
 from feature_translation.translation import create_translator, features_hr, features_n, features_update
 from feature_translation.translation import get_dataset_schema, get_dict_key_by_value
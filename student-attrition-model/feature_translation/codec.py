@@ -0,0 +1,243 @@
+from db import get_controls
+import logging
+import numpy as np
+
+logging.getLogger(__name__)
+
+
+class FeatureCodec:
+    """
+        This class contains a compiled translation between human-readable features and the numeric feature vector.
+
+        The codec is built once from the dataset schema and the translation lists stored in the controls, every lookup
+        required to encode or decode a feature is precomputed so values can be written straight into a vector or a
+        matrix without translating the remaining features.
+
+
+        Attributes
+
+        features: list[str] - The human-readable feature names in the order they appear in the feature vector
+
+        width: int - The length of the numeric feature vector
+
+        types: dict - The variable type of each feature
+
+        slots: dict - The column (or columns for one-hot encoded features) of each feature in the feature vector
+
+        categories: dict - For one-hot encoded features, a mapping of category to column in the feature vector
+
+        defaults: dict - For one-hot encoded features, the category represented by a vector of zeros
+
+        encoders: dict - For boolean and ordinal features, a mapping of human-readable value to numeric value
+
+        decoders: dict - For boolean and ordinal features, a mapping of numeric value to human-readable value
+
+
+        Methods
+
+        encode_value: int | float - Returns the numeric representation of a single (non one-hot encoded) value.
+
+        set_value: np.ndarray - Writes the encoded value of a feature into a vector or every row of a matrix.
+
+        set_values: np.ndarray - Writes one encoded value per row of a matrix for a single feature.
+
+        encode: np.ndarray - Converts a dictionary of features into a numeric feature vector.
+
+        encode_many: np.ndarray - Converts a list of feature dictionaries into a numeric feature matrix.
+
+        decode: dict - Converts a numeric feature vector into a dictionary of features.
+
+        decode_many: list[dict] - Converts a numeric feature matrix into a list of feature dictionaries.
+    """
+    def __init__(self, schema: dict, translation: list, meta_translation: list):
+        assert len(translation) == len(meta_translation)
+        self.features: list[str] = list()
+        self.width = len(translation)
+        self.types: dict = dict()
+        self.slots: dict = dict()
+        self.categories: dict = dict()
+        self.defaults: dict = dict()
+        self.encoders: dict = dict()
+        self.decoders: dict = dict()
+
+        for index, category in enumerate(meta_translation):
+            variable_type = schema["variable_types"].get(category)
+            if variable_type == 'ordinal' and 'qualification' not in category:
+                continue
+            if variable_type not in ('numeric', 'binary', 'boolean', 'ordinal', 'one_hot_encoded'):
+                continue
+            if category not in self.slots:
+                self.features.append(category)
+                self.types[category] = variable_type
+                self.slots[category] = list()
+            self.slots[category].append(index)
+
+        for category in self.features:
+            variable_type = self.types[category]
+            if variable_type == 'one_hot_encoded':
+                self.categories[category] = {translation[i]: i for i in self.slots[category]}
+                self.defaults[category] = schema['drop_list'][category]
+            else:
+                self.slots[category] = self.slots[category][0]
+            if variable_type == 'boolean':
+                self.encoders[category] = dict()
+                for key, value in schema[category].items():
+                    self.encoders[category].setdefault(value, int(key))
+                self.decoders[category] = {int(key): value for key, value in schema[category].items()}
+            if variable_type == 'ordinal':
+                meta_category = f'parental_{category.split("_")[1]}'
+                labels = schema[f"{meta_category}_labels"]
+                self.encoders[category] = dict()
+                for key, value in schema[f"{meta_category}_categories"].items():
+                    self.encoders[category].setdefault(value, labels.get(key))
+                self.decoders[category] = dict()
+                for key, value in labels.items():
+                    self.decoders[category].setdefault(value, schema[f"{meta_category}_categories"][key])
+
+    def encode_value(self, feature: str, value: str | int | float | bool) -> int | float:
+        """
+        Returns the numeric representation of a single value for a feature that occupies a single column.
+
+        :param feature: str
+        :param value: str | int | float | bool
+        :return: int | float
+        """
+        variable_type = self.types[feature]
+        if variable_type == 'numeric':
+            return value
+        if variable_type == 'binary':
+            return 1 if value is True or value == "Yes" else 0
+        try:
+            return self.encoders[feature][value]
+        except KeyError:
+            raise ValueError(f"{value} is not a valid value for {feature}")
+
+    def set_value(self, target: np.ndarray, feature: str, value: str | int | float | bool) -> np.ndarray:
+        """
+        Writes the encoded value of a feature into a feature vector, or into every row of a feature matrix.
+
+        The target is altered in place and returned for convenience.
+
+        :param target: np.ndarray
+        :param feature: str
+        :param value: str | int | float | bool
+        :return: np.ndarray
+        """
+        if self.types[feature] == 'one_hot_encoded':
+            target[..., self.slots[feature]] = 0
+            column = self.categories[feature].get(value)
+            if column is None and value != self.defaults[feature]:
+                raise ValueError(f"{value} is not a valid value for {feature}")
+            if column is not None:
+                target[..., column] = 1
+            return target
+        target[..., self.slots[feature]] = self.encode_value(feature, value)
+        return target
+
+    def set_values(self, target: np.ndarray, feature: str, values: list) -> np.ndarray:
+        """
+        Writes one encoded value per row of a feature matrix for a single feature.
+
+        The target is altered in place and returned for convenience.
+
+        :param target: np.ndarray
+        :param feature: str
+        :param values: list
+        :return: np.ndarray
+        """
+        assert len(values) == len(target)
+        if self.types[feature] == 'one_hot_encoded':
+            target[:, self.slots[feature]] = 0
+            for row, value in enumerate(values):
+                self.set_value(target[row], feature, value)
+            return target
+        target[:, self.slots[feature]] = [self.encode_value(feature, value) for value in values]
+        return target
+
+    def encode(self, features: dict) -> np.ndarray:
+        """
+        Converts a dictionary with feature label-value as key pairs into a numeric feature vector.
+
+        :param features: dict
+        :return: np.ndarray
+        """
+        vector = np.zeros(self.width, dtype=np.float64)
+        for feature in self.features:
+            self.set_value(vector, feature, features.get(feature))
+        return vector
+
+    def encode_many(self, features: list[dict]) -> np.ndarray:
+        """
+        Converts a list of feature dictionaries into a numeric feature matrix with one row per dictionary.
+
+        :param features: list[dict]
+        :return: np.ndarray
+        """
+        matrix = np.zeros((len(features), self.width), dtype=np.float64)
+        for feature in self.features:
+            values = [row.get(feature) for row in features]
+            if self.types[feature] == 'numeric':
+                matrix[:, self.slots[feature]] = values
+                continue
+            self.set_values(matrix, feature, values)
+        return matrix
+
+    def decode(self, vector: list | np.ndarray) -> dict:
+        """
+        Converts a numeric feature vector into a dictionary with feature_label: feature_value as key pairs.
+
+        :param vector: list | np.ndarray
+        :return: dict
+        """
+        feature_dict = dict()
+        for feature in self.features:
+            slot = self.slots[feature]
+            variable_type = self.types[feature]
+            if variable_type == 'numeric':
+                feature_dict[feature] = vector[slot]
+            elif variable_type == 'binary':
+                feature_dict[feature] = "Yes" if vector[slot] == 1 else "No"
+            elif variable_type == 'one_hot_encoded':
+                decoded = [category for category, column in self.categories[feature].items() if vector[column] != 0]
+                feature_dict[feature] = decoded[0] if len(decoded) == 1 else self.defaults[feature]
+            else:
+                feature_dict[feature] = self.decoders[feature].get(vector[slot])
+        return feature_dict
+
+    def decode_many(self, matrix: list[list] | np.ndarray) -> list[dict]:
+        """
+        Converts a numeric feature matrix into a list of feature dictionaries, one per row.
+
+        :param matrix: list[list] | np.ndarray
+        :return: list[dict]
+        """
+        return [self.decode(row) for row in matrix]
+
+
+# Process wide cache of the compiled codec and the controls generation it was compiled from.
+codec_cache = {"codec": None, "generation": None}
+
+
+def get_codec() -> FeatureCodec:
+    """
+    Returns the feature codec for the current schema and controls, compiling it when the controls generation changes.
+
+    :return: FeatureCodec
+    """
+    # Imported here as translation imports the codec for features_update.
+    from feature_translation.translation import get_dataset_schema
+    controls = get_controls()
+    if codec_cache["codec"] is None or codec_cache["generation"] != controls.generation:
+        codec_cache["codec"] = FeatureCodec(get_dataset_schema(), controls.feature_translation, controls.meta_translation)
+        codec_cache["generation"] = controls.generation
+    return codec_cache["codec"]
+
+
+def reset_codec() -> None:
+    """
+    Discards the compiled feature codec so that it is rebuilt from the latest controls on next use.
+
+    :return: None
+    """
+    codec_cache["codec"] = None
+    codec_cache["generation"] = None
@@ -1,5 +1,5 @@
 from feature_translation import *
-from db import generate_new_student, students, Student
+from db import controls_generation, generate_new_student, get_controls, students, Student
 import pandas
 import os
 import json
@@ -50,6 +50,24 @@ def test_features_update():
     print('updated 2     ', updated_list)
 
 
+def test_codec():
+    student = test_dataset()
+    codec = get_codec()
+    student_dict = features_hr(student.features)
+    assert codec.decode(student.features) == student_dict
+    assert codec.encode(student_dict).tolist() == features_n(student_dict)
+    assert codec.encode_many([student_dict, student_dict]).tolist() == [features_n(student_dict)] * 2
+    updated_list = features_update(student.features, 'course', 'Biofuel Production Technologies')
+    assert updated_list == features_n(features_update(student_dict, 'course', 'Biofuel Production Technologies', 'dict'))
+
+
+def test_schema_and_controls_cache():
+    assert get_dataset_schema() is get_dataset_schema()
+    controls = get_controls()
+    assert get_controls() is controls
+    assert get_controls(refresh=True).generation == controls_generation()
+
+
 def data_integrity_check():
     print("Data integrity check initiated...")
     student_list = [Student(i) for i in list(students.find())]
@@ -57,6 +75,7 @@ def data_integrity_check():
         translated = features_n(features_hr(student.features))
         for i, v in enumerate(student.features):
             assert v == translated[i]
+        assert get_codec().encode(features_hr(student.features)).tolist() == translated
     print("Data integrity check successfully completed")
 
 
@@ -67,6 +86,8 @@ def tests():
     # test_features_hr()
     # test_features_n()
     # test_features_update()
+    # test_codec()
+    # test_schema_and_controls_cache()
 
 if __name__ == "__main__":
     tests()
@@ -1,5 +1,7 @@
 from db import create_controls, get_controls, update_controls
+from feature_translation.codec import get_codec, reset_codec
 from feature_translation.tools import get_dict_key_by_value
+import numpy as np
 from pandas import DataFrame
 import json
 import logging
@@ -8,18 +10,30 @@ import os
 logging.getLogger(__name__)
 
 
+# Process wide cache of the dataset schema and the modification time of the file it was loaded from.
+schema_cache = {"schema": None, "modified": None}
+
+
 def get_dataset_schema() -> dict:
     """
     Returns the json file containing all information to understand the dataset as a dictionary representation.
 
+    The schema is parsed once and cached for the whole process until the file is modified. The returned dictionary is
+    shared between callers and must not be altered.
+
     :return: dict
     """
     current_file = 'translation.py'
     root = os.path.realpath(current_file).split('student-attrition-model')[0]
     path = os.path.join(root, 'student-attrition-model', 'data', 'dataset_legend.json')
     assert os.path.exists(path)
+    modified = os.stat(path).st_mtime_ns
+    if schema_cache["schema"] is not None and schema_cache["modified"] == modified:
+        return schema_cache["schema"]
     with open(path, 'rb') as f:
         schema_info = json.load(f)
+    schema_cache["schema"] = schema_info
+    schema_cache["modified"] = modified
     return schema_info
 
 
@@ -66,6 +80,7 @@ def create_translator(df: DataFrame, initialise: bool = False) -> list:
             except Exception as e:
                 logging.error("could not create or update controls", e)
                 raise Exception(e)
+        reset_codec()
         return
 
     return [item for sublist in translation for item in sublist]
@@ -155,7 +170,9 @@ def features_update(features: list | dict, attribute: str,  value: str | int | f
     """
     Takes a list or dictionary representation of the features, updates and returns it in the desired format.
 
-    Assumes that all inputs are valid values. Only one feature is altered, all other features remain the same.
+    Assumes that all inputs are valid values. Only one feature is altered, all other features remain the same. List
+    representations are updated in place on a copy of the numeric vector using the compiled feature codec, so the
+    remaining features are never translated.
 
     :param features: list | dict
     :param attribute: str
@@ -163,9 +180,15 @@ def features_update(features: list | dict, attribute: str,  value: str | int | f
     :param result_type: str
     :return: list | dict representation of features
     """
-    feature_dict = features_hr(features) if isinstance(features, list) else features
-    feature_dict[attribute] = value
+    codec = get_codec()
+    if isinstance(features, dict):
+        feature_dict = features
+        feature_dict[attribute] = value
+        if result_type == 'dict':
+            return feature_dict
+        return codec.encode(feature_dict).tolist()
     if result_type == 'dict':
+        feature_dict = codec.decode(features)
+        feature_dict[attribute] = value
         return feature_dict
-    return features_n(feature_dict)
-
+    return codec.set_value(np.array(features, dtype=np.float64), attribute, value).tolist()
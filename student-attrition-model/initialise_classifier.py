@@ -1,3 +1,110 @@
-from classifier import Classifier
+from classifier import Classifier, ModelRegistry
+from classifier.model_classifier import train_model_artifact
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from db import student_overview
+from initialise_data import initialise_database
+import logging
+import multiprocessing
+from system_tools.settings import MODEL_TRAINING_PROCESS
+import threading
 
-classifier_model = Classifier()
+logging.getLogger(__name__)
+
+# The classifier is created without models, they are loaded or trained in the background once the app is serving.
+# Requests must read model_registry.current once and keep that reference, as the classifier may be replaced.
+model_registry = ModelRegistry(Classifier(initialise=False))
+
+# Progress of the model initialisation, reported by the readiness endpoint.
+model_status = {"stage": "pending", "error": None, "started_at": None, "finished_at": None}
+model_status_lock = threading.Lock()
+
+
+def set_model_stage(stage: str, error: str | None = None) -> None:
+    """
+    Records the current stage of the model initialisation.
+
+    :param stage: str
+    :param error: str | None
+    :return: None
+    """
+    with model_status_lock:
+        model_status["stage"] = stage
+        model_status["error"] = error
+        if stage in ("ready", "failed"):
+            model_status["finished_at"] = datetime.now(timezone.utc).isoformat()
+    logging.info(f"Model initialisation: {stage}")
+
+
+def model_readiness() -> dict:
+    """
+    Returns the progress of the model initialisation and whether the classifier is ready to serve predictions.
+
+    :return: dict
+    """
+    with model_status_lock:
+        status = dict(model_status)
+    classifier_model = model_registry.current
+    status["ready"] = classifier_model.trained
+    status["version"] = classifier_model.version
+    return status
+
+
+def train_classifier() -> None:
+    """
+    Trains new models, saves them as the latest model artifact and activates them.
+
+    If MODEL_TRAINING_PROCESS is set the models are trained in a separate process, otherwise in the current thread.
+    Either way the classifier only becomes ready once the trained models are complete and saved.
+
+    :return: None
+    """
+    if MODEL_TRAINING_PROCESS:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            version = executor.submit(train_model_artifact).result()
+    else:
+        version = train_model_artifact()
+    if version is not None:
+        model_registry.activate(version)
+
+
+def initialise_classifier() -> None:
+    """
+    Initialises the database and the classifier, training the models if no saved models exist.
+
+    The progress is recorded in model_status and any error is logged instead of raised, so a failure never stops the
+    app from serving its liveness and readiness endpoints.
+
+    :return: None
+    """
+    with model_status_lock:
+        model_status["started_at"] = datetime.now(timezone.utc).isoformat()
+    try:
+        set_model_stage("initialising database")
+        initialise_database()
+        logging.info(f'Student Database Overview: {student_overview()}')
+
+        set_model_stage("loading model")
+        model_registry.current.load_model()
+        if not model_registry.current.trained:
+            set_model_stage("training model")
+            train_classifier()
+
+        if model_registry.current.trained:
+            set_model_stage("ready")
+        else:
+            set_model_stage("failed", "The model could not be trained, the training dataset is too small")
+    except Exception as e:
+        logging.error(f"Model initialisation failed: {e}")
+        set_model_stage("failed", str(e))
+
+
+def start_classifier_initialisation() -> threading.Thread:
+    """
+    Starts the initialisation of the database and the classifier in a background thread and returns the thread.
+
+    :return: threading.Thread
+    """
+    thread = threading.Thread(target=initialise_classifier, name="classifier-initialisation", daemon=True)
+    thread.start()
+    return thread
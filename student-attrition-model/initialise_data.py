@@ -1,5 +1,5 @@
 import os
-from db import create_all_indexes, generate_new_student, student_count
+from db import bulk_create_students, create_all_indexes, student_count
 from db import create_training_test_datasets
 from system_tools import prints
 from feature_translation import create_translator
@@ -35,6 +35,16 @@ def get_dataset_schema() -> dict:
     return schema_info
 
 
+def numeric_categories(schema: dict) -> list[str]:
+    """
+    Returns the numeric categories of the dataset, which are indexed for the statistics queries.
+
+    :param schema: dict
+    :return: list[str]
+    """
+    return [k for k, v in schema['variable_types'].items() if v == 'numeric']
+
+
 def check_data_exists(path: str):
     """
     Check that the dataset csv has been downloaded and actually exist.
@@ -58,25 +68,26 @@ def initialise_database():
     if not check_data_exists(dataset_path()):
         return
 
-    # create database and add indexes
+    # create database and add indexes, the numeric category indexes are only added once the students are split
+    schema = get_dataset_schema()
     create_all_indexes()
 
     if student_count() > 0:
+        create_all_indexes(numeric_categories(schema))
         logging.info('Database already exists. If you want to rerun initialisation, please delete the database first!')
         return
 
     # Add documents to database
     data = pandas.read_csv(dataset_path())
-    schema = get_dataset_schema()
-    dataset = data.to_dict('records')
 
     create_translator(data, True)
 
-    for index, student in enumerate(dataset):
-        generate_new_student(student, schema, True)
-        prints(f'Added new student to database: {index + 1} out of {len(dataset)} completed '
-               f'|| {round(100 / len(dataset) * (index + 1), 2)}% ')
+    bulk_create_students(data, schema, progress=lambda processed, total: prints(
+        f'Added new students to database: {processed} out of {total} completed '
+        f'|| {round(100 / total * processed, 2)}% '))
 
     logging.info('Database initialised')
 
     create_training_test_datasets()
+    # Built after the ingest and split, so the bulk writes do not have to maintain an index per numeric category.
+    create_all_indexes(numeric_categories(schema))
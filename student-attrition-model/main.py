@@ -1,5 +1,5 @@
-from initialise_data import initialise_database
-from db import student_overview
+from initialise_classifier import start_classifier_initialisation
+from db.services_motor import close_async_client
 from quart import Quart
 from routes import classifier_routes
 from system_tools import logger_config
@@ -11,6 +11,26 @@ app = Quart(__name__)
 app.register_blueprint(classifier_routes, url_prefix='/api/')
 
 
+@app.before_serving
+async def startup() -> None:
+    """
+    Starts initialising the database and the classifier in the background, so the app serves requests immediately.
+
+    :return: None
+    """
+    start_classifier_initialisation()
+
+
+@app.after_serving
+async def shutdown() -> None:
+    """
+    Closes the asynchronous database client when the app stops serving.
+
+    :return: None
+    """
+    close_async_client()
+
+
 def create_app() -> None:
     """
     Initialises quart app
@@ -23,8 +43,6 @@ def create_app() -> None:
         print(f"Logger could not be created... proceeding without logging: {e}")
     finally:
         logging.info("Server initialised")
-        initialise_database()
-        logging.info(f'Student Database Overview: {student_overview()}')
         app.run(host='0.0.0.0', port=8000)
 
 
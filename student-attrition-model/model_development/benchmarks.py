@@ -0,0 +1,157 @@
+import logging
+import numpy as np
+import pandas as pd
+from pandas import DataFrame
+from sklearn.metrics import log_loss
+from system_tools.settings import TRAINING_SPLIT_SEED
+import time
+
+logging.getLogger(__name__)
+
+
+def timed(function, repeats: int = 5) -> float:
+    """
+    Calls the function the given number of times and returns the fastest wall time in seconds.
+
+    :param function: Callable without arguments
+    :param repeats: int
+    :return: float
+    """
+    times = list()
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def counterfactual_batch(x_test: np.ndarray, samples: int = 8) -> np.ndarray:
+    """
+    Returns the stacked counterfactual matrices of the first test samples, the typical batch scored by the models.
+
+    :param x_test: np.ndarray
+    :param samples: int
+    :return: np.ndarray
+    """
+    from classifier.counterfactual_engine import build_counterfactual_plan
+    return np.vstack([build_counterfactual_plan(data).matrix for data in x_test[:samples]])
+
+
+def benchmark_svc_members(kinds: tuple = ("svc", "linear"), samples: int = 8, repeats: int = 5) -> DataFrame:
+    """
+    Compares the support vector member kinds on the current dataset, returns a DataFrame with a row per kind.
+
+    Every kind is fitted (and calibrated if required) on the training split, its accuracy and log loss are measured on
+    the test dataset and its probability latency on the counterfactual batch of the given number of test samples.
+
+    :param kinds: tuple - The support vector member kinds to compare, see svc_member
+    :param samples: int
+    :param repeats: int
+    :return: DataFrame
+    """
+    from classifier.training import calibrate_member, svc_member
+    from db import test_dataset, training_dataset
+    [x_train, y_train], [x_val, y_val] = training_dataset(True, seed=TRAINING_SPLIT_SEED)
+    [x_test, y_test] = test_dataset()
+    batch = counterfactual_batch(x_test, samples)
+
+    results = list()
+    for kind in kinds:
+        start = time.perf_counter()
+        model = calibrate_member(svc_member(kind).fit(x_train, y_train), x_val, y_val)
+        fit_seconds = time.perf_counter() - start
+        probabilities = model.predict_proba(x_test)
+        predictions = model.classes_[np.argmax(probabilities, axis=1)]
+        results.append({
+            "kind": kind,
+            "fit_seconds": fit_seconds,
+            "accuracy": float(np.mean(predictions == np.asarray(y_test))),
+            "log_loss": log_loss(y_test, probabilities, labels=model.classes_),
+            "batch_rows": len(batch),
+            "batch_ms": timed(lambda: model.predict_proba(batch), repeats) * 1000,
+        })
+    df = pd.DataFrame(results).set_index("kind")
+    logging.info(f"Support vector member benchmark:\n{df}")
+    return df
+
+
+def benchmark_knn_indexes(indexes: tuple = (("brute", 30), ("kd_tree", 1), ("kd_tree", 30), ("ball_tree", 1),
+                                            ("ball_tree", 30)), samples: int = 8, repeats: int = 5) -> DataFrame:
+    """
+    Compares neighbour indexes for the k-nearest neighbours member, returns a DataFrame with a row per index. Indexes
+    that agree with the brute force probabilities on every row come first, each group sorted by latency, so the first
+    row is the fastest index that does not change the results.
+
+    Every index is fitted on the training split and timed on the counterfactual batch of the given number of test
+    samples. The agreement with the brute force probabilities and the test accuracy are reported, distance ties may be
+    broken differently by the tree indexes.
+
+    :param indexes: tuple of (algorithm, leaf_size) pairs, see knn_member
+    :param samples: int
+    :param repeats: int
+    :return: DataFrame
+    """
+    from classifier.training import knn_member
+    from db import test_dataset, training_dataset
+    [x_train, y_train], _ = training_dataset(True, seed=TRAINING_SPLIT_SEED)
+    [x_test, y_test] = test_dataset()
+    batch = counterfactual_batch(x_test, samples)
+    reference = knn_member("brute").fit(x_train, y_train).predict_proba(batch)
+
+    results = list()
+    for algorithm, leaf_size in indexes:
+        model = knn_member(algorithm, leaf_size).fit(x_train, y_train)
+        results.append({
+            "algorithm": algorithm,
+            "leaf_size": leaf_size,
+            "accuracy": float(np.mean(model.predict(x_test) == np.asarray(y_test))),
+            "agreement": float(np.mean(np.all(np.isclose(model.predict_proba(batch), reference), axis=1))),
+            "batch_rows": len(batch),
+            "batch_ms": timed(lambda: model.predict_proba(batch), repeats) * 1000,
+        })
+    df = pd.DataFrame(results)
+    df["exact"] = df["agreement"] == 1.0
+    df = df.sort_values(["exact", "batch_ms"], ascending=[False, True]).reset_index(drop=True)
+    logging.info(f"Neighbour index benchmark:\n{df}")
+    return df
+
+
+def benchmark_tree_evaluators(samples: int = 8, repeats: int = 5) -> DataFrame:
+    """
+    Compares the flat array evaluators of the tree ensemble members of the current classifier with sklearn, returns a
+    DataFrame with a row per member.
+
+    Both evaluators are timed on the counterfactual batch of the given number of test samples, the largest absolute
+    difference between their probabilities is reported to confirm the flat evaluator reproduces sklearn.
+
+    :param samples: int
+    :param repeats: int
+    :return: DataFrame
+    """
+    from classifier import Classifier
+    from classifier.tree_evaluator import flatten_ensemble
+    from db import test_dataset
+    classifier = Classifier()
+    [x_test, _] = test_dataset()
+    batch = counterfactual_batch(x_test, samples)
+
+    results = list()
+    for name in ("rfc", "adb"):
+        model = getattr(classifier, name)
+        flat = flatten_ensemble(model)
+        results.append({
+            "member": name,
+            "batch_rows": len(batch),
+            "sklearn_ms": timed(lambda: model.predict_proba(batch), repeats) * 1000,
+            "flat_ms": timed(lambda: flat.predict_proba(batch), repeats) * 1000,
+            "max_difference": float(np.abs(model.predict_proba(batch) - flat.predict_proba(batch)).max()),
+        })
+    df = pd.DataFrame(results).set_index("member")
+    logging.info(f"Tree evaluator benchmark:\n{df}")
+    return df
+
+
+if __name__ == "__main__":
+    print(benchmark_svc_members())
+    print(benchmark_knn_indexes())
+    print(benchmark_tree_evaluators())
@@ -1,10 +1,77 @@
+import asyncio
 from quart import Blueprint, request
-from initialise_classifier import classifier_model
-from feature_translation import features_n
+from classifier.model_classifier import ANALYSIS_METHODS
+from db import get_controls_async, student_overview_async, student_priors_all_async
+from feature_translation import get_dataset_schema
+import hmac
+from initialise_classifier import model_readiness, model_registry
+from routes.classifier_tasks import analyse_features, analyse_features_batch, score_students
+from system_tools.coalescer import RequestCoalescer
+from system_tools.executor import ExecutorSaturated, model_executor
+from system_tools.settings import COALESCER_ENABLED, COALESCER_MAX_BATCH, COALESCER_WINDOW_MS
+from system_tools.settings import ADMIN_TOKEN, MODEL_EXECUTOR_RETRY_AFTER, MODEL_NOT_READY_RETRY_AFTER
 import json
 
 classifier_routes = Blueprint("classifier_routes", __name__)
 
+# Every task carries the active model version, so process pool workers follow the activations of this process.
+analysis_coalescer = RequestCoalescer(analyse_features_batch, model_executor, COALESCER_WINDOW_MS, COALESCER_MAX_BATCH,
+                                      lambda: (model_registry.current.version,))
+
+
+def saturated_response(error: ExecutorSaturated) -> tuple[str, int, dict]:
+    """
+    Returns the response sent when the model executor cannot accept any more work.
+
+    :param error: ExecutorSaturated
+    :return: tuple[str, int, dict]
+    """
+    headers = {'ContentType': 'application/json', 'Retry-After': str(MODEL_EXECUTOR_RETRY_AFTER)}
+    return json.dumps({'error': str(error)}), 503, headers
+
+
+def not_ready_response() -> tuple[str, int, dict]:
+    """
+    Returns the response sent when a prediction is requested before the model is ready.
+
+    :return: tuple[str, int, dict]
+    """
+    headers = {'ContentType': 'application/json', 'Retry-After': str(MODEL_NOT_READY_RETRY_AFTER)}
+    return json.dumps({'error': 'Model is not ready', **model_readiness()}), 503, headers
+
+
+def admin_authorised() -> bool:
+    """
+    Returns whether the current request carries the admin token. Always False if no admin token is configured.
+
+    The tokens are compared in constant time, so the response time does not reveal how much of a token is correct.
+
+    :return: bool
+    """
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode('utf-8'), ADMIN_TOKEN.encode('utf-8'))
+
+
+@classifier_routes.route("/live")
+async def live():
+    """
+    Returns whether the app is alive, which is the case as long as it can respond to requests.
+
+    :return: JSON str
+    """
+    return json.dumps({'live': True, 'stage': model_readiness()['stage']}), 200, {'ContentType': 'application/json'}
+
+
+@classifier_routes.route("/ready")
+async def ready():
+    """
+    Returns the progress of the model initialisation, with status 503 until the model is ready to serve predictions.
+
+    :return: JSON str
+    """
+    status = model_readiness()
+    return json.dumps(status), 200 if status["ready"] else 503, {'ContentType': 'application/json'}
+
 
 @classifier_routes.route("/test")
 async def hello_world_test():
@@ -21,16 +88,56 @@ async def analyse_user_data():
     """
     Take the data provided by the user and return the relevant feature analysis.
 
+    The method query parameter selects how the analysis is calculated, "perturbation" (default) or "shap".
+    If COALESCER_ENABLED is set, concurrent perturbation requests are combined into batches which are scored together.
+
     :return: JSON str
     """
     try:
+        if not model_registry.current.trained:
+            return not_ready_response()
+        method = request.args.get('method', 'perturbation')
+        if method not in ANALYSIS_METHODS:
+            error = f'Unknown analysis method {method}, expected one of {", ".join(ANALYSIS_METHODS)}'
+            return json.dumps({'error': error}), 400, {'ContentType': 'application/json'}
         data = await request.data
         data_dict = json.loads(data.decode("utf-8"))
-        features = features_n(data_dict)
-        results = classifier_model.feature_analysis(features)
+        # Refresh the cached controls without blocking, so the model work only reads them from memory.
+        await get_controls_async()
+        if COALESCER_ENABLED and method == 'perturbation':
+            results = await analysis_coalescer.submit(data_dict)
+        else:
+            results = await model_executor.run(analyse_features, data_dict, method, model_registry.current.version)
         return json.dumps(results), 200, {'ContentType': 'application/json'}
+    except ExecutorSaturated as e:
+        return saturated_response(e)
     except Exception as e:
-        return json.dumps({'error': e}), 500, {'ContentType': 'application/json'}
+        return json.dumps({'error': str(e)}), 500, {'ContentType': 'application/json'}
+
+
+@classifier_routes.route("/performance_analysis/batch", methods=["POST"])
+async def score_user_data_batch():
+    """
+    Take a list of student data provided by the user and return the prediction for every student.
+
+    All students are scored together in a single batch, the results are returned in the same order as the request.
+
+    :return: JSON str
+    """
+    try:
+        if not model_registry.current.trained:
+            return not_ready_response()
+        data = await request.data
+        data_list = json.loads(data.decode("utf-8"))
+        if not isinstance(data_list, list) or not data_list:
+            return json.dumps({'error': 'Expected a non-empty list of students'}), 400, {'ContentType': 'application/json'}
+        await get_controls_async()
+        results = await model_executor.run(score_students, data_list, model_registry.current.version)
+        return json.dumps(results), 200, {'ContentType': 'application/json'}
+    except ExecutorSaturated as e:
+        return saturated_response(e)
+    except Exception as e:
+        return json.dumps({'error': str(e)}), 500, {'ContentType': 'application/json'}
 
 
 @classifier_routes.route("/model-accuracy")
@@ -41,7 +148,90 @@ async def model_accuracy():
     :return: JSON str
     """
     try:
-        results = classifier_model.info()
+        results = model_registry.current.info()
         return json.dumps(results), 200, {'ContentType': 'application/json'}
     except Exception as e:
-        return json.dumps({'error': e}), 500, {'ContentType': 'application/json'}
+        return json.dumps({'error': str(e)}), 500, {'ContentType': 'application/json'}
+
+
+@classifier_routes.route("/student-overview")
+async def student_overview():
+    """
+    Returns the number of students in the training dataset for each class.
+
+    :return: JSON str
+    """
+    try:
+        results = await student_overview_async()
+        return json.dumps(results), 200, {'ContentType': 'application/json'}
+    except Exception as e:
+        return json.dumps({'error': str(e)}), 500, {'ContentType': 'application/json'}
+
+
+@classifier_routes.route("/student-priors")
+async def student_priors():
+    """
+    Returns the proportion of each class for every value of every categorical variable, calculated on the training
+    dataset or on the test dataset if training=false is given.
+
+    :return: JSON str
+    """
+    training = request.args.get('training', 'true').lower() != 'false'
+    try:
+        # Refreshes the shared controls cache, so the schema is read below without a blocking database call.
+        await get_controls_async()
+        results = await student_priors_all_async(get_dataset_schema(), training)
+        return json.dumps(results), 200, {'ContentType': 'application/json'}
+    except Exception as e:
+        return json.dumps({'error': str(e)}), 500, {'ContentType': 'application/json'}
+
+
+@classifier_routes.route("/executor-status")
+async def executor_status():
+    """
+    Returns the current load of the model executor, including the number of running and queued requests, and the
+    statistics of the feature analysis cache.
+
+    :return: JSON str
+    """
+    status = model_executor.status()
+    status["analysis_cache"] = model_registry.current.analysis_cache.status()
+    if COALESCER_ENABLED:
+        status["coalescer"] = analysis_coalescer.status()
+    return json.dumps(status), 200, {'ContentType': 'application/json'}
+
+
+@classifier_routes.route("/models")
+async def models():
+    """
+    Returns the saved model versions with their metrics and fingerprints, marking the active and the latest version.
+
+    :return: JSON str
+    """
+    try:
+        results = {'active': model_registry.status(), 'versions': model_registry.versions()}
+        return json.dumps(results), 200, {'ContentType': 'application/json'}
+    except Exception as e:
+        return json.dumps({'error': str(e)}), 500, {'ContentType': 'application/json'}
+
+
+@classifier_routes.route("/models/<version>/activate", methods=["POST"])
+async def activate_model(version: str):
+    """
+    Loads and warms the given model version alongside the current model, then switches new requests over to it.
+
+    Requests already in progress finish on the previous model. Requires the X-Admin-Token header.
+
+    :param version: str
+    :return: JSON str
+    """
+    if not admin_authorised():
+        return json.dumps({'error': 'Not authorised'}), 403, {'ContentType': 'application/json'}
+    try:
+        manifest = await asyncio.to_thread(model_registry.activate, version)
+        return json.dumps(manifest), 200, {'ContentType': 'application/json'}
+    except FileNotFoundError:
+        error = f'Model version {version} does not exist'
+        return json.dumps({'error': error}), 404, {'ContentType': 'application/json'}
+    except Exception as e:
+        return json.dumps({'error': str(e)}), 500, {'ContentType': 'application/json'}
@@ -0,0 +1,63 @@
+from initialise_classifier import model_registry
+from feature_translation import features_n, get_codec
+
+
+def analyse_features(data_dict: dict, method: str = "perturbation", version: str | None = None) -> dict:
+    """
+    Takes the human-readable data for a student and returns the relevant feature analysis, calculated with the given
+    method (see Classifier.feature_analysis).
+
+    Runs in the model executor, so it must remain a module level function for the process pool. The version is the
+    model active in the serving process, which a process pool worker loads if it serves another one.
+
+    :param data_dict: dict
+    :param method: str
+    :param version: str | None
+    :return: dict
+    """
+    features = features_n(data_dict)
+    return model_registry.ensure(version).feature_analysis(features, method)
+
+
+def analyse_features_batch(data_dicts: list[dict], version: str | None = None) -> list[dict | Exception]:
+    """
+    Takes the human-readable data for several students and returns the feature analysis for each of them.
+
+    The counterfactual plans of all students are scored together. A student whose data cannot be translated receives
+    the exception in place of its result, so it does not affect the rest of the batch.
+
+    :param data_dicts: list[dict]
+    :param version: str | None - The model active in the serving process, see analyse_features
+    :return: list[dict | Exception]
+    """
+    results: list = [None] * len(data_dicts)
+    features = list()
+    indexes = list()
+    for index, data_dict in enumerate(data_dicts):
+        try:
+            features.append(features_n(data_dict))
+            indexes.append(index)
+        except Exception as e:
+            results[index] = e
+    if features:
+        for index, result in zip(indexes, model_registry.ensure(version).feature_analysis_batch(features)):
+            results[index] = result
+    return results
+
+
+def score_students(data_list: list[dict], version: str | None = None) -> list[dict]:
+    """
+    Takes the human-readable data for a list of students and returns the prediction for every student.
+
+    Runs in the model executor, so it must remain a module level function for the process pool.
+
+    :param data_list: list[dict]
+    :param version: str | None - The model active in the serving process, see analyse_features
+    :return: list[dict]
+    """
+    features = get_codec().encode_many(data_list)
+    labels, graduate_scores, scores = model_registry.ensure(version).predict_batch(features)
+    return [
+        {"label": str(label), "score": float(score), "graduate_score": float(graduate_score)}
+        for label, score, graduate_score in zip(labels, scores, graduate_scores)
+    ]
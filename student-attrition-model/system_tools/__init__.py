@@ -1,2 +1,3 @@
 from system_tools.tools import prints
 from system_tools.logger_config import create_logger
+from system_tools.settings import setting
@@ -0,0 +1,128 @@
+import asyncio
+import logging
+from system_tools.executor import ModelExecutor
+
+logging.getLogger(__name__)
+
+
+class RequestCoalescer:
+    """
+        This class contains all properties and methods for combining concurrent requests into batches.
+
+        Requests that arrive within the batching window (or until the batch is full) are passed together to a single
+        call of the batch function in the model executor. Each caller receives only the result for its own request.
+
+
+        Attributes
+
+        batch_function: Callable - Module level function taking a list of requests and returning a list of results in
+                                   the same order, a result may be an Exception which is then raised for that caller
+
+        executor: ModelExecutor - The executor the batch function is run in
+
+        arguments: Callable | None - Returns the additional arguments passed to the batch function with every batch
+
+        window: float - The number of seconds a batch stays open after its first request arrives
+
+        max_batch: int - The maximum number of requests in a single batch
+
+        pending: list[tuple[object, asyncio.Future]] - The requests in the currently open batch
+
+        tasks: set[asyncio.Task] - The batches that are currently being scored
+
+        batches: int - The total number of batches that have been scored
+
+        requests: int - The total number of requests that have been scored
+
+
+        Methods
+
+        submit: object - Adds a request to the open batch and returns its result once the batch has been scored.
+
+        flush: None - Closes the open batch and scores it.
+
+        status: dict - Returns the batching statistics of the coalescer.
+    """
+    def __init__(self, batch_function, executor: ModelExecutor, window_ms: float = 5.0, max_batch: int = 32,
+                 arguments=None):
+        assert max_batch > 0
+        self.batch_function = batch_function
+        self.executor = executor
+        self.arguments = arguments
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.pending: list[tuple[object, asyncio.Future]] = list()
+        # The event loop only keeps weak references to tasks, so the scoring tasks are kept until they are done.
+        self.tasks: set[asyncio.Task] = set()
+        self.timer: asyncio.TimerHandle | None = None
+        self.batches = 0
+        self.requests = 0
+
+    async def submit(self, item):
+        """
+        Adds a request to the open batch and returns its result once the batch has been scored.
+
+        :param item: object
+        :return: object
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((item, future))
+        if len(self.pending) >= self.max_batch:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.window, self.flush)
+        return await future
+
+    def flush(self) -> None:
+        """
+        Closes the open batch and schedules it to be scored in the executor.
+
+        :return: None
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, list()
+        if batch:
+            task = asyncio.get_running_loop().create_task(self.score(batch))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def score(self, batch: list[tuple[object, asyncio.Future]]) -> None:
+        """
+        Scores a batch in the executor and passes each result (or error) to the caller that submitted it.
+
+        :param batch: list[tuple[object, asyncio.Future]]
+        :return: None
+        """
+        try:
+            arguments = self.arguments() if self.arguments is not None else tuple()
+            results = await self.executor.run(self.batch_function, [item for item, _ in batch], *arguments)
+            assert len(results) == len(batch)
+        except Exception as e:
+            results = [e] * len(batch)
+        self.batches += 1
+        self.requests += len(batch)
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def status(self) -> dict:
+        """
+        Returns the batching statistics of the coalescer.
+
+        :return: dict
+        """
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "open": len(self.pending),
+            "batches": self.batches,
+            "requests": self.requests,
+            "average_batch": self.requests / self.batches if self.batches else 0,
+        }
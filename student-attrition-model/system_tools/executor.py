@@ -0,0 +1,148 @@
+import asyncio
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+import logging
+from system_tools.settings import MODEL_EXECUTOR_MODE, MODEL_EXECUTOR_QUEUE_SIZE, MODEL_EXECUTOR_WORKERS
+import threading
+
+logging.getLogger(__name__)
+
+
+class ExecutorSaturated(Exception):
+    """
+    Raised when the model executor already holds the maximum number of running and queued tasks.
+    """
+
+
+class ModelExecutor:
+    """
+        This class contains all properties and methods for running CPU bound model work outside the event loop.
+
+        Tasks are run in a thread or process pool with a fixed number of workers. A bounded number of tasks may wait for
+        a free worker, once that limit is reached new tasks are rejected instead of queueing without limit.
+
+
+        Attributes
+
+        mode: str - Either "thread" or "process", determines the type of pool the tasks are run in
+
+        workers: int - The number of tasks that are run at the same time
+
+        queue_size: int - The number of tasks that may wait for a free worker
+
+        pending: int - The number of tasks currently running or waiting for a free worker
+
+        completed: int - The total number of tasks that have finished
+
+        rejected: int - The total number of tasks that have been rejected because the executor was saturated
+
+
+        Methods
+
+        pool: Executor - Returns the underlying pool, creating it on first use.
+
+        run: object - Runs a function in the pool and returns its result, raises ExecutorSaturated when full.
+
+        task_done: None - Removes a finished (or cancelled) task from the pending tasks.
+
+        status: dict - Returns the current load of the executor.
+
+        shutdown: None - Shuts down the underlying pool.
+    """
+    def __init__(self, mode: str = "thread", workers: int = 4, queue_size: int = 32):
+        assert mode in ("thread", "process")
+        assert workers > 0 and queue_size >= 0
+        self.mode = mode
+        self.workers = workers
+        self.queue_size = queue_size
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.executor: Executor | None = None
+        self.lock = threading.Lock()
+
+    def pool(self) -> Executor:
+        """
+        Returns the underlying thread or process pool, creating it on first use.
+
+        :return: Executor
+        """
+        with self.lock:
+            if self.executor is None:
+                if self.mode == "process":
+                    self.executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="model")
+            return self.executor
+
+    async def run(self, function, *args):
+        """
+        Runs the function with the given arguments in the pool without blocking the event loop and returns its result.
+
+        Raises ExecutorSaturated if the number of running and queued tasks has reached workers + queue_size. In process
+        mode the function and its arguments must be picklable.
+
+        :param function: Callable
+        :param args: arguments passed to the function
+        :return: object
+        """
+        with self.lock:
+            if self.pending >= self.workers + self.queue_size:
+                self.rejected += 1
+                logging.warning(f"Model executor saturated, rejecting task: {self.pending} tasks pending")
+                raise ExecutorSaturated(f"Model executor saturated: {self.pending} tasks pending")
+            self.pending += 1
+        try:
+            future = self.pool().submit(function, *args)
+        except Exception:
+            with self.lock:
+                self.pending -= 1
+            raise
+        # The task is only counted as done once the pool has finished it, a caller that stops waiting (e.g. the client
+        # disconnected) does not free its place while the worker is still busy.
+        future.add_done_callback(self.task_done)
+        return await asyncio.wrap_future(future)
+
+    def task_done(self, future: Future) -> None:
+        """
+        Removes a finished (or cancelled) task from the pending tasks.
+
+        :param future: Future
+        :return: None
+        """
+        with self.lock:
+            self.pending -= 1
+            if not future.cancelled():
+                self.completed += 1
+
+    def status(self) -> dict:
+        """
+        Returns the current load of the executor, including the number of running and queued tasks.
+
+        :return: dict
+        """
+        with self.lock:
+            return {
+                "mode": self.mode,
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                # The pool runs tasks in order, so every pending task beyond the number of workers is still queued.
+                "active": min(self.pending, self.workers),
+                "queued": max(self.pending - self.workers, 0),
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self) -> None:
+        """
+        Shuts down the underlying pool, waiting for running tasks to finish.
+
+        :return: None
+        """
+        with self.lock:
+            executor, self.executor = self.executor, None
+        # Finishing tasks take the lock to update the counters, so it must not be held while waiting for them.
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+
+model_executor = ModelExecutor(MODEL_EXECUTOR_MODE, MODEL_EXECUTOR_WORKERS, MODEL_EXECUTOR_QUEUE_SIZE)
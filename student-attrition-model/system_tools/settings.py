@@ -0,0 +1,99 @@
+import logging
+import os
+
+logging.getLogger(__name__)
+
+
+def setting(name: str, default: str | int | float | bool) -> str | int | float | bool:
+    """
+    Returns the value of an environment variable converted to the type of the default, or the default if not set.
+
+    :param name: str
+    :param default: str | int | float | bool
+    :return: str | int | float | bool
+    """
+    value = os.environ.get(name)
+    if value is None or value == "":
+        return default
+    try:
+        if isinstance(default, bool):
+            return value.strip().lower() in ("1", "true", "yes", "on")
+        return type(default)(value)
+    except ValueError:
+        logging.error(f"Invalid value for setting {name}: {value} - using default {default}")
+        return default
+
+
+# Number of seconds the cached controls are served before their generation is checked against the database.
+CONTROLS_CACHE_SECONDS: float = setting("CONTROLS_CACHE_SECONDS", 5.0)
+
+# Executor used to run model work off the event loop, either "thread" or "process".
+MODEL_EXECUTOR_MODE: str = setting("MODEL_EXECUTOR_MODE", "thread")
+# Number of requests the model executor works on at the same time.
+MODEL_EXECUTOR_WORKERS: int = setting("MODEL_EXECUTOR_WORKERS", 4)
+# Number of requests allowed to wait for a worker before new requests are rejected.
+MODEL_EXECUTOR_QUEUE_SIZE: int = setting("MODEL_EXECUTOR_QUEUE_SIZE", 32)
+# Number of seconds clients are asked to wait before retrying a rejected request.
+MODEL_EXECUTOR_RETRY_AFTER: int = setting("MODEL_EXECUTOR_RETRY_AFTER", 1)
+
+# Enables coalescing of concurrent feature analysis requests into shared batches.
+COALESCER_ENABLED: bool = setting("COALESCER_ENABLED", False)
+# Number of milliseconds a batch stays open for further requests after the first one arrives.
+COALESCER_WINDOW_MS: float = setting("COALESCER_WINDOW_MS", 5.0)
+# Maximum number of requests in a single batch, a full batch is scored immediately.
+COALESCER_MAX_BATCH: int = setting("COALESCER_MAX_BATCH", 32)
+
+# Maximum number of feature analysis results kept in memory by each worker, 0 disables the cache.
+ANALYSIS_CACHE_SIZE: int = setting("ANALYSIS_CACHE_SIZE", 1024)
+# Number of seconds a cached feature analysis result remains valid.
+ANALYSIS_CACHE_TTL: int = setting("ANALYSIS_CACHE_TTL", 600)
+# Enables the shared MongoDB tier of the feature analysis cache, so results are shared between workers.
+ANALYSIS_CACHE_SHARED: bool = setting("ANALYSIS_CACHE_SHARED", False)
+
+# Host name of the MongoDB server, defaults to the docker compose service name.
+MONGO_HOST: str = setting("MONGO_HOST", "database")
+# Maximum number of connections in each MongoDB connection pool.
+MONGO_MAX_POOL_SIZE: int = setting("MONGO_MAX_POOL_SIZE", 100)
+# Number of milliseconds to wait for a suitable MongoDB server before an operation fails.
+MONGO_SERVER_SELECTION_TIMEOUT_MS: int = setting("MONGO_SERVER_SELECTION_TIMEOUT_MS", 30000)
+# Number of milliseconds to wait for a connection to the MongoDB server to be established.
+MONGO_CONNECT_TIMEOUT_MS: int = setting("MONGO_CONNECT_TIMEOUT_MS", 20000)
+# Number of milliseconds a single MongoDB operation may take, 0 waits indefinitely.
+MONGO_SOCKET_TIMEOUT_MS: int = setting("MONGO_SOCKET_TIMEOUT_MS", 0)
+
+# Trains the models in a separate process at startup, so training never competes with the event loop.
+MODEL_TRAINING_PROCESS: bool = setting("MODEL_TRAINING_PROCESS", True)
+# Number of seconds clients are asked to wait before retrying a request made while the model is not ready.
+MODEL_NOT_READY_RETRY_AFTER: int = setting("MODEL_NOT_READY_RETRY_AFTER", 10)
+# Number of test students a model is run on before it is activated, so its first requests are not slowed down.
+MODEL_WARMUP_SAMPLES: int = setting("MODEL_WARMUP_SAMPLES", 32)
+# Token required in the X-Admin-Token header of the admin routes, the admin routes are disabled if not set.
+ADMIN_TOKEN: str = setting("ADMIN_TOKEN", "")
+# Number of cores used to train the models, the ensemble members are fitted concurrently if it is above 1. 0 uses all.
+MODEL_TRAINING_CPUS: int = setting("MODEL_TRAINING_CPUS", 0)
+# Support vector member of the ensemble, "svc" (libsvm with internal probability estimates) or "linear" (liblinear,
+# calibrated once on the validation split). Cheaper to fit and to score, see model_development/benchmarks.py.
+SVC_MEMBER: str = setting("SVC_MEMBER", "svc")
+# Neighbour index of the k-nearest neighbours member trained from now on, "brute", "kd_tree", "ball_tree" or "auto".
+# Defaults to brute, which replaced the original ball_tree index with a leaf size of 1 as the fastest on the benchmark.
+KNN_ALGORITHM: str = setting("KNN_ALGORITHM", "brute")
+# Number of points in each leaf of the kd_tree and ball_tree neighbour indexes.
+KNN_LEAF_SIZE: int = setting("KNN_LEAF_SIZE", 30)
+# Comma separated tree ensemble members ("rfc", "adb") scored with the flat array evaluator instead of sklearn, see
+# model_development/benchmarks.py. Deep forests can be slower flattened on few cores.
+FLAT_TREE_MEMBERS: str = setting("FLAT_TREE_MEMBERS", "adb")
+
+# Number of students encoded and inserted together when the dataset is loaded into the database.
+INGEST_BATCH_SIZE: int = setting("INGEST_BATCH_SIZE", 1000)
+# Minimum number of seconds between two progress reports while the dataset is loaded into the database.
+INGEST_PROGRESS_SECONDS: float = setting("INGEST_PROGRESS_SECONDS", 1.0)
+# Seed of the random generators used for the stratified training / test split and the validation split of training.
+TRAINING_SPLIT_SEED: int = setting("TRAINING_SPLIT_SEED", 0)
+# Number of student documents fetched per round trip when the training and test datasets are loaded.
+DATASET_CURSOR_BATCH_SIZE: int = setting("DATASET_CURSOR_BATCH_SIZE", 10000)
+# Determines whether the training and test datasets are read from the local snapshot instead of the database.
+DATASET_SNAPSHOT: bool = setting("DATASET_SNAPSHOT", True)
+# Directory of the dataset snapshots, defaults to data/snapshots.
+DATASET_SNAPSHOT_LOCATION: str = setting("DATASET_SNAPSHOT_LOCATION", "")
+# Number of seconds after which an unfinished snapshot directory is considered abandoned by a crashed writer.
+DATASET_SNAPSHOT_STALE_SECONDS: int = setting("DATASET_SNAPSHOT_STALE_SECONDS", 3600)
@@ -0,0 +1,74 @@
+import asyncio
+from system_tools.coalescer import RequestCoalescer
+from system_tools.executor import ModelExecutor
+
+# Every batch passed to the batch functions, in the order they were scored.
+batches = list()
+
+
+def double_batch(items: list) -> list:
+    batches.append(list(items))
+    return [item * 2 for item in items]
+
+
+def failing_batch(items: list) -> list:
+    batches.append(list(items))
+    raise ValueError("batch failed")
+
+
+def partial_batch(items: list) -> list:
+    batches.append(list(items))
+    return [ValueError(f"bad {item}") if item < 0 else item for item in items]
+
+
+def run_requests(batch_function, items: list, window_ms: float = 50.0, max_batch: int = 32) -> tuple[list, dict]:
+    executor = ModelExecutor("thread", workers=2, queue_size=8)
+    coalescer = RequestCoalescer(batch_function, executor, window_ms, max_batch)
+
+    async def scenario():
+        return await asyncio.gather(*[coalescer.submit(item) for item in items], return_exceptions=True)
+
+    batches.clear()
+    try:
+        return asyncio.run(scenario()), coalescer.status()
+    finally:
+        executor.shutdown()
+
+
+def test_coalescer_window():
+    results, status = run_requests(double_batch, [1, 2, 3])
+    assert batches == [[1, 2, 3]]
+    assert results == [2, 4, 6]
+    assert (status["batches"], status["requests"]) == (1, 3)
+
+
+def test_coalescer_max_batch():
+    # The window is far longer than the test, full batches must be flushed without waiting for it.
+    results, status = run_requests(double_batch, list(range(4)), window_ms=60000, max_batch=2)
+    assert sorted(batches) == [[0, 1], [2, 3]]
+    assert results == [0, 2, 4, 6]
+    assert status["open"] == 0
+
+
+def test_coalescer_per_caller_results():
+    results, _ = run_requests(partial_batch, [1, -2, 3])
+    assert results[0] == 1 and results[2] == 3
+    assert isinstance(results[1], ValueError) and str(results[1]) == "bad -2"
+
+
+def test_coalescer_batch_error():
+    results, status = run_requests(failing_batch, [1, 2, 3])
+    assert len(batches) == 1
+    assert all(isinstance(result, ValueError) and str(result) == "batch failed" for result in results)
+    assert status["batches"] == 1
+
+
+def tests():
+    test_coalescer_window()
+    test_coalescer_max_batch()
+    test_coalescer_per_caller_results()
+    test_coalescer_batch_error()
+
+
+if __name__ == "__main__":
+    tests()
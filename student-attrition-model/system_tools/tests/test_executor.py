@@ -0,0 +1,78 @@
+import asyncio
+import importlib
+import json
+import pytest
+from system_tools.executor import ExecutorSaturated, ModelExecutor
+import threading
+
+
+def test_executor_saturation():
+    executor = ModelExecutor("thread", workers=1, queue_size=1)
+    release = threading.Event()
+
+    async def scenario():
+        first = asyncio.ensure_future(executor.run(lambda: release.wait(5) and "first"))
+        second = asyncio.ensure_future(executor.run(lambda: "second"))
+        await asyncio.sleep(0.05)
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(lambda: "third")
+        status = executor.status()
+        assert (status["active"], status["queued"], status["rejected"]) == (1, 1, 1)
+        release.set()
+        return await first, await second
+
+    try:
+        assert asyncio.run(scenario()) == ("first", "second")
+        status = executor.status()
+        assert (status["active"], status["queued"], status["completed"]) == (0, 0, 2)
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def test_saturated_response():
+    # The package exports the blueprint under the name of the module, so the module is imported explicitly.
+    routes = importlib.import_module("routes.classifier_routes")
+    body, status, headers = routes.saturated_response(ExecutorSaturated("Model executor saturated: 2 tasks pending"))
+    assert status == 503
+    assert json.loads(body) == {"error": "Model executor saturated: 2 tasks pending"}
+    assert int(headers["Retry-After"]) > 0
+
+
+def test_executor_cancelled_caller():
+    executor = ModelExecutor("thread", workers=1, queue_size=0)
+    started, release = threading.Event(), threading.Event()
+
+    def work():
+        started.set()
+        release.wait(5)
+
+    async def scenario():
+        task = asyncio.ensure_future(executor.run(work))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        task.cancel()
+        await asyncio.sleep(0.05)
+        # The worker is still busy, so the task keeps its place until it has finished.
+        assert executor.status()["active"] == 1
+        with pytest.raises(ExecutorSaturated):
+            await executor.run(lambda: None)
+
+    try:
+        asyncio.run(scenario())
+        release.set()
+        executor.shutdown()
+        assert executor.status()["active"] == 0
+        assert executor.status()["completed"] == 1
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def tests():
+    test_executor_saturation()
+    test_saturated_response()
+    test_executor_cancelled_caller()
+
+
+if __name__ == "__main__":
+    tests()